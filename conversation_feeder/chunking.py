@@ -0,0 +1,51 @@
+"""
+Splits long message text into overlapping chunks for embedding.
+
+Like embedding_batcher.py, this module is shared verbatim by mcp_server and
+conversation_feeder, so it must not import either service's `config`. Keep
+`conversation_feeder/chunking.py` identical to this file.
+"""
+from typing import List, NamedTuple
+
+# Preferred places to end a chunk, best first
+BREAKS = ("\n\n", "\n", ". ", " ")
+
+
+class TextChunk(NamedTuple):
+    index: int
+    start: int  # character offsets into the original text
+    end: int
+    text: str
+
+
+def chunk_text(text: str, max_chars: int = 1500, overlap: int = 200) -> List[TextChunk]:
+    """
+    Splits `text` into chunks of at most `max_chars` characters, each starting
+    `overlap` characters before the end of the previous one so that a passage
+    cut at a boundary is still whole in one of them. Chunks end at the best
+    break (paragraph, line, sentence, word) in their second half when there is
+    one. Text that fits in one chunk is not chunked: an empty list is returned.
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return []
+    overlap = max(0, min(overlap, max_chars // 2))
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            for separator in BREAKS:
+                cut = text.rfind(separator, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append(TextChunk(len(chunks), start, end, piece))
+        if end >= len(text):
+            break
+        next_start = end - overlap
+        # Start the overlap on a word boundary
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return chunks
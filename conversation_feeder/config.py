@@ -5,6 +5,45 @@ class Settings(BaseSettings):
     database_url: str
     feeder_auth_token: str
 
+    # App-lifetime asyncpg pool shared by all ingest requests
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    db_command_timeout: float = 60.0
+
+    embedding_provider: str = "gemini"  # or "local" for offline load tests
+    embedding_model: str = "models/embedding-001"
+    embedding_dimensions: int = 768
+    # Reuse/share vectors through the mcp_server `embedding_cache` table
+    embedding_cache_persistent: bool = False
+    # Streaming ingestion (/api/ingest/stream): messages are embedded and
+    # committed in batches; at most `ingest_queue_batches` parsed batches wait
+    # for the writer before reading from the upload pauses
+    ingest_batch_size: int = 500
+    ingest_queue_batches: int = 2
+    ingest_max_line_bytes: int = 1_000_000
+    # Queued ingestion (/api/ingest?queue=true, see ingest_jobs.py): workers per
+    # instance, how often idle workers poll for jobs from other instances,
+    # when a silent 'running' job is reclaimed and retried, and how long a
+    # failed job waits before its next attempt (doubling up to the maximum)
+    ingest_workers: int = 2
+    ingest_job_poll_interval: float = 1.0
+    ingest_job_stale_after: float = 300.0
+    ingest_job_max_attempts: int = 3
+    ingest_job_retry_backoff: float = 5.0
+    ingest_job_max_retry_backoff: float = 300.0
+
+    # Long messages are also stored as overlapping chunks (message_chunks);
+    # keep in sync with mcp_server
+    chunk_max_chars: int = 1500
+    chunk_overlap: int = 200
+
+    # Micro-batching of embedding calls (see embedding_batcher.py)
+    embedding_batch_size: int = 100
+    embedding_batch_wait_ms: float = 5.0
+    embedding_max_concurrency: int = 4
+    embedding_max_retries: int = 3
+    embedding_retry_backoff: float = 0.5
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
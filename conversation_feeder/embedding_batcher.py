@@ -0,0 +1,134 @@
+"""
+Micro-batching for embedding requests.
+
+This module is shared verbatim by mcp_server and conversation_feeder (each
+service is built from its own Docker context), so it must not import either
+service's `config`; everything is passed in by the caller. Keep
+`conversation_feeder/embedding_batcher.py` identical to this file.
+"""
+import asyncio
+import random
+from typing import Awaitable, Callable, List
+
+# Exception class names (google.api_core and HTTP clients) worth retrying
+RETRYABLE_ERRORS = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+}
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for quota/availability errors that are likely to succeed on retry."""
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return status in (429, 500, 503, 504)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched calls.
+
+    `embed()` queues the text and waits. The queue is flushed when it reaches
+    `max_batch_size` items or `max_wait` seconds after the first queued item,
+    whichever comes first; identical texts in a batch are sent once. At most
+    `max_concurrency` batches are in flight, and batches failing with a
+    retryable error are retried with jittered exponential backoff before the
+    error is propagated to every waiter.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], Awaitable[List[List[float]]]],
+        max_batch_size: int = 100,
+        max_wait: float = 0.005,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        retry_on: Callable[[Exception], bool] = is_retryable,
+    ):
+        self._embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._retry_on = retry_on
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embeds `texts`, letting them share batches with other callers."""
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]):
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        async with self._semaphore:
+            try:
+                vectors = await self._call_with_retry(unique_texts)
+            except Exception as e:
+                self.failures += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        self.batches += 1
+        self.items += len(unique_texts)
+        by_text = dict(zip(unique_texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    async def _call_with_retry(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                vectors = await self._embed_batch(texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(f"Embedding provider returned {len(vectors)} vectors for {len(texts)} texts")
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries or not self._retry_on(e):
+                    raise
+                delay = self.backoff_base * (2 ** attempt) * (1 + random.random() / 4)
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "retries": self.retries,
+            "failures": self.failures,
+            "queued": len(self._pending),
+        }
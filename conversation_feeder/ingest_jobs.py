@@ -0,0 +1,212 @@
+"""
+Durable ingestion jobs backed by the `ingest_jobs` table (see the mcp_server
+migration 20261016_ingest_jobs).
+
+`enqueue` stores a request and returns its id; `IngestWorkers` runs a fixed
+number of async workers that claim jobs with `FOR UPDATE SKIP LOCKED`, so any
+number of feeder instances can share one queue without handing the same job
+to two workers. A job left 'running' by a worker that died is picked up again
+once it has not reported progress for `stale_after` seconds, up to
+`max_attempts` claims in total. A job that failed waits before its next
+attempt (`available_at`), twice as long after each failure, so retries can
+outlast a transient database or embedding outage. Every update a worker makes after claiming a
+job is conditioned on the attempt it claimed, so a slow worker whose job was
+reclaimed cannot overwrite the state written by the new owner.
+"""
+import asyncio
+import json
+from typing import Awaitable, Callable, List, Tuple, Type
+
+import asyncpg
+
+# process(job_id, attempt, payload, report_progress) -> conversation id. It
+# must mark the job succeeded in the same transaction that stores the
+# conversation (see `mark_succeeded`), so a retried job can never be stored twice.
+ProcessJob = Callable[[int, int, dict, Callable[[int], Awaitable[None]]], Awaitable[int]]
+
+CLAIM_SQL = """
+UPDATE ingest_jobs
+SET status = 'running', attempts = attempts + 1, started_at = now(), updated_at = now(), error = NULL
+WHERE id = (
+    SELECT id FROM ingest_jobs
+    WHERE (status = 'queued' AND available_at <= now())
+       OR (status = 'running' AND updated_at < now() - make_interval(secs => $1))
+    ORDER BY id
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+)
+RETURNING id, payload, attempts
+"""
+
+JOB_COLUMNS = (
+    "id, status, message_count, processed_count, conversation_id, attempts, error, "
+    "created_at, started_at, finished_at, updated_at, available_at"
+)
+
+
+async def enqueue(pool: asyncpg.Pool, messages: List[dict], idempotency_key: str | None = None) -> int:
+    payload = {"messages": messages}
+    if idempotency_key is not None:
+        payload["idempotency_key"] = idempotency_key
+    return await pool.fetchval(
+        "INSERT INTO ingest_jobs (payload, message_count) VALUES ($1::jsonb, $2) RETURNING id",
+        json.dumps(payload), len(messages),
+    )
+
+
+async def get_job(pool: asyncpg.Pool, job_id: int) -> dict | None:
+    row = await pool.fetchrow(f"SELECT {JOB_COLUMNS} FROM ingest_jobs WHERE id = $1", job_id)
+    if row is None:
+        return None
+    job = dict(row)
+    for key in ("created_at", "started_at", "finished_at", "updated_at", "available_at"):
+        if job[key] is not None:
+            job[key] = job[key].isoformat()
+    return job
+
+
+class JobReclaimed(Exception):
+    """The job went stale and was claimed again by another worker while this one processed it."""
+
+
+async def mark_succeeded(conn: asyncpg.Connection, job_id: int, attempt: int, conversation_id: int):
+    """
+    Marks a job succeeded, if `attempt` still owns it. Raises JobReclaimed
+    otherwise, which rolls back the surrounding transaction that stored the
+    conversation.
+    """
+    result = await conn.execute(
+        "UPDATE ingest_jobs SET status = 'succeeded', conversation_id = $2, processed_count = message_count, "
+        "payload = '{}'::jsonb, finished_at = now(), updated_at = now() "
+        "WHERE id = $1 AND status = 'running' AND attempts = $3",
+        job_id, conversation_id, attempt,
+    )
+    if result == "UPDATE 0":
+        raise JobReclaimed(f"Ingest job {job_id} was reclaimed after attempt {attempt}")
+
+
+class IngestWorkers:
+    """A pool of workers draining the ingest_jobs table."""
+
+    def __init__(
+        self,
+        get_pool: Callable[[], asyncpg.Pool],
+        process: ProcessJob,
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        stale_after: float = 300.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 5.0,
+        max_retry_backoff: float = 300.0,
+        permanent_errors: Tuple[Type[Exception], ...] = (),
+    ):
+        self._get_pool = get_pool
+        self._process = process
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        # Errors a retry can never fix; the job fails on the first one
+        self.permanent_errors = permanent_errors
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wakes idle workers after a local enqueue instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await self.run_once()
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"Ingest worker error: {e}")
+                claimed = False
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def run_once(self) -> bool:
+        """Claims and processes one job; returns False when the queue is empty."""
+        pool = self._get_pool()
+        job = await pool.fetchrow(CLAIM_SQL, float(self.stale_after))
+        if job is None:
+            return False
+        job_id, attempt = job["id"], job["attempts"]
+        if attempt > self.max_attempts:
+            await self._finish(job_id, attempt, "failed", "Gave up after the worker processing it stopped responding")
+            self.failed += 1
+            return True
+
+        async def report_progress(processed: int):
+            # Also serves as the heartbeat that keeps the job from being reclaimed
+            await pool.execute(
+                "UPDATE ingest_jobs SET processed_count = $2, updated_at = now() WHERE id = $1 AND attempts = $3",
+                job_id, processed, attempt,
+            )
+
+        try:
+            await self._process(job_id, attempt, json.loads(job["payload"]), report_progress)
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back rather than waiting for it to go stale
+            await asyncio.shield(pool.execute(
+                "UPDATE ingest_jobs SET status = 'queued', attempts = attempts - 1, updated_at = now() "
+                "WHERE id = $1 AND attempts = $2",
+                job_id, attempt,
+            ))
+            raise
+        except JobReclaimed as e:
+            # Another worker owns the job now; nothing was stored by this attempt
+            print(f"Ingest worker: {e}")
+        except Exception as e:
+            if attempt < self.max_attempts and not isinstance(e, self.permanent_errors):
+                await self._retry_later(job_id, attempt, str(e))
+                self.retried += 1
+            else:
+                await self._finish(job_id, attempt, "failed", str(e))
+                self.failed += 1
+        return True
+
+    def retry_delay(self, attempt: int) -> float:
+        """Seconds to wait before the attempt after `attempt`: exponential, capped at max_retry_backoff."""
+        return min(self.retry_backoff * 2 ** (attempt - 1), self.max_retry_backoff)
+
+    async def _retry_later(self, job_id: int, attempt: int, error: str):
+        await self._get_pool().execute(
+            "UPDATE ingest_jobs SET status = 'queued', error = $2, updated_at = now(), "
+            "available_at = now() + make_interval(secs => $3) WHERE id = $1 AND attempts = $4",
+            job_id, error, self.retry_delay(attempt), attempt,
+        )
+
+    async def _finish(self, job_id: int, attempt: int, status: str, error: str):
+        await self._get_pool().execute(
+            "UPDATE ingest_jobs SET status = $2, error = $3, updated_at = now(), finished_at = now() "
+            "WHERE id = $1 AND attempts = $4",
+            job_id, status, error, attempt,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
@@ -1,17 +1,47 @@
 import asyncio
 import asyncpg
-import google.generativeai as genai
-from fastapi import FastAPI, Depends, HTTPException, Security, Form
-from fastapi.responses import HTMLResponse
+import hashlib
+import io
+import json
+import zlib
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Security, Form
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.security.api_key import APIKeyHeader
-from pydantic import BaseModel
-from typing import List
+from pgvector.asyncpg import register_vector
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, List
 
+from chunking import TextChunk, chunk_text
 from config import settings
+from embedding_batcher import EmbeddingBatcher
+from embedding_providers import create_embedding_provider
+import ingest_jobs
 
 # --- Configuration & Globals ---
-app = FastAPI(title="Conversation Feeder Service")
-genai.configure(api_key=settings.gemini_api_key)
+# Created in the lifespan and shared by every request
+db_pool: asyncpg.Pool | None = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db_pool
+    db_pool = await asyncpg.create_pool(
+        dsn=settings.database_url,
+        min_size=settings.db_pool_min_size,
+        max_size=settings.db_pool_max_size,
+        command_timeout=settings.db_command_timeout,
+        init=register_vector,
+    )
+    if settings.ingest_workers > 0:
+        job_workers.start()
+    yield
+    await job_workers.stop()
+    await db_pool.close()
+    db_pool = None
+
+
+app = FastAPI(title="Conversation Feeder Service", lifespan=lifespan)
 
 API_KEY_HEADER = APIKeyHeader(name="X-API-Token", auto_error=False)
 
@@ -34,33 +64,340 @@ async def get_api_key(api_key_header: str = Security(API_KEY_HEADER)):
         )
 
 # --- Core Logic ---
-async def generate_embedding(text: str) -> list[float]:
-    try:
-        loop = asyncio.get_running_loop()
-        result = await loop.run_in_executor(
-            None, lambda: genai.embed_content(model='models/embedding-001', content=text)
+def content_hash(text: str) -> str:
+    # Must match mcp_server/mcp/embedding.py so both services share cache entries
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+embedding_provider = create_embedding_provider(
+    settings.embedding_provider,
+    api_key=settings.gemini_api_key,
+    model=settings.embedding_model,
+    dimensions=settings.embedding_dimensions,
+    max_workers=settings.embedding_max_concurrency,
+)
+
+embedding_batcher = EmbeddingBatcher(
+    embedding_provider.embed_batch,
+    max_batch_size=settings.embedding_batch_size,
+    max_wait=settings.embedding_batch_wait_ms / 1000,
+    max_concurrency=settings.embedding_max_concurrency,
+    max_retries=settings.embedding_max_retries,
+    backoff_base=settings.embedding_retry_backoff,
+)
+
+async def generate_embeddings(texts: List[str], pool: asyncpg.Pool | None = None) -> List[list[float] | None]:
+    """
+    Embeds texts through the shared batcher, so they go out as concurrent
+    batches; texts that fail to embed yield None. With a pool, vectors of
+    already stored messages with the same content are reused, and the
+    persistent embedding cache is consulted and filled, using short-lived
+    connections that are never held during remote calls.
+    """
+    model = embedding_provider.model_name
+    digests = [content_hash(text) for text in texts]
+    use_cache = settings.embedding_cache_persistent and pool is not None
+
+    vectors = {}
+    if pool is not None and digests:
+        rows = await pool.fetch(
+            'SELECT DISTINCT ON (content_hash) content_hash, embedding FROM messages '
+            'WHERE content_hash = ANY($1::text[]) AND embedding_model = $2',
+            list(set(digests)), model
         )
-        return result['embedding']
-    except Exception as e:
-        print(f"Error generating embedding: {e}")
-        return None
+        vectors = {row['content_hash']: row['embedding'].tolist() for row in rows}
+    if use_cache and len(vectors) < len(set(digests)):
+        rows = await pool.fetch(
+            'SELECT content_hash, embedding FROM embedding_cache WHERE model = $1 AND content_hash = ANY($2::text[])',
+            model, list(set(digests) - vectors.keys())
+        )
+        vectors.update({row['content_hash']: row['embedding'].tolist() for row in rows})
 
-async def save_conversation_to_db(messages: List[Message]):
-    conn = await asyncpg.connect(dsn=settings.database_url)
-    try:
+    missing = {digest: text for digest, text in zip(digests, texts) if digest not in vectors}
+    results = await asyncio.gather(
+        *(embedding_batcher.embed(text) for text in missing.values()), return_exceptions=True
+    )
+    fresh = {}
+    for digest, result in zip(missing, results):
+        if isinstance(result, Exception):
+            print(f"Error generating embedding: {result}")
+        else:
+            fresh[digest] = result
+
+    if use_cache and fresh:
+        await pool.executemany(
+            'INSERT INTO embedding_cache (model, content_hash, embedding) VALUES ($1, $2, $3) '
+            'ON CONFLICT (model, content_hash) DO NOTHING',
+            [(model, digest, vector) for digest, vector in fresh.items()]
+        )
+    vectors.update(fresh)
+    return [vectors.get(digest) for digest in digests]
+
+def get_pool() -> asyncpg.Pool:
+    if db_pool is None:
+        raise RuntimeError("Database pool is not initialised; the app lifespan has not run.")
+    return db_pool
+
+async def copy_messages(
+    conn: asyncpg.Connection,
+    conv_id: int,
+    messages: List[Message],
+    embeddings: List[list[float] | None],
+    positions: Iterable[int],
+):
+    model = embedding_provider.model_name
+    await conn.copy_records_to_table(
+        'messages',
+        records=[
+            (conv_id, msg.role, msg.content, content_hash(msg.content), position, embedding,
+             model if embedding is not None else None)
+            for msg, embedding, position in zip(messages, embeddings, positions)
+        ],
+        columns=['conversation_id', 'role', 'content', 'content_hash', 'position', 'embedding', 'embedding_model'],
+    )
+
+async def embed_chunks(messages: List[Message], pool: asyncpg.Pool | None = None) -> List[List[tuple[TextChunk, list[float]]]]:
+    """
+    Per message, its overlapping chunks with their embeddings; empty for
+    messages short enough to be searched whole, or if any chunk failed to embed.
+    """
+    pieces = [chunk_text(msg.content, settings.chunk_max_chars, settings.chunk_overlap) for msg in messages]
+    texts = [piece.text for message_pieces in pieces for piece in message_pieces]
+    vectors = iter(await generate_embeddings(texts, pool) if texts else [])
+    chunks = []
+    for message_pieces in pieces:
+        embedded = [(piece, next(vectors)) for piece in message_pieces]
+        chunks.append(embedded if all(vector is not None for _, vector in embedded) else [])
+    return chunks
+
+async def copy_chunks(conn: asyncpg.Connection, conv_id: int, positions: Iterable[int], chunks: Iterable[list]):
+    """Writes the chunks of just-copied messages, found by their positions in the conversation."""
+    chunked = {position: message_chunks for position, message_chunks in zip(positions, chunks) if message_chunks}
+    if not chunked:
+        return
+    rows = await conn.fetch(
+        'SELECT id, position FROM messages WHERE conversation_id = $1 AND position = ANY($2::int[])',
+        conv_id, list(chunked)
+    )
+    model = embedding_provider.model_name
+    await conn.copy_records_to_table(
+        'message_chunks',
+        records=[
+            (row['id'], piece.index, piece.start, piece.end, piece.text, vector, model)
+            for row in rows
+            for piece, vector in chunked[row['position']]
+        ],
+        columns=['message_id', 'chunk_index', 'start_offset', 'end_offset', 'content', 'embedding', 'embedding_model'],
+    )
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused for different content."""
+
+async def stored_positions(conn, idempotency_key: str) -> tuple[int | None, dict[int, str]]:
+    """The conversation stored under `idempotency_key`, and the content hash at each stored position."""
+    conv_id = await conn.fetchval('SELECT id FROM conversations WHERE idempotency_key = $1', idempotency_key)
+    if conv_id is None:
+        return None, {}
+    rows = await conn.fetch(
+        'SELECT position, content_hash FROM messages WHERE conversation_id = $1 AND position IS NOT NULL', conv_id
+    )
+    return conv_id, {row['position']: row['content_hash'] for row in rows}
+
+def pending_positions(messages: List[Message], stored: dict[int, str]) -> List[int]:
+    """Positions of `messages` not stored yet. Stored positions must hold the same content."""
+    pending = []
+    for position, msg in enumerate(messages):
+        if position not in stored:
+            pending.append(position)
+        elif stored[position] != content_hash(msg.content):
+            raise IdempotencyConflict(f"Message {position} differs from the one already stored under this idempotency key")
+    return pending
+
+async def save_conversation_to_db(
+    messages: List[Message],
+    idempotency_key: str | None = None,
+    report_progress: Callable[[int], Awaitable[None]] | None = None,
+    on_commit: Callable[[asyncpg.Connection, int], Awaitable[None]] | None = None,
+) -> tuple[int, int]:
+    """
+    Stores a conversation and returns (conversation id, messages written).
+
+    With an idempotency key, the messages are matched by position against the
+    conversation already stored under that key and only the missing ones are
+    embedded and written, so retrying or re-sending an upload (including one
+    that has grown since) never duplicates messages or pays for embeddings twice.
+
+    All embeddings are computed before a connection is taken from the pool,
+    so the transaction only spans the conversation upsert and one binary COPY
+    of the message rows (plus one for the chunks of long messages).
+    `on_commit(conn, conv_id)` runs inside that
+    transaction; `report_progress` receives the number of messages handled.
+    """
+    pool = get_pool()
+    pending = list(range(len(messages)))
+    if idempotency_key is not None:
+        _, stored = await stored_positions(pool, idempotency_key)
+        pending = pending_positions(messages, stored)
+
+    embeddings, chunks = {}, {}
+    batch_size = settings.ingest_batch_size
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        vectors, batch_chunks = await asyncio.gather(
+            generate_embeddings([messages[position].content for position in batch], pool),
+            embed_chunks([messages[position] for position in batch], pool),
+        )
+        embeddings.update(zip(batch, vectors))
+        chunks.update(zip(batch, batch_chunks))
+        if report_progress is not None:
+            await report_progress(len(messages) - len(pending) + len(embeddings))
+
+    async with pool.acquire() as conn:
         async with conn.transaction():
-            # Create a new conversation record
-            conv_id = await conn.fetchval('INSERT INTO conversations DEFAULT VALUES RETURNING id')
-
-            # Generate embeddings and insert messages
-            for msg in messages:
-                embedding = await generate_embedding(msg.content)
-                await conn.execute(
-                    'INSERT INTO messages (conversation_id, role, content, embedding) VALUES ($1, $2, $3, $4)',
-                    conv_id, msg.role, msg.content, embedding
+            if idempotency_key is None:
+                conv_id = await conn.fetchval('INSERT INTO conversations DEFAULT VALUES RETURNING id')
+            else:
+                # The upsert locks the conversation row, so concurrent uploads under
+                # one key are serialised; re-check what the others have written since
+                conv_id = await conn.fetchval(
+                    'INSERT INTO conversations (idempotency_key) VALUES ($1) '
+                    'ON CONFLICT (idempotency_key) DO UPDATE SET idempotency_key = EXCLUDED.idempotency_key '
+                    'RETURNING id',
+                    idempotency_key
                 )
+                _, stored = await stored_positions(conn, idempotency_key)
+                pending = pending_positions(messages, stored)
+            await copy_messages(
+                conn, conv_id, [messages[position] for position in pending],
+                [embeddings.get(position) for position in pending], pending,
+            )
+            await copy_chunks(conn, conv_id, pending, [chunks.get(position) for position in pending])
+            if on_commit is not None:
+                await on_commit(conn, conv_id)
+    return conv_id, len(pending)
+
+# --- Queued ingestion ---
+async def process_ingest_job(job_id: int, attempt: int, payload: dict, report_progress) -> int:
+    """
+    Stores a queued conversation and marks the job succeeded in a single
+    transaction: a job that is retried after a crash is either fully stored
+    already or not at all. If the job was reclaimed meanwhile, marking it
+    fails and nothing is stored.
+    """
+    async def mark_succeeded(conn, conv_id):
+        await ingest_jobs.mark_succeeded(conn, job_id, attempt, conv_id)
+
+    conv_id, _ = await save_conversation_to_db(
+        [Message(**msg) for msg in payload["messages"]],
+        idempotency_key=payload.get("idempotency_key"),
+        report_progress=report_progress,
+        on_commit=mark_succeeded,
+    )
+    return conv_id
+
+job_workers = ingest_jobs.IngestWorkers(
+    get_pool,
+    process_ingest_job,
+    workers=settings.ingest_workers,
+    poll_interval=settings.ingest_job_poll_interval,
+    stale_after=settings.ingest_job_stale_after,
+    max_attempts=settings.ingest_job_max_attempts,
+    retry_backoff=settings.ingest_job_retry_backoff,
+    max_retry_backoff=settings.ingest_job_max_retry_backoff,
+    permanent_errors=(IdempotencyConflict,),
+)
+
+# --- Streaming ingestion ---
+def _inflate(decompressor, data: bytes, max_length: int = 1 << 16) -> Iterable[bytes]:
+    """Decompresses in bounded pieces so a small, highly compressed upload cannot balloon in memory."""
+    while data:
+        try:
+            yield decompressor.decompress(data, max_length)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip data: {e}") from e
+        data = decompressor.unconsumed_tail
+
+async def iter_ndjson_lines(chunks: AsyncIterable[bytes], gzipped: bool = False, max_line_bytes: int = 1_000_000) -> AsyncIterator[bytes]:
+    """Yields the non-empty lines of an (optionally gzip-compressed) byte stream as they complete."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    buffer = b""
+
+    def complete_lines(data: bytes) -> List[bytes]:
+        nonlocal buffer
+        *lines, buffer = (buffer + data).split(b"\n")
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"Line exceeds {max_line_bytes} bytes")
+        return [line for line in lines if line.strip()]
+
+    async for chunk in chunks:
+        for data in (_inflate(decompressor, chunk) if decompressor else (chunk,)):
+            for line in complete_lines(data):
+                yield line
+    if decompressor:
+        for line in complete_lines(decompressor.flush()):
+            yield line
+    if buffer.strip():
+        yield buffer
+
+async def parse_ndjson_messages(lines: AsyncIterable[bytes]) -> AsyncIterator[Message]:
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        try:
+            yield Message.model_validate_json(line)
+        except ValidationError as e:
+            raise ValueError(f"Invalid message on line {line_number}: {e.errors()[0]['msg']}") from e
+
+async def ingest_in_batches(messages: AsyncIterable[Message], batch_size: int, queue_batches: int) -> AsyncIterator[dict]:
+    """
+    Stores a stream of messages as one conversation, embedding and committing
+    `batch_size` messages at a time, and yields a progress record per batch.
+
+    Parsing runs ahead of the writer by at most `queue_batches` batches; after
+    that it waits, which in turn stops reading from the client. Memory use is
+    therefore bounded by the batch size, not the upload size. Batches committed
+    before an error stay committed, and the error is reported as the last record.
+    """
+    pool = get_pool()
+    queue: asyncio.Queue[List[Message] | Exception | None] = asyncio.Queue(maxsize=queue_batches)
+
+    async def read():
+        batch = []
+        try:
+            async for message in messages:
+                batch.append(message)
+                if len(batch) >= batch_size:
+                    await queue.put(batch)
+                    batch = []
+            if batch:
+                await queue.put(batch)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    reader = asyncio.create_task(read())
+    conv_id, batches, total = None, 0, 0
+    try:
+        while (batch := await queue.get()) is not None:
+            if isinstance(batch, Exception):
+                raise batch
+            embeddings, chunks = await asyncio.gather(
+                generate_embeddings([msg.content for msg in batch], pool), embed_chunks(batch, pool)
+            )
+            positions = range(total, total + len(batch))
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    if conv_id is None:
+                        conv_id = await conn.fetchval('INSERT INTO conversations DEFAULT VALUES RETURNING id')
+                    await copy_messages(conn, conv_id, batch, embeddings, positions)
+                    await copy_chunks(conn, conv_id, positions, chunks)
+            batches += 1
+            total += len(batch)
+            yield {"batch": batches, "batch_size": len(batch), "message_count": total, "conversation_id": conv_id}
+        yield {"status": "success", "conversation_id": conv_id, "message_count": total, "batches": batches}
+    except ValueError as e:
+        yield {"status": "error", "detail": str(e), "conversation_id": conv_id, "message_count": total}
     finally:
-        await conn.close()
+        reader.cancel()
 
 # --- API Endpoints ---
 @app.get("/")
@@ -68,21 +405,114 @@ async def read_root():
     with open("static/index.html") as f:
         return HTMLResponse(content=f.read())
 
+def iter_transcript(transcript: str) -> Iterable[Message]:
+    """Parses 'role: content' lines lazily instead of splitting the whole transcript up front."""
+    for line in io.StringIO(transcript.strip()):
+        role, content = line.split(':', 1)
+        yield Message(role=role.strip(), content=content.strip())
+
 @app.post("/ingest-form")
 async def ingest_from_form(transcript: str = Form(...)):
-    messages = []
     try:
-        for line in transcript.strip().split('\n'):
-            role, content = line.split(':', 1)
-            messages.append(Message(role=role.strip(), content=content.strip()))
+        messages = list(iter_transcript(transcript))
     except ValueError:
         return HTMLResponse(content="<p class='error'>Failed to parse transcript. Ensure format is 'role: content'.</p>", status_code=400)
-    
+
+    # A pasted transcript is small enough to store in one transaction: all of it or nothing
     await save_conversation_to_db(messages)
     return HTMLResponse(content="<p class='success'>Conversation ingested successfully!</p>")
 
 @app.post("/api/ingest")
-async def api_ingest(request: IngestionRequest, api_key: str = Depends(get_api_key)):
-    """API endpoint to ingest a conversation with token-based authentication."""
-    await save_conversation_to_db(request.messages)
-    return {"status": "success", "message_count": len(request.messages)}
+async def api_ingest(
+    request: IngestionRequest,
+    response: Response,
+    queue: bool = False,
+    idempotency_key: str | None = Header(None, max_length=255),
+    api_key: str = Depends(get_api_key),
+):
+    """
+    API endpoint to ingest a conversation with token-based authentication. With
+    `?queue=true` the conversation is stored as a job and processed by the
+    ingest workers; the 202 response carries the id to poll at /api/jobs/{id}.
+    With an `Idempotency-Key` header, messages already stored under that key
+    are skipped (see save_conversation_to_db).
+    """
+    if queue:
+        job_id = await ingest_jobs.enqueue(
+            get_pool(), [msg.model_dump() for msg in request.messages], idempotency_key=idempotency_key
+        )
+        job_workers.notify()
+        response.status_code = 202
+        return {"status": "queued", "job_id": job_id, "message_count": len(request.messages)}
+    try:
+        conversation_id, stored = await save_conversation_to_db(request.messages, idempotency_key=idempotency_key)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    return {
+        "status": "success",
+        "conversation_id": conversation_id,
+        "message_count": len(request.messages),
+        "stored_count": stored,
+        "skipped_count": len(request.messages) - stored,
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def api_job_status(job_id: int, api_key: str = Depends(get_api_key)):
+    """Status and progress of a queued ingestion job."""
+    job = await ingest_jobs.get_job(get_pool(), job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Streaming ingestions still writing after their response was cut short
+_stream_ingests: set[asyncio.Task] = set()
+
+@app.post("/api/ingest/stream")
+async def api_ingest_stream(request: Request, api_key: str = Depends(get_api_key)):
+    """
+    Streaming ingestion for large transcripts: the body is newline-delimited JSON,
+    one {"role": ..., "content": ...} object per line, optionally gzip-compressed
+    (Content-Encoding: gzip). It is parsed incrementally and stored as one
+    conversation in committed batches. The response is NDJSON too: one progress
+    record per batch, then a final record with "status".
+
+    The upload is consumed before the response starts. Under ASGI < 2.4 (as
+    uvicorn declares) a StreamingResponse listens for disconnects by calling
+    receive() itself, which would swallow the rest of the body. Batches are
+    still embedded and committed while the upload arrives, so memory stays
+    bounded; progress records for them are sent once the response starts.
+    """
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    uploaded = asyncio.Event()
+
+    async def upload():
+        async for chunk in request.stream():
+            yield chunk
+        uploaded.set()
+
+    lines = iter_ndjson_lines(upload(), gzipped=gzipped, max_line_bytes=settings.ingest_max_line_bytes)
+    progress: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    async def ingest():
+        try:
+            async for record in ingest_in_batches(parse_ndjson_messages(lines), settings.ingest_batch_size, settings.ingest_queue_batches):
+                progress.put_nowait(record)
+        except Exception as e:
+            print(f"Streaming ingestion failed: {e}")
+            progress.put_nowait({"status": "error", "detail": str(e)})
+        finally:
+            progress.put_nowait(None)
+
+    writer = asyncio.create_task(ingest())
+    _stream_ingests.add(writer)
+    writer.add_done_callback(_stream_ingests.discard)
+    # Returns early only if ingestion stopped first, e.g. on a malformed line
+    waiter = asyncio.create_task(uploaded.wait())
+    await asyncio.wait({writer, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    waiter.cancel()
+
+    async def body():
+        while (record := await progress.get()) is not None:
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
@@ -1,12 +1,14 @@
 import os
-import time
 import asyncio
 from google.adk.agents import Agent
 from memory_tool import log_to_database
+from tailer import Tailer
 
 # --- Configuration ---
-FILE_TO_WATCH = "/var/data/gemini/GEMINI.md"
-POLL_INTERVAL_SECONDS = 5
+# Comma-separated paths or globs, e.g. "/var/data/gemini/*.md"
+FILES_TO_WATCH = os.environ.get("WATCH_FILES", "/var/data/gemini/GEMINI.md").split(",")
+# inotify wakes the logger as soon as a file changes; this poll is the fallback
+POLL_INTERVAL_SECONDS = float(os.environ.get("POLL_INTERVAL_SECONDS", 5))
 
 class ConversationLoggerAgent:
     def __init__(self):
@@ -15,45 +17,28 @@ class ConversationLoggerAgent:
             instruction="Your job is to log conversation snippets to a database using the provided tool.",
             tools=[log_to_database]
         )
-        self._last_seen_timestamp = 0
-        self._last_content = ""
-
-    def _read_new_content(self) -> str | None:
-        try:
-            current_timestamp = os.path.getmtime(FILE_TO_WATCH)
-            if current_timestamp > self._last_seen_timestamp:
-                with open(FILE_TO_WATCH, 'r') as f:
-                    full_content = f.read()
-                
-                if self._last_content in full_content:
-                    new_content = full_content[len(self._last_content):]
-                else:
-                    new_content = full_content
-
-                self._last_seen_timestamp = current_timestamp
-                self._last_content = full_content
-                return new_content.strip()
-        except FileNotFoundError:
-            self._last_seen_timestamp = 0
-            self._last_content = ""
-        return None
+        # Only text appended after startup is logged
+        self._tailer = Tailer([pattern.strip() for pattern in FILES_TO_WATCH if pattern.strip()], poll_interval=POLL_INTERVAL_SECONDS)
 
     async def run_loop(self):
-        print(f"Starting conversation logger. Watching file: {FILE_TO_WATCH}")
-        while True:
-            new_content = self._read_new_content()
-            if new_content:
-                print("Detected new content. Logging to database...")
+        mode = "inotify" if self._tailer.uses_inotify else f"polling every {POLL_INTERVAL_SECONDS}s"
+        print(f"Starting conversation logger. Watching: {', '.join(self._tailer.patterns)} ({mode})")
+        try:
+            async for path, appended in self._tailer.follow():
+                new_content = appended.strip()
+                if not new_content:
+                    continue
+                print(f"Detected new content in {path}. Logging to database...")
                 response = await self._agent.send_message(
-                    f'Log the following conversation snippet: "{new_content}'
+                    f'Log the following conversation snippet: "{new_content}"'
                 )
                 if response.tool_calls:
                     for call in response.tool_calls:
                         print(f"Tool call result: {call.result}")
                 else:
                     print(f"Agent response: {response.text}")
-            
-            time.sleep(POLL_INTERVAL_SECONDS)
+        finally:
+            self._tailer.close()
 
 async def main():
     logger_agent = ConversationLoggerAgent()
@@ -0,0 +1,224 @@
+"""
+Follows appended text in a set of files, like `tail -F` for several globs.
+
+Each file is read from a byte offset, so only new bytes are read. Its
+(device, inode) is tracked to detect rotation: the old file is drained before
+switching to the new one, which is then read from its start. A file that
+shrinks below the offset was truncated and is read again from the start.
+Multi-byte characters split across reads are decoded correctly.
+
+On Linux the parent directories are watched with inotify (through libc, no
+extra dependency), so changes are picked up as they happen. Elsewhere, or for
+directories that cannot be watched, the files are polled every
+`poll_interval` seconds. Polling also stays on as a fallback next to inotify.
+"""
+import asyncio
+import codecs
+import ctypes
+import ctypes.util
+import glob
+import os
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
+
+# inotify(7) events that can mean a watched file grew, appeared or was replaced
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class FileTail:
+    """The read position in one file: an open handle, its identity and a byte offset."""
+
+    def __init__(self, path: str, start_at_end: bool = False, max_read_bytes: int = 1 << 20):
+        self.path = path
+        self.max_read_bytes = max_read_bytes
+        self._file = None
+        self._identity: Tuple[int, int] | None = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.offset = 0
+        if start_at_end and self._open():
+            self.offset = os.fstat(self._file.fileno()).st_size
+            self._file.seek(self.offset)
+
+    def _open(self) -> bool:
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        stat = os.fstat(self._file.fileno())
+        self._identity = (stat.st_dev, stat.st_ino)
+        self.offset = 0
+        self._decoder.reset()
+        return True
+
+    def _drain(self) -> str:
+        """Reads everything after the offset from the open handle, a bounded chunk at a time."""
+        pieces = []
+        while data := self._file.read(self.max_read_bytes):
+            self.offset += len(data)
+            pieces.append(self._decoder.decode(data))
+        return "".join(pieces)
+
+    def read_new(self) -> str:
+        """Returns the text appended since the last call ('' if there is none)."""
+        if self._file is None and not self._open():
+            return ""
+        text = ""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or (stat.st_dev, stat.st_ino) != self._identity:
+            # Rotated or removed: finish the old file, then follow the new one from its start
+            text = self._drain()
+            self.close()
+            if stat is None or not self._open():
+                return text
+        elif stat.st_size < self.offset:
+            # Truncated in place
+            self._file.seek(0)
+            self.offset = 0
+            self._decoder.reset()
+        return text + self._drain()
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._identity = None
+
+
+class _Inotify:
+    """A minimal non-blocking inotify handle using libc through ctypes."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched = set()
+
+    def watch(self, directory: str) -> bool:
+        if directory in self._watched:
+            return True
+        if self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            return False
+        self._watched.add(directory)
+        return True
+
+    def drain(self):
+        """Discards queued events; callers only need to know that something changed."""
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _open_inotify() -> _Inotify | None:
+    try:
+        return _Inotify()
+    except (OSError, AttributeError):
+        # Not Linux, no libc symbol, or out of inotify instances
+        return None
+
+
+class Tailer:
+    """
+    Follows every file matching `patterns` (paths or globs) from one event loop.
+
+    Files present at start are followed from their current end when
+    `start_at_end` is set; files that appear later are read from the start.
+    """
+
+    def __init__(self, patterns: Iterable[str], poll_interval: float = 5.0, start_at_end: bool = True, use_inotify: bool = True):
+        self.patterns = list(patterns)
+        self.poll_interval = poll_interval
+        self._tails: Dict[str, FileTail] = {}
+        self._changed = asyncio.Event()
+        self._inotify = _open_inotify() if use_inotify else None
+        for path in self._matching_paths():
+            self._tails[path] = FileTail(path, start_at_end=start_at_end)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify is not None
+
+    def _matching_paths(self) -> List[str]:
+        paths = []
+        for pattern in self.patterns:
+            matches = glob.glob(pattern) if glob.has_magic(pattern) else [pattern] if os.path.exists(pattern) else []
+            paths += [path for path in matches if os.path.isfile(path) and path not in paths]
+        return paths
+
+    def _watch_directories(self):
+        directories = {os.path.dirname(os.path.abspath(path)) for path in self._tails}
+        directories |= {
+            os.path.dirname(os.path.abspath(pattern)) for pattern in self.patterns
+            if not glob.has_magic(os.path.dirname(pattern))
+        }
+        for directory in directories:
+            if os.path.isdir(directory):
+                self._inotify.watch(directory)
+
+    def _read_all(self) -> List[Tuple[str, str]]:
+        for path in self._matching_paths():
+            if path not in self._tails:
+                self._tails[path] = FileTail(path)
+        updates = []
+        for path, tail in list(self._tails.items()):
+            text = tail.read_new()
+            if text:
+                updates.append((path, text))
+            if not tail.is_open and not os.path.exists(path):
+                del self._tails[path]
+        return updates
+
+    def _on_inotify_event(self):
+        self._inotify.drain()
+        self._changed.set()
+
+    async def follow(self) -> AsyncIterator[Tuple[str, str]]:
+        """Yields (path, appended text) as files grow."""
+        loop = asyncio.get_running_loop()
+        if self._inotify is not None:
+            loop.add_reader(self._inotify.fd, self._on_inotify_event)
+        try:
+            while True:
+                if self._inotify is not None:
+                    self._watch_directories()
+                # Cleared before reading, so a change during the read triggers another pass
+                self._changed.clear()
+                # File reads happen off the event loop
+                for update in await asyncio.to_thread(self._read_all):
+                    yield update
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._inotify is not None:
+                loop.remove_reader(self._inotify.fd)
+
+    def close(self):
+        for tail in self._tails.values():
+            tail.close()
+        self._tails.clear()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
@@ -0,0 +1,112 @@
+"""
+Deterministic synthetic conversations for benchmarks.
+
+Words are drawn from a generated vocabulary with a Zipf-like distribution, so
+lexical and vector search see realistic skew (a few very common terms, a long
+tail of rare ones). The same seed always yields the same corpus and queries.
+"""
+import numpy as np
+from typing import Iterator, List
+from mcp.database import db
+from mcp.embedding_providers import LocalEmbeddingProvider
+from .fakes import InMemoryCorpusBackend
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qu", "do", "fe", "gi", "hu", "xo"]
+
+
+class SyntheticCorpus:
+    def __init__(self, vocab_size: int = 5000, words_per_message: int = 16, messages_per_conversation: int = 20, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.vocabulary = [
+            "".join(rng.choice(_SYLLABLES, size=rng.integers(2, 5))) + str(i) for i in range(vocab_size)
+        ]
+        # Zipf-Mandelbrot: the offset keeps the head from dominating every message
+        weights = 1.0 / (np.arange(vocab_size) + 50.0)
+        self._cdf = np.cumsum(weights / weights.sum())
+        self.words_per_message = words_per_message
+        self.messages_per_conversation = messages_per_conversation
+        self.seed = seed
+
+    def _text(self, rng: np.random.Generator, words: int) -> str:
+        picks = np.minimum(np.searchsorted(self._cdf, rng.random(words)), len(self.vocabulary) - 1)
+        return " ".join(self.vocabulary[i] for i in picks)
+
+    def messages(self, start: int, stop: int) -> List[tuple[str, str, int]]:
+        """(role, content, conversation_id) for message numbers [start, stop); stable per number."""
+        rows = []
+        for number in range(start, stop):
+            rng = np.random.default_rng((self.seed, number))
+            conversation_id = number // self.messages_per_conversation + 1
+            role = "user" if number % 2 == 0 else "assistant"
+            rows.append((role, self._text(rng, self.words_per_message), conversation_id))
+        return rows
+
+    def queries(self, count: int) -> List[str]:
+        # A stream separate from every message number
+        rng = np.random.default_rng((self.seed, 2**32))
+        return [self._text(rng, max(3, self.words_per_message // 2)) for _ in range(count)]
+
+    def chunks(self, start: int, stop: int, chunk_size: int) -> Iterator[tuple[int, List[tuple[str, str, int]]]]:
+        """
+        (first message number, rows) for [start, stop) in pieces of about
+        `chunk_size` messages. Pieces end on conversation boundaries, so only
+        a conversation cut by `start` or `stop` itself is split.
+        """
+        per_conversation = self.messages_per_conversation
+        chunk_size = max(per_conversation, chunk_size - chunk_size % per_conversation)
+        chunk_start = start
+        while chunk_start < stop:
+            chunk_stop = min(stop, (chunk_start // chunk_size + 1) * chunk_size)
+            yield chunk_start, self.messages(chunk_start, chunk_stop)
+            chunk_start = chunk_stop
+
+
+async def load_in_memory(
+    backend: InMemoryCorpusBackend,
+    corpus: SyntheticCorpus,
+    embedder: LocalEmbeddingProvider,
+    start: int,
+    stop: int,
+    chunk_size: int = 5000,
+):
+    """Loads corpus messages [start, stop) into the in-memory backend; ids are message number + 1."""
+    for chunk_start, rows in corpus.chunks(start, stop, chunk_size):
+        vectors = embedder.embed_sync([content for _, content, _ in rows])
+        backend.load(list(range(chunk_start + 1, chunk_start + 1 + len(rows))), rows, vectors)
+
+
+async def load_postgres(corpus: SyntheticCorpus, embedder: LocalEmbeddingProvider, size: int, chunk_size: int = 2000) -> int:
+    """
+    Tops the `messages` table of the configured database up to `size` rows with
+    synthetic conversations. Returns the number of rows added. Only use this
+    against a database dedicated to benchmarking.
+
+    Conversations keep their synthetic size: a run that starts mid-conversation
+    continues the last stored conversation rather than opening a new one.
+    """
+    async with db.get_pool().acquire() as connection:
+        existing = await connection.fetchval('SELECT count(*) FROM messages')
+        last_conversation = await connection.fetchval('SELECT conversation_id FROM messages ORDER BY id DESC LIMIT 1')
+    conversation_ids = {}
+    if existing % corpus.messages_per_conversation and last_conversation is not None:
+        conversation_ids[existing // corpus.messages_per_conversation + 1] = last_conversation
+    added = 0
+    for _, rows in corpus.chunks(existing, size, chunk_size):
+        vectors = embedder.embed_sync([content for _, content, _ in rows])
+        async with db.get_pool().acquire() as connection:
+            async with connection.transaction():
+                for _, _, synthetic_id in rows:
+                    if synthetic_id not in conversation_ids:
+                        conversation_ids[synthetic_id] = await connection.fetchval(
+                            'INSERT INTO conversations DEFAULT VALUES RETURNING id'
+                        )
+                await connection.copy_records_to_table(
+                    'messages',
+                    records=[
+                        (conversation_ids[synthetic_id], role, content, vector, embedder.model_name)
+                        for (role, content, synthetic_id), vector in zip(rows, vectors)
+                    ],
+                    columns=['conversation_id', 'role', 'content', 'embedding', 'embedding_model'],
+                )
+        added += len(rows)
+    return added
@@ -0,0 +1,120 @@
+"""
+Offline stand-ins used by the benchmark suite: an LLM with configurable
+latency, an in-memory corpus backend and in-memory persistence, so the full
+/chat and /search pipelines can be driven without network access or Postgres.
+"""
+import asyncio
+import random
+import re
+from collections import Counter, defaultdict
+from typing import List
+from mcp.adapters.base import BaseAdapter
+from mcp.backends.base import SearchBackend
+from mcp.database.schema import Message
+from mcp.vector_index import MmapVectorIndex
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class FakeLLMAdapter(BaseAdapter):
+    """
+    Answers after `latency` seconds (plus up to `jitter` seconds at random) with
+    a canned reply of `reply_words` words, streamed in `stream_chunks` pieces.
+    """
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.0, reply_words: int = 60, stream_chunks: int = 10, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.reply = " ".join(f"word{i}" for i in range(reply_words))
+        self.stream_chunks = max(1, stream_chunks)
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self) -> float:
+        return self.latency + self._rng.uniform(0, self.jitter)
+
+    async def send_message(self, message: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        return self.reply
+
+    async def stream_message(self, message: str):
+        self.calls += 1
+        words = self.reply.split(" ")
+        step = max(1, len(words) // self.stream_chunks)
+        delay = self._delay() / self.stream_chunks
+        for start in range(0, len(words), step):
+            await asyncio.sleep(delay)
+            yield " ".join(words[start:start + step]) + " "
+
+
+class InMemoryCorpusBackend(SearchBackend):
+    """
+    Exact vector search over a `MmapVectorIndex` plus an inverted index for
+    lexical search, with message contents kept as plain strings so corpora of
+    a million messages fit in memory. Messages are hydrated on demand.
+    """
+
+    def __init__(self, path: str, dim: int = 768, dtype: str = "float32"):
+        self.index = MmapVectorIndex(path, dim=dim, dtype=dtype)
+        self.contents: dict[int, tuple[str, str, int]] = {}
+        self._postings: defaultdict[str, list[int]] = defaultdict(list)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def load(self, ids: List[int], rows: List[tuple[str, str, int]], vectors):
+        """Bulk-loads (role, content, conversation_id) rows and their vectors."""
+        self.index.add(ids, vectors)
+        for message_id, row in zip(ids, rows):
+            self.contents[message_id] = row
+            for token in set(_TOKEN_RE.findall(row[1].lower())):
+                self._postings[token].append(message_id)
+
+    def _message(self, message_id: int) -> Message:
+        role, content, conversation_id = self.contents[message_id]
+        return Message(id=message_id, role=role, content=content, conversation_id=conversation_id)
+
+    async def add(self, messages: List[Message]):
+        messages = [m for m in messages if m.id is not None and m.embedding is not None]
+        if messages:
+            await asyncio.to_thread(
+                self.load,
+                [m.id for m in messages],
+                [(m.role, m.content, m.conversation_id) for m in messages],
+                [m.embedding for m in messages],
+            )
+
+    async def lexical_search(self, query_text: str, limit: int) -> List[Message]:
+        hits = Counter()
+        for token in set(_TOKEN_RE.findall(query_text.lower())):
+            hits.update(self._postings.get(token, ()))
+        return [self._message(message_id) for message_id, _ in hits.most_common(limit)]
+
+    async def search(self, query_embedding, limit, metric, ef_search=None, probes=None) -> List[Message]:
+        ids, _ = await asyncio.to_thread(self.index.search, query_embedding, limit, metric)
+        return [self._message(int(i)) for i in ids if int(i) in self.contents]
+
+    async def stop(self):
+        self.index.flush()
+
+
+class InMemoryStore:
+    """Replaces `ensure_conversation`/`save_messages` for runs without Postgres."""
+
+    def __init__(self, next_message_id: int = 1, next_conversation_id: int = 1):
+        self.next_message_id = next_message_id
+        self.next_conversation_id = next_conversation_id
+
+    async def ensure_conversation(self, conversation_id: int | None) -> int:
+        if conversation_id:
+            return conversation_id
+        self.next_conversation_id += 1
+        return self.next_conversation_id - 1
+
+    async def save_messages(self, conversation_id: int, messages: List[Message]) -> List[Message]:
+        for message in messages:
+            message.conversation_id = conversation_id
+            message.id = self.next_message_id
+            self.next_message_id += 1
+        return messages
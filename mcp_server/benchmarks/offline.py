@@ -0,0 +1,10 @@
+"""
+Offline defaults for the benchmark entry points. Import this before anything
+from `mcp` or `config`, since the app's settings are read once at import time.
+"""
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/mcp_benchmark")
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+os.environ.setdefault("EMBEDDING_CACHE_PERSISTENT", "false")
@@ -0,0 +1,206 @@
+"""
+Retrieval quality vs. speed: recall@k and MRR of each search configuration
+against exact nearest neighbours, with per-query latency.
+
+Ground truth is an exact top-k over the same embeddings, computed with
+vectorised NumPy (whole messages only, so chunk search is off for pgvector). Every configuration is queried through
+`find_relevant_messages` (vector mode, precomputed query embeddings), so
+results include the same code path /search uses. Run from mcp_server/:
+
+    python -m benchmarks.recall --corpus-size 100000 --queries 200 --k 10
+    python -m benchmarks.recall --backend pgvector --ef-search 20,40,80,160 --probes 1,4,16
+
+The synthetic corpus is the one used by benchmarks.run. With `--backend
+pgvector` the embeddings are exported from DATABASE_URL instead, and both the
+in-process indexes and the database's own vector index are evaluated on them.
+Every embedded row is exported, since pgvector searches the whole table; the
+run refuses to start if there are more than `--corpus-size`. `--ef-search`
+and `--probes` are only evaluated if an HNSW or IVFFlat index exists for the
+metric, otherwise the database scans exactly and one "pgvector exact" row is
+reported.
+"""
+from . import offline  # noqa: F401 - sets env defaults before the app is imported
+import argparse
+import asyncio
+import json
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+import numpy as np
+from mcp import search
+from mcp.backends.base import SearchBackend
+from mcp.backends.pgvector import PgVectorBackend
+from mcp.database import db
+from mcp.embedding_providers import LocalEmbeddingProvider
+from config import settings
+from .corpus import SyntheticCorpus
+from .fakes import InMemoryCorpusBackend
+from .stats import exact_top_k, latency_summary, mean_reciprocal_rank, pareto_front, recall_at_k
+
+
+@dataclass
+class Configuration:
+    name: str
+    backend: SearchBackend
+    params: dict = field(default_factory=dict)
+
+
+OPERATOR_CLASSES = {"l2": "vector_l2_ops", "cosine": "vector_cosine_ops", "ip": "vector_ip_ops"}
+
+
+def vector_index_methods(indexdefs: list[str], metric: str) -> set[str]:
+    """Access methods ('hnsw', 'ivfflat') of the indexes on messages.embedding that serve `metric`."""
+    pattern = re.compile(rf"USING (hnsw|ivfflat) \(embedding {OPERATOR_CLASSES[metric]}\)")
+    return {match.group(1) for match in map(pattern.search, indexdefs) if match}
+
+
+def pgvector_configurations(methods: set[str], ef_search: list[int], probes: list[int]) -> list[Configuration]:
+    """One configuration per knob value of each index type that exists, or an exact scan."""
+    configs = []
+    if "hnsw" in methods:
+        configs += [
+            Configuration(f"pgvector hnsw ef_search={value}", PgVectorBackend(chunks=False), {"ef_search": value})
+            for value in ef_search
+        ]
+    if "ivfflat" in methods:
+        configs += [
+            Configuration(f"pgvector ivfflat probes={value}", PgVectorBackend(chunks=False), {"probes": value})
+            for value in probes
+        ]
+    if not methods:
+        configs.append(Configuration("pgvector exact", PgVectorBackend(chunks=False)))
+    return configs
+
+
+async def evaluate(config: Configuration, queries: np.ndarray, truth: np.ndarray, metric: str) -> dict:
+    search.set_search_backend(config.backend)
+    found, latencies = [], []
+    try:
+        for query in queries:
+            started = time.perf_counter()
+            messages = await search.find_relevant_messages(
+                "", limit=truth.shape[1], metric=metric, mode="vector", query_embedding=query.tolist(), **config.params
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            found.append([message.id for message in messages])
+    finally:
+        search.set_search_backend(None)
+    return {
+        "name": config.name,
+        "recall": round(recall_at_k(found, truth), 4),
+        "mrr": round(mean_reciprocal_rank(found, truth), 4),
+        "latency_ms": latency_summary(latencies),
+        "qps": round(len(latencies) / (sum(latencies) / 1000), 1) if latencies else 0.0,
+    }
+
+
+def print_table(rows: list[dict], k: int):
+    front = pareto_front(rows)
+    print(f"\n{'configuration':<28} {f'recall@{k}':>10} {'MRR':>7} {'p50 ms':>8} {'p95 ms':>8} {'qps':>8}  pareto")
+    for row in sorted(rows, key=lambda r: r["latency_ms"]["p50"]):
+        latency = row["latency_ms"]
+        marker = "*" if row["name"] in front else ""
+        print(
+            f"{row['name']:<28} {row['recall']:>10.4f} {row['mrr']:>7.4f} {latency['p50']:>8.2f} "
+            f"{latency['p95']:>8.2f} {row['qps']:>8.1f}  {marker}"
+        )
+
+
+async def load_corpus(args) -> tuple[np.ndarray, np.ndarray, list[tuple[str, str, int]], np.ndarray]:
+    """Returns (ids, vectors, rows, query vectors) from the synthetic corpus or the database."""
+    embedder = LocalEmbeddingProvider(dimensions=args.dim)
+    rng = np.random.default_rng(args.seed)
+    if args.backend == "pgvector":
+        async with db.get_pool().acquire() as connection:
+            total = await connection.fetchval('SELECT count(*) FROM messages WHERE embedding IS NOT NULL')
+            if total > args.corpus_size:
+                # Neighbours outside the export would count as misses and understate recall
+                raise SystemExit(
+                    f"messages has {total} embedded rows but --corpus-size is {args.corpus_size}; "
+                    f"pass --corpus-size {total} or more to export them all."
+                )
+            records = await connection.fetch('SELECT id, embedding FROM messages WHERE embedding IS NOT NULL ORDER BY id')
+        ids = np.asarray([record['id'] for record in records], dtype=np.int64)
+        vectors = np.asarray([record['embedding'] for record in records], dtype=np.float32)
+        rows = [("user", "", 0)] * len(ids)
+        # Stored messages as queries, nudged so they are not trivially their own nearest neighbour
+        picks = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+        noise = rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32) * args.query_noise
+        queries = vectors[picks] + noise * np.linalg.norm(vectors[picks], axis=1, keepdims=True) / np.sqrt(vectors.shape[1])
+        return ids, vectors, rows, queries
+
+    corpus = SyntheticCorpus(seed=args.seed)
+    rows = corpus.messages(0, args.corpus_size)
+    vectors = np.concatenate([
+        embedder.embed_sync([content for _, content, _ in rows[start:start + 5000]])
+        for start in range(0, len(rows), 5000)
+    ])
+    ids = np.arange(1, len(rows) + 1, dtype=np.int64)
+    queries = embedder.embed_sync(corpus.queries(args.queries))
+    return ids, vectors, rows, queries
+
+
+async def run(args) -> list[dict]:
+    if args.backend == "pgvector":
+        await db.connect_to_db()
+    try:
+        ids, vectors, rows, queries = await load_corpus(args)
+        print(f"Corpus: {len(ids)} vectors of dim {vectors.shape[1]}, {len(queries)} queries, metric={args.metric}")
+        started = time.perf_counter()
+        truth = exact_top_k(vectors, ids, queries, args.k, args.metric)
+        print(f"Exact top-{args.k} in {time.perf_counter() - started:.2f}s")
+
+        with tempfile.TemporaryDirectory(prefix="mcp-recall-") as index_dir:
+            configs = []
+            for dtype in args.dtypes:
+                backend = InMemoryCorpusBackend(f"{index_dir}/{dtype}", dim=vectors.shape[1], dtype=dtype)
+                backend.load(ids.tolist(), rows, vectors)
+                configs.append(Configuration(f"mmap {dtype}", backend))
+            if args.backend == "pgvector":
+                async with db.get_pool().acquire() as connection:
+                    indexdefs = await connection.fetch("SELECT indexdef FROM pg_indexes WHERE tablename = 'messages'")
+                methods = vector_index_methods([row['indexdef'] for row in indexdefs], args.metric)
+                print(f"Vector indexes on messages.embedding for {args.metric}: {', '.join(sorted(methods)) or 'none'}")
+                configs += pgvector_configurations(methods, args.ef_search, args.probes)
+
+            results = [await evaluate(config, queries, truth, args.metric) for config in configs]
+    finally:
+        if args.backend == "pgvector":
+            await db.close_db_connection()
+
+    print_table(results, args.k)
+    return results
+
+
+def _csv(cast):
+    return lambda value: [cast(part) for part in value.split(",") if part]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("memory", "pgvector"), default="memory")
+    parser.add_argument("--corpus-size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", choices=("l2", "cosine", "ip"), default=settings.search_metric)
+    parser.add_argument("--dim", type=int, default=settings.embedding_dimensions)
+    parser.add_argument("--dtypes", type=_csv(str), default=["float32", "float16"], help="in-process index dtypes to evaluate")
+    parser.add_argument("--ef-search", type=_csv(int), default=[20, 40, 80, 160], help="HNSW ef_search values (pgvector)")
+    parser.add_argument("--probes", type=_csv(int), default=[], help="IVFFlat probes values (pgvector)")
+    parser.add_argument("--query-noise", type=float, default=0.1, help="relative noise added to exported query vectors")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
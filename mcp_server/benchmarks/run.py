@@ -0,0 +1,259 @@
+"""
+Load and latency benchmarks for /chat, /search and the feeder's /api/ingest.
+
+By default mcp_server runs in this process (under uvicorn, so background
+persistence happens after the response as in production) with offline
+stand-ins: a fake LLM with configurable latency, the local hashing embedder
+and an in-memory corpus backend. `--backend pgvector` uses the real pool and
+search against DATABASE_URL instead, seeding synthetic rows as needed - point
+it at a dedicated benchmark database. `--url` benchmarks an already running
+server. Run from mcp_server/:
+
+    python -m benchmarks.run --corpus-sizes 10000,100000,1000000 --concurrency 1,16,64
+    python -m benchmarks.run --compare benchmarks/results/<earlier run>.json
+
+Results (throughput and p50/p95/p99 latency per endpoint, plus per-stage
+latencies reported by /chat) are printed and written to benchmarks/results/.
+"""
+from . import offline  # noqa: F401 - sets env defaults before the app is imported
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+import httpx
+import uvicorn
+from mcp import embedding, search, server
+from mcp.adapters.instrumented import InstrumentedAdapter
+from mcp.backends.pgvector import PgVectorBackend
+from mcp.database import db
+from mcp.embedding_providers import LocalEmbeddingProvider
+from config import settings
+from .corpus import SyntheticCorpus, load_in_memory, load_postgres
+from .fakes import FakeLLMAdapter, InMemoryCorpusBackend, InMemoryStore
+from .stats import compare, drive, print_comparison, print_results, result_row
+
+ENDPOINTS = ("chat", "search", "ingest")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+# --- Targets ---
+@contextmanager
+def patched(*replacements: tuple[object, str, object]):
+    """Sets attributes for the duration of the block and restores them afterwards."""
+    originals = [(target, name, getattr(target, name)) for target, name, _ in replacements]
+    for target, name, value in replacements:
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for target, name, value in reversed(originals):
+            setattr(target, name, value)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def local_server(args):
+    """
+    Serves the app on a local port with offline stand-ins. Yields the base URL
+    and an async `grow(size)` that tops the corpus up to `size` messages.
+    """
+    embedder = LocalEmbeddingProvider(dimensions=args.dim)
+    corpus = SyntheticCorpus(seed=args.seed)
+    llm = InstrumentedAdapter(FakeLLMAdapter(latency=args.llm_latency_ms / 1000, jitter=args.llm_jitter_ms / 1000, seed=args.seed))
+    replacements = [
+        (embedding, "embedding_provider", embedder),
+        (server, "llm_adapter", llm),
+        (settings, "context_strategy", "summarize"),
+        (settings, "summary_mode", args.summary_mode),
+        (settings, "response_cache_enabled", args.response_cache),
+        (settings, "embedding_dimensions", args.dim),
+    ]
+    index_dir = tempfile.TemporaryDirectory(prefix="mcp-bench-")
+
+    if args.backend == "memory":
+        backend = InMemoryCorpusBackend(index_dir.name, dim=args.dim, dtype=args.dtype)
+        # Ids of persisted chat messages stay clear of the synthetic corpus
+        store = InMemoryStore(next_message_id=10**12, next_conversation_id=10**12)
+        replacements += [(server, "ensure_conversation", store.ensure_conversation), (server, "save_messages", store.save_messages)]
+        loaded = 0
+
+        async def grow(size: int):
+            nonlocal loaded
+            if size > loaded:
+                await load_in_memory(backend, corpus, embedder, loaded, size)
+                loaded = size
+    else:
+        await db.connect_to_db()
+        backend = PgVectorBackend()
+
+        async def grow(size: int):
+            added = await load_postgres(corpus, embedder, size)
+            print(f"Seeded {added} synthetic messages")
+
+    port = _free_port()
+    http_server = uvicorn.Server(uvicorn.Config(
+        server.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning", access_log=False
+    ))
+    search.set_search_backend(backend)
+    try:
+        with patched(*replacements):
+            await backend.start()
+            serving = asyncio.create_task(http_server.serve())
+            while not http_server.started:
+                if serving.done():
+                    serving.result()
+                await asyncio.sleep(0.01)
+            try:
+                yield f"http://127.0.0.1:{port}", grow
+            finally:
+                http_server.should_exit = True
+                await serving
+                await backend.stop()
+    finally:
+        search.set_search_backend(None)
+        if args.backend == "pgvector":
+            await db.close_db_connection()
+        index_dir.cleanup()
+
+
+async def run_endpoint(endpoint: str, args, base_url: str, corpus_size, concurrency: int, queries: list[str], corpus: SyntheticCorpus):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        if endpoint == "chat":
+            async def send(i):
+                response = await client.post(f"{base_url}/chat", json={"message": queries[i % len(queries)]})
+                response.raise_for_status()
+                return response.json().get("timings_ms")
+        elif endpoint == "search":
+            async def send(i):
+                response = await client.post(f"{base_url}/search", json={"query": queries[i % len(queries)]})
+                response.raise_for_status()
+        else:
+            headers = {"X-API-Token": args.feeder_token or ""}
+
+            async def send(i):
+                rows = corpus.messages(i * args.ingest_messages, (i + 1) * args.ingest_messages)
+                payload = {"messages": [{"role": role, "content": content} for role, content, _ in rows]}
+                response = await client.post(f"{args.feeder_url}/api/ingest", json=payload, headers=headers)
+                response.raise_for_status()
+
+        # Warm up connections, caches and code paths outside the measurement
+        await drive(send, min(args.warmup, args.requests), concurrency)
+        latencies, stages, errors, elapsed = await drive(send, args.requests, concurrency)
+    return result_row(endpoint, corpus_size, concurrency, latencies, stages, errors, elapsed)
+
+
+async def run_suite(args) -> dict:
+    endpoints = [e for e in args.endpoints if e != "ingest" or args.feeder_url]
+    if "ingest" in args.endpoints and not args.feeder_url:
+        print("Skipping ingest: pass --feeder-url to benchmark a running conversation_feeder.")
+    corpus = SyntheticCorpus(seed=args.seed)
+    queries = corpus.queries(args.query_pool)
+    results = []
+
+    async def measure(base_url, corpus_size):
+        for endpoint in endpoints:
+            for concurrency in args.concurrency:
+                row = await run_endpoint(endpoint, args, base_url, corpus_size, concurrency, queries, corpus)
+                results.append(row)
+                print_results([row])
+
+    if args.url:
+        await measure(args.url.rstrip("/"), None)
+    else:
+        async with local_server(args) as (base_url, grow):
+            for size in sorted(args.corpus_sizes):
+                started = time.perf_counter()
+                await grow(size)
+                print(f"Corpus ready: {size} messages ({time.perf_counter() - started:.1f}s)")
+                await measure(base_url, size)
+
+    return {"meta": run_metadata(args), "results": results}
+
+
+def run_metadata(args) -> dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {key: value for key, value in vars(args).items() if key != "feeder_token"},
+    }
+
+
+def _csv(cast):
+    return lambda value: [cast(part) for part in value.split(",") if part]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", type=_csv(str), default=["chat", "search"], help=f"comma-separated subset of {ENDPOINTS}")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--corpus-sizes", type=_csv(int), default=[10_000, 100_000])
+    parser.add_argument("--backend", choices=("memory", "pgvector"), default="memory")
+    parser.add_argument("--dim", type=int, default=settings.embedding_dimensions)
+    parser.add_argument("--dtype", choices=("float32", "float16"), default="float32", help="in-memory index dtype")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--summary-mode", choices=("abstractive", "extractive", "auto"), default="auto")
+    parser.add_argument("--response-cache", action="store_true", help="enable the semantic response cache")
+    parser.add_argument("--query-pool", type=int, default=1000, help="distinct queries cycled through")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--url", help="benchmark a running mcp_server instead of an in-process one")
+    parser.add_argument("--feeder-url", help="conversation_feeder base URL for the ingest endpoint")
+    parser.add_argument("--feeder-token", default=os.environ.get("FEEDER_AUTH_TOKEN"))
+    parser.add_argument("--ingest-messages", type=int, default=20, help="messages per /api/ingest request")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--regression-threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run_suite(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            deltas, regressions = compare(json.load(f), report, args.regression_threshold)
+        print_comparison(deltas, regressions)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.regression_threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
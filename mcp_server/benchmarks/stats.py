@@ -0,0 +1,184 @@
+"""
+Statistics for the benchmark suite: latency percentiles, result rows and
+run-to-run comparison, and retrieval quality against exact search.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+import numpy as np
+
+
+def latency_summary(samples_ms: list[float]) -> dict:
+    if not samples_ms:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    values = np.asarray(samples_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "mean": round(float(values.mean()), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+
+async def drive(
+    send: Callable[[int], Awaitable[dict | None]], requests: int, concurrency: int
+) -> tuple[list[float], list[dict], int, float]:
+    """
+    Issues `requests` calls of `send(i)` from `concurrency` workers. Returns
+    per-request latencies (ms), the stage timings each call reported, the error
+    count and the wall-clock duration in seconds.
+    """
+    latencies, stages, errors = [], [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                timings = await send(i)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if timings:
+                stages.append(timings)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, stages, errors, time.perf_counter() - started
+
+
+def result_row(endpoint: str, corpus_size: int | None, concurrency: int, latencies, stages, errors, elapsed) -> dict:
+    stage_names = sorted({name for timings in stages for name in timings})
+    return {
+        "endpoint": endpoint,
+        "corpus_size": corpus_size,
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": latency_summary(latencies),
+        "stages_ms": {
+            name: latency_summary([timings[name] for timings in stages if name in timings]) for name in stage_names
+        },
+    }
+
+
+# --- Comparison ---
+def _key(row: dict) -> tuple:
+    return row["endpoint"], row["corpus_size"], row["concurrency"]
+
+
+def compare(previous: dict, current: dict, threshold: float = 0.1) -> tuple[list[dict], list[dict]]:
+    """
+    Matches rows by (endpoint, corpus size, concurrency) and reports relative
+    changes in p95 latency and throughput. A row regresses when p95 grows or
+    throughput falls by more than `threshold`. Returns (all deltas, regressions).
+    """
+    earlier = {_key(row): row for row in previous["results"]}
+    deltas = []
+    for row in current["results"]:
+        before = earlier.get(_key(row))
+        if before is None or not before["latency_ms"]["p95"] or not before["throughput_rps"]:
+            continue
+        deltas.append({
+            "endpoint": row["endpoint"],
+            "corpus_size": row["corpus_size"],
+            "concurrency": row["concurrency"],
+            "p95_change": row["latency_ms"]["p95"] / before["latency_ms"]["p95"] - 1 if row["latency_ms"]["p95"] else None,
+            "throughput_change": row["throughput_rps"] / before["throughput_rps"] - 1,
+        })
+    regressions = [
+        delta for delta in deltas
+        if (delta["p95_change"] is not None and delta["p95_change"] > threshold) or delta["throughput_change"] < -threshold
+    ]
+    return deltas, regressions
+
+
+def print_results(results: list[dict]):
+    print(f"{'endpoint':<8} {'corpus':>9} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for row in results:
+        latency = row["latency_ms"]
+        print(
+            f"{row['endpoint']:<8} {str(row['corpus_size']):>9} {row['concurrency']:>5} {row['throughput_rps']:>9.1f} "
+            f"{latency['p50'] or 0:>9.1f} {latency['p95'] or 0:>9.1f} {latency['p99'] or 0:>9.1f} {row['errors']:>7}"
+        )
+        for stage, summary in row["stages_ms"].items():
+            print(f"{'':<8} {'':>9} {'':>5} {stage:>9} {summary['p50']:>9.1f} {summary['p95']:>9.1f} {summary['p99']:>9.1f}")
+
+
+def print_comparison(deltas: list[dict], regressions: list[dict]):
+    print(f"\n{'endpoint':<8} {'corpus':>9} {'conc':>5} {'p95':>9} {'req/s':>9}")
+    for delta in deltas:
+        marker = "  REGRESSION" if delta in regressions else ""
+        p95 = f"{delta['p95_change']:+.1%}" if delta["p95_change"] is not None else "n/a"
+        print(
+            f"{delta['endpoint']:<8} {str(delta['corpus_size']):>9} {delta['concurrency']:>5} "
+            f"{p95:>9} {delta['throughput_change']:>+9.1%}{marker}"
+        )
+
+
+# --- Retrieval quality ---
+def exact_top_k(vectors: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int, metric: str = "l2", chunk_rows: int = 65536) -> np.ndarray:
+    """
+    Exact nearest-neighbour ids, shape (len(queries), k), closest first. Distances
+    follow pgvector's conventions (L2, 1 - cosine, negated inner product) and
+    the corpus is processed in chunks so memory stays bounded.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, len(ids))
+    best_distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    query_norms = np.linalg.norm(queries, axis=1)
+    for offset in range(0, len(vectors), chunk_rows):
+        chunk = np.asarray(vectors[offset:offset + chunk_rows], dtype=np.float32)
+        dots = queries @ chunk.T
+        if metric == "ip":
+            distances = -dots
+        elif metric == "cosine":
+            denom = np.outer(query_norms, np.linalg.norm(chunk, axis=1))
+            distances = 1.0 - dots / np.where(denom == 0, 1.0, denom)
+        else:
+            sq = (chunk * chunk).sum(axis=1)
+            distances = np.sqrt(np.maximum(sq[None, :] - 2.0 * dots + (query_norms ** 2)[:, None], 0.0))
+        rows = np.broadcast_to(np.arange(offset, offset + len(chunk)), distances.shape)
+        # Merge this chunk's candidates with the best so far and keep k
+        merged_distances = np.concatenate([best_distances, distances], axis=1)
+        merged_rows = np.concatenate([best_rows, rows], axis=1)
+        keep = np.argpartition(merged_distances, k - 1, axis=1)[:, :k] if merged_distances.shape[1] > k else np.argsort(merged_distances, axis=1)
+        best_distances = np.take_along_axis(merged_distances, keep, axis=1)
+        best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+    order = np.argsort(best_distances, axis=1, kind="stable")
+    return np.asarray(ids)[np.take_along_axis(best_rows, order, axis=1)]
+
+
+def recall_at_k(found: list[list[int]], truth: np.ndarray) -> float:
+    """Mean fraction of the exact top-k present in each result list."""
+    k = truth.shape[1]
+    return float(np.mean([len(set(result[:k]) & set(expected.tolist())) / k for result, expected in zip(found, truth)]))
+
+
+def mean_reciprocal_rank(found: list[list[int]], truth: np.ndarray) -> float:
+    """Mean of 1 / rank of the true nearest neighbour in each result list (0 when missing)."""
+    ranks = []
+    for result, expected in zip(found, truth):
+        nearest = int(expected[0])
+        ranks.append(1.0 / (result.index(nearest) + 1) if nearest in result else 0.0)
+    return float(np.mean(ranks))
+
+
+def pareto_front(rows: list[dict]) -> set[str]:
+    """Names of configurations that no other one beats on both recall and p50 latency."""
+    front = set()
+    for row in rows:
+        dominated = any(
+            other["recall"] >= row["recall"] and other["latency_ms"]["p50"] <= row["latency_ms"]["p50"]
+            and (other["recall"] > row["recall"] or other["latency_ms"]["p50"] < row["latency_ms"]["p50"])
+            for other in rows
+        )
+        if not dominated:
+            front.add(row["name"])
+    return front
@@ -4,6 +4,95 @@ class Settings(BaseSettings):
     gemini_api_key: str
     database_url: str
 
+    # Shared asyncpg connection pool (see mcp/database/db.py)
+    db_pool_min_size: int = 2
+    db_pool_max_size: int = 10
+    db_statement_cache_size: int = 100
+    db_max_inactive_connection_lifetime: float = 300.0
+    db_command_timeout: float = 30.0
+
+    # Vector search defaults; each can be overridden per /search request
+    search_mode: str = "hybrid"  # one of: vector, lexical, hybrid
+    search_metric: str = "l2"  # one of: l2, cosine, ip
+    search_limit: int = 5
+    hnsw_ef_search: int | None = None  # None keeps the server default (40)
+    ivfflat_probes: int | None = None  # None keeps the server default (1)
+    rrf_k: int = 60  # reciprocal rank fusion damping constant
+    hybrid_candidates: int = 20  # candidates fetched per retriever before fusion
+    embedding_timeout: float = 10.0  # seconds before search falls back to lexical-only
+    # Messages longer than chunk_max_chars are also stored as overlapping chunks
+    # (message_chunks) with their own embeddings; pgvector search ranks them too
+    # and /chat injects the best chunk of a hit instead of the whole message
+    chunk_max_chars: int = 1500
+    chunk_overlap: int = 200
+    chunk_search: bool = True
+    coalesce_requests: bool = True  # identical concurrent searches/embeddings share one call
+
+    # Query embeddings; "local" is an offline deterministic embedder for load tests
+    embedding_provider: str = "gemini"  # one of: gemini, local
+    embedding_model: str = "models/embedding-001"
+    embedding_cache_size: int = 10000
+    embedding_cache_ttl: float | None = 3600.0
+    embedding_cache_persistent: bool = False  # second tier in the embedding_cache table
+    embedding_batch_size: int = 100  # texts per batched embed_content call
+    embedding_batch_wait_ms: float = 5.0  # how long to wait for a batch to fill
+    embedding_max_concurrency: int = 4  # batches in flight / executor threads
+    embedding_max_retries: int = 3
+    embedding_retry_backoff: float = 0.5  # seconds, doubled per retry
+
+    # How /chat turns retrieved messages into context: "summarize" calls the LLM on
+    # the request path, "rolling" injects stored per-conversation summaries
+    context_strategy: str = "rolling"
+
+    # Summary mode for CONTEXT_STRATEGY=summarize: "abstractive" (LLM call),
+    # "extractive" (local sentence selection) or "auto" (extractive when small)
+    summary_mode: str = "auto"
+    extractive_max_chars: int = 1200  # output budget for extractive summaries
+    extractive_auto_max_chars: int = 3000  # auto picks extractive up to this much input
+
+    # Rolling conversation summaries (see mcp/rolling_summary.py)
+    rolling_summary_min_messages: int = 6  # update after this many new messages...
+    rolling_summary_min_chars: int = 4000  # ...or this much new text (~1k tokens)
+    rolling_summary_max_new_messages: int = 200  # cap on turns folded in per update
+    rolling_summary_scan_interval: float = 60.0  # seconds; picks up feeder-ingested messages
+
+    # Summaries of retrieved context, cached by the ordered ids of the messages
+    summary_cache_size: int = 1000
+    summary_cache_ttl: float | None = 3600.0
+
+    # Adds a Server-Timing header with per-stage durations to /chat responses
+    server_timing_header: bool = False
+
+    # Semantic cache of /chat answers (see mcp/response_cache.py): near-identical
+    # questions answered from the same retrieved context reuse the earlier reply
+    response_cache_enabled: bool = False
+    response_cache_size: int = 1000
+    response_cache_ttl: float | None = 600.0
+    response_cache_max_distance: float = 0.05  # cosine distance between query embeddings
+
+    # LLM adapter: "gemini_http" talks to the REST API over a pooled async HTTP
+    # client, "gemini" uses the blocking SDK on a thread pool
+    llm_adapter: str = "gemini_http"
+    llm_model: str = "gemini-pro"
+    llm_timeout: float = 60.0  # seconds per request (connect timeout is capped at 10s)
+    llm_max_connections: int = 100
+    llm_max_keepalive: int = 20
+    llm_max_concurrency: int = 64  # requests in flight across chat and summaries
+    llm_max_retries: int = 3  # for 429, 5xx and timeouts
+    llm_retry_backoff: float = 0.5  # seconds, doubled per retry
+    llm_max_retry_backoff: float = 30.0  # upper bound on any wait, including Retry-After
+
+    # Search backend: "pgvector" queries Postgres, "mmap" ranks in-process from a
+    # memory-mapped index on local disk (see mcp/backends/mmap.py)
+    search_backend: str = "pgvector"
+    embedding_dimensions: int = 768
+    mmap_index_path: str = "data/vector_index"
+    mmap_index_dtype: str = "float32"  # or "float16" to halve memory and disk
+    mmap_sync_interval: float = 5.0
+    # Each sync re-checks embeddings written this long before the last one seen,
+    # so rows from transactions that committed late are not skipped
+    mmap_sync_lookback: float = 60.0
+
     model_config = SettingsConfigDict(env_file=".env")
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
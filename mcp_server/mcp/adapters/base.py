@@ -1,4 +1,35 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, List
+
+
+class LLMError(Exception):
+    """
+    Raised by adapters when the LLM call fails. `retryable` tells callers (and
+    the adapter's own retry loop) whether trying again may succeed.
+    """
+    retryable = False
+
+    def __init__(self, message: str, status_code: int | None = None, retry_after: float | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMRateLimitError(LLMError):
+    """The provider rejected the call because of quota or rate limits (HTTP 429)."""
+    retryable = True
+
+
+class LLMTimeoutError(LLMError):
+    """The call did not complete within the adapter's timeout."""
+    retryable = True
+
+
+class LLMUnavailableError(LLMError):
+    """The provider could not be reached or returned a server error (HTTP 5xx)."""
+    retryable = True
+
 
 class BaseAdapter(ABC):
     """
@@ -20,10 +51,39 @@ class BaseAdapter(ABC):
             response = await my_llm_api_call(message, self.api_key)
             return response
 
+        # Optional: override to stream tokens as they are generated
+        async def stream_message(self, message: str):
+            async for chunk in my_llm_streaming_call(message, self.api_key):
+                yield chunk
+
+    Adapters raise `LLMError` (or a subclass) on failure rather than returning
+    an error message as the response.
+
     Then, you can instantiate your new adapter in `mcp_server/mcp/server.py`.
     """
 
     @abstractmethod
     async def send_message(self, message: str) -> str:
         """Sends a message to the LLM and returns the response."""
-        pass
\ No newline at end of file
+        pass
+
+    async def stream_message(self, message: str) -> AsyncIterator[str]:
+        """
+        Sends a message to the LLM and yields the response in chunks as they are
+        generated. Adapters without native streaming yield the full response once.
+        """
+        yield await self.send_message(message)
+
+    async def send_batch(self, messages: List[str], return_exceptions: bool = False) -> List[str | LLMError]:
+        """
+        Sends many prompts concurrently and returns the responses in order. With
+        `return_exceptions`, failed prompts yield their LLMError instead of
+        failing the whole batch.
+        """
+        return list(await asyncio.gather(
+            *(self.send_message(message) for message in messages), return_exceptions=return_exceptions
+        ))
+
+    async def aclose(self):
+        """Releases pooled connections; called from the FastAPI lifespan on shutdown."""
+        pass
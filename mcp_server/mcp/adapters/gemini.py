@@ -1,12 +1,30 @@
 import google.generativeai as genai
-from .base import BaseAdapter
+from .base import BaseAdapter, LLMError, LLMRateLimitError, LLMTimeoutError, LLMUnavailableError
 from config import settings
 import asyncio
+import threading
+
+# google.api_core exception names mapped onto the adapter error hierarchy
+_SDK_ERRORS = {
+    "ResourceExhausted": LLMRateLimitError,
+    "TooManyRequests": LLMRateLimitError,
+    "DeadlineExceeded": LLMTimeoutError,
+    "ServiceUnavailable": LLMUnavailableError,
+    "InternalServerError": LLMUnavailableError,
+}
+
+
+def _to_llm_error(error: Exception) -> LLMError:
+    error_class = _SDK_ERRORS.get(type(error).__name__, LLMError)
+    return error_class(f"An error occurred with the Gemini API: {error}", status_code=getattr(error, "code", None))
+
 
 class GeminiAdapter(BaseAdapter):
+    """Gemini through the blocking google-generativeai SDK on the default executor."""
+
     def __init__(self):
         genai.configure(api_key=settings.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.model = genai.GenerativeModel(settings.llm_model)
 
     async def send_message(self, message: str) -> str:
         """Sends a message to the Gemini API and returns the response."""
@@ -17,4 +35,38 @@ class GeminiAdapter(BaseAdapter):
             )
             return response.text
         except Exception as e:
-            return f"An error occurred with the Gemini API: {e}"
+            raise _to_llm_error(e) from e
+
+    async def stream_message(self, message: str):
+        """Streams the Gemini response chunk by chunk using generate_content(stream=True)."""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def produce():
+            # Runs in a worker thread; hands each chunk back to the event loop
+            try:
+                for chunk in self.model.generate_content(message, stream=True):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while (item := await queue.get()) is not done:
+                if isinstance(item, Exception):
+                    raise _to_llm_error(item) from item
+                if item:
+                    yield item
+        finally:
+            # The response may already be streaming (or the client gone): stop the
+            # thread and report its failure here instead of raising into the response
+            stop.set()
+            producer.cancel()
+            if producer.done() and not producer.cancelled() and producer.exception() is not None:
+                print(f"Gemini stream producer failed: {producer.exception()}")
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import random
+import httpx
+from .base import BaseAdapter, LLMError, LLMRateLimitError, LLMTimeoutError, LLMUnavailableError
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+
+def _extract_text(data: dict) -> str:
+    """Joins the text parts of the first candidate of a generateContent response."""
+    candidates = data.get("candidates") or []
+    if not candidates:
+        reason = (data.get("promptFeedback") or {}).get("blockReason", "no candidates returned")
+        raise LLMError(f"Gemini returned no response: {reason}")
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+class GeminiHttpAdapter(BaseAdapter):
+    """
+    A natively async Gemini adapter over the REST API.
+
+    All calls share one pooled `httpx.AsyncClient` (keep-alive connections,
+    connect/read timeouts), so there is no thread hand-off per call and
+    summarization and chat reuse the same connections. A semaphore bounds the
+    number of in-flight requests; rate-limit, timeout and 5xx failures are
+    retried with jittered exponential backoff (honouring Retry-After, but never
+    waiting longer than `max_backoff`) before a structured `LLMError` is raised.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gemini-pro",
+        timeout: float = 60.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        max_concurrency: int = 64,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        max_backoff: float = 30.0,
+        base_url: str = GEMINI_API_URL,
+        client: httpx.AsyncClient | None = None,
+    ):
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = client or httpx.AsyncClient(
+            base_url=base_url,
+            headers={"x-goog-api-key": api_key},
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+        )
+
+    @staticmethod
+    def _payload(message: str) -> dict:
+        return {"contents": [{"role": "user", "parts": [{"text": message}]}]}
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code < 400:
+            return
+        detail = f"Gemini API returned HTTP {response.status_code}"
+        if response.status_code == 429:
+            raise LLMRateLimitError(detail, status_code=429, retry_after=_retry_after(response))
+        if response.status_code >= 500:
+            raise LLMUnavailableError(detail, status_code=response.status_code, retry_after=_retry_after(response))
+        raise LLMError(detail, status_code=response.status_code)
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    try:
+                        response = await self._client.post(path, json=payload)
+                    except httpx.TimeoutException as e:
+                        raise LLMTimeoutError(f"Gemini API timed out: {e}") from e
+                    except httpx.TransportError as e:
+                        raise LLMUnavailableError(f"Could not reach the Gemini API: {e}") from e
+                    self._check(response)
+                    return response.json()
+            except LLMError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                if e.retry_after is not None:
+                    delay = e.retry_after
+                else:
+                    delay = self.backoff_base * (2 ** attempt) * (1 + random.random() / 4)
+                attempt += 1
+                # A single large Retry-After must not stall the request indefinitely
+                await asyncio.sleep(min(delay, self.max_backoff))
+
+    async def send_message(self, message: str) -> str:
+        """Sends a message to the Gemini API and returns the response."""
+        data = await self._post(f"/models/{self.model}:generateContent", self._payload(message))
+        return _extract_text(data)
+
+    async def stream_message(self, message: str):
+        """Streams the response using streamGenerateContent with server-sent events."""
+        async with self._semaphore:
+            try:
+                async with self._client.stream(
+                    "POST", f"/models/{self.model}:streamGenerateContent",
+                    params={"alt": "sse"}, json=self._payload(message),
+                ) as response:
+                    self._check(response)
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        text = _extract_text(json.loads(line[len("data:"):]))
+                        if text:
+                            yield text
+            except httpx.TimeoutException as e:
+                raise LLMTimeoutError(f"Gemini API timed out: {e}") from e
+            except httpx.TransportError as e:
+                raise LLMUnavailableError(f"Could not reach the Gemini API: {e}") from e
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,51 @@
+import time
+from typing import AsyncIterator
+from .base import BaseAdapter, LLMError
+from .. import metrics
+
+
+def _outcome(error: Exception) -> str:
+    return type(error).__name__ if isinstance(error, LLMError) else "error"
+
+
+class InstrumentedAdapter(BaseAdapter):
+    """
+    Wraps another adapter and records call counts, outcomes, latency and
+    prompt/response sizes in the Prometheus metrics, whichever adapter is in use.
+    """
+
+    def __init__(self, adapter: BaseAdapter):
+        self.adapter = adapter
+
+    async def send_message(self, message: str) -> str:
+        started = time.perf_counter()
+        metrics.llm_chars.labels("prompt").inc(len(message))
+        try:
+            response = await self.adapter.send_message(message)
+        except Exception as e:
+            metrics.llm_calls.labels("send", _outcome(e)).inc()
+            raise
+        finally:
+            metrics.llm_latency.labels("send").observe(time.perf_counter() - started)
+        metrics.llm_calls.labels("send", "ok").inc()
+        metrics.llm_chars.labels("response").inc(len(response))
+        return response
+
+    async def stream_message(self, message: str) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        metrics.llm_chars.labels("prompt").inc(len(message))
+        outcome = "cancelled"
+        try:
+            async for chunk in self.adapter.stream_message(message):
+                metrics.llm_chars.labels("response").inc(len(chunk))
+                yield chunk
+            outcome = "ok"
+        except Exception as e:
+            outcome = _outcome(e)
+            raise
+        finally:
+            metrics.llm_calls.labels("stream", outcome).inc()
+            metrics.llm_latency.labels("stream").observe(time.perf_counter() - started)
+
+    async def aclose(self):
+        await self.adapter.aclose()
@@ -0,0 +1,49 @@
+from abc import ABC, abstractmethod
+from typing import List
+from ..database.schema import Message
+
+class SearchBackend(ABC):
+    """
+    This is the abstract base class for vector search backends used by
+    `mcp.search.find_relevant_messages`. A backend only ranks stored messages by
+    distance to a query embedding; generating the embedding is done by the caller.
+
+    Example of a new backend:
+    --------------------------
+
+    from .base import SearchBackend
+
+    class MyBackend(SearchBackend):
+        async def search(self, query_embedding, limit, metric, ef_search=None, probes=None):
+            # ... return the `limit` closest Message objects ...
+
+    Then, select it via the `SEARCH_BACKEND` setting in `mcp_server/mcp/search.py`.
+    """
+
+    async def start(self):
+        """Called once from the FastAPI lifespan after the database pool is open."""
+        pass
+
+    async def stop(self):
+        """Called once from the FastAPI lifespan before the database pool is closed."""
+        pass
+
+    async def add(self, messages: List[Message]):
+        """Notifies the backend of newly stored messages (with ids and embeddings)."""
+        pass
+
+    async def lexical_search(self, query_text: str, limit: int) -> List[Message]:
+        """Returns up to `limit` messages matching `query_text` by full-text rank, best first."""
+        return []
+
+    @abstractmethod
+    async def search(
+        self,
+        query_embedding: list[float],
+        limit: int,
+        metric: str,
+        ef_search: int | None = None,
+        probes: int | None = None,
+    ) -> List[Message]:
+        """Returns up to `limit` messages closest to `query_embedding`, nearest first."""
+        pass
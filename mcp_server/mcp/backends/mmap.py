@@ -0,0 +1,220 @@
+import asyncio
+import datetime
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import List
+from .base import SearchBackend
+from .pgvector import MESSAGE_COLUMNS, postgres_lexical_search, row_to_message
+from ..database import db
+from ..database.schema import Message
+from ..vector_index import MmapVectorIndex
+
+
+class MmapBackend(SearchBackend):
+    """
+    Serves vector search from an in-process `MmapVectorIndex` on local disk.
+
+    Ranking never touches Postgres. The index is kept current in two ways:
+    messages written by this process are added directly via `add()`, and a
+    background task pulls embeddings written elsewhere (new rows from
+    conversation_feeder, vectors filled in or re-embedded by mcp/backfill.py)
+    using `messages.embedding_updated_at` as a high-water mark. Rows whose
+    embedding was cleared are dropped by the same pass, and deleted messages
+    once the index holds more rows than Postgres has embeddings. Result rows are
+    hydrated from a bounded in-process record cache first, then from Postgres by
+    primary key; without a database pool the backend runs entirely offline.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: int = 768,
+        dtype: str = "float32",
+        sync_interval: float = 5.0,
+        sync_lookback: float = 60.0,
+        record_cache_size: int = 10000,
+    ):
+        self.index = MmapVectorIndex(path, dim=dim, dtype=dtype)
+        self.sync_interval = sync_interval
+        self.sync_lookback = datetime.timedelta(seconds=sync_lookback)
+        self.record_cache_size = record_cache_size
+        self._records: OrderedDict[int, Message] = OrderedDict()
+        self._sync_task: asyncio.Task | None = None
+        # The DB-sync watermark lives next to the index; `add()` never moves it
+        self._sync_file = os.path.join(path, "sync.json")
+        self._synced_at = self._read_synced_at()
+        # embedding_updated_at of rows copied within the lookback window
+        self._synced_rows: dict[int, datetime.datetime] = {}
+
+    async def start(self):
+        if db.db_pool is not None:
+            await self.sync()
+            if self.sync_interval > 0:
+                self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        self.index.flush()
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"Vector index sync failed: {e}")
+
+    def _read_synced_at(self) -> datetime.datetime | None:
+        try:
+            with open(self._sync_file) as f:
+                return datetime.datetime.fromisoformat(json.load(f)["embedding_updated_at"])
+        except FileNotFoundError:
+            return None
+
+    def _write_synced_at(self):
+        tmp = self._sync_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"embedding_updated_at": self._synced_at.isoformat()}, f)
+        os.replace(tmp, self._sync_file)
+
+    async def sync(self, batch_size: int = 5000) -> int:
+        """
+        Copies embeddings written since the last sync and returns how many.
+
+        Each pass starts `sync_lookback` before the newest `embedding_updated_at`
+        seen so far, because a transaction that wrote earlier may commit after
+        one that wrote later. Rows already copied with the same timestamp are
+        skipped, so the overlap only costs an id scan. Rows whose embedding has
+        since been set to NULL, or that were deleted, are removed from the index.
+        """
+        since = self._synced_at - self.sync_lookback if self._synced_at else datetime.datetime.min
+        cursor = (since, 0)
+        added = 0
+        while True:
+            async with db.get_pool().acquire() as connection:
+                # Clearing an embedding also moves embedding_updated_at, so those rows are scanned too
+                rows = await connection.fetch(
+                    'SELECT id, embedding_updated_at FROM messages '
+                    'WHERE (embedding_updated_at, id) > ($1::timestamp, $2::int) '
+                    'ORDER BY embedding_updated_at, id LIMIT $3',
+                    *cursor, batch_size
+                )
+                changed = {
+                    row['id']: row['embedding_updated_at'] for row in rows
+                    if self._synced_rows.get(row['id']) != row['embedding_updated_at']
+                }
+                vectors = await connection.fetch(
+                    'SELECT id, embedding, embedding_updated_at FROM messages '
+                    'WHERE id = ANY($1::int[]) AND embedding IS NOT NULL',
+                    list(changed)
+                ) if changed else []
+            if not rows:
+                break
+            if vectors:
+                await asyncio.to_thread(
+                    self.index.add, [row['id'] for row in vectors], [row['embedding'] for row in vectors]
+                )
+                changed.update((row['id'], row['embedding_updated_at']) for row in vectors)
+                added += len(vectors)
+            cleared = changed.keys() - {row['id'] for row in vectors}
+            if cleared:
+                await self._remove(cleared)
+            self._synced_rows.update(changed)
+            cursor = (rows[-1]['embedding_updated_at'], rows[-1]['id'])
+
+        # Deleting a row leaves no timestamp behind; a surplus in the index gives it away
+        async with db.get_pool().acquire() as connection:
+            embedded = await connection.fetchval('SELECT count(*) FROM messages WHERE embedding IS NOT NULL')
+        if len(self.index) > embedded:
+            await self._remove_deleted(batch_size)
+
+        if cursor[0] > (self._synced_at or datetime.datetime.min):
+            self._synced_at = cursor[0]
+            await asyncio.to_thread(self._write_synced_at)
+        if self._synced_at is None:
+            return added
+        horizon = self._synced_at - self.sync_lookback
+        self._synced_rows = {i: at for i, at in self._synced_rows.items() if at >= horizon}
+        return added
+
+    async def _remove_deleted(self, batch_size: int):
+        """Removes indexed ids that no longer have an embedded row in Postgres."""
+        # Only ids indexed before the scan are candidates, so rows added meanwhile are never lost
+        stale = set(self.index.ids.tolist())
+        after_id = 0
+        while stale:
+            async with db.get_pool().acquire() as connection:
+                rows = await connection.fetch(
+                    'SELECT id FROM messages WHERE embedding IS NOT NULL AND id > $1 ORDER BY id LIMIT $2',
+                    after_id, batch_size
+                )
+            if not rows:
+                break
+            stale.difference_update(row['id'] for row in rows)
+            after_id = rows[-1]['id']
+        if stale:
+            # Re-check the survivors: a row may have regained its embedding after the scan passed it
+            async with db.get_pool().acquire() as connection:
+                kept = await connection.fetch(
+                    'SELECT id FROM messages WHERE id = ANY($1::int[]) AND embedding IS NOT NULL', list(stale)
+                )
+            stale.difference_update(row['id'] for row in kept)
+            await self._remove(stale)
+
+    async def _remove(self, ids):
+        await asyncio.to_thread(self.index.remove, ids)
+        for msg_id in ids:
+            self._records.pop(msg_id, None)
+
+    async def add(self, messages: List[Message]):
+        messages = [m for m in messages if m.id is not None and m.embedding is not None]
+        if not messages:
+            return
+        await asyncio.to_thread(self.index.add, [m.id for m in messages], [m.embedding for m in messages])
+        for message in messages:
+            self._remember(message)
+
+    def _remember(self, message: Message):
+        self._records[message.id] = message
+        self._records.move_to_end(message.id)
+        while len(self._records) > self.record_cache_size:
+            self._records.popitem(last=False)
+
+    async def lexical_search(self, query_text, limit) -> List[Message]:
+        if db.db_pool is not None:
+            return await postgres_lexical_search(query_text, limit)
+        # Offline: rank cached records by how many query terms they contain
+        terms = set(re.findall(r"\w+", query_text.lower()))
+        scored = []
+        for message in self._records.values():
+            hits = len(terms.intersection(re.findall(r"\w+", (message.content or "").lower())))
+            if hits:
+                scored.append((hits, message.id, message))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [message for _, _, message in scored[:limit]]
+
+    async def search(self, query_embedding, limit, metric, ef_search=None, probes=None) -> List[Message]:
+        # ef_search/probes only apply to approximate indexes; this search is exact
+        ids, _ = await asyncio.to_thread(self.index.search, query_embedding, limit, metric)
+        ids = [int(i) for i in ids]
+
+        found = {i: self._records[i] for i in ids if i in self._records}
+        missing = [i for i in ids if i not in found]
+        if missing and db.db_pool is not None:
+            async with db.get_pool().acquire() as connection:
+                rows = await connection.fetch(
+                    f'SELECT {MESSAGE_COLUMNS} FROM messages WHERE id = ANY($1::int[])', missing
+                )
+            for row in rows:
+                message = row_to_message(row)
+                found[message.id] = message
+                self._remember(message)
+        return [found[i] for i in ids if i in found]
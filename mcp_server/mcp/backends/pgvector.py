@@ -0,0 +1,117 @@
+from typing import List
+from .base import SearchBackend
+from ..database.db import get_pool
+from ..database.schema import Message, MessageChunk
+
+# pgvector distance operators; smaller is always closer (<#> is the negated inner product)
+DISTANCE_OPERATORS = {
+    "l2": "<->",
+    "cosine": "<=>",
+    "ip": "<#>",
+}
+
+# pgvector's default hnsw.ef_search. An HNSW scan returns at most ef_search
+# rows, so a LIMIT above it silently comes back short
+DEFAULT_EF_SEARCH = 40
+# Chunk rows fetched per requested message
+CHUNK_OVERFETCH = 4
+
+MESSAGE_COLUMNS = "id, conversation_id, role, content, embedding, created_at"
+CHUNK_COLUMNS = "id, message_id, chunk_index, start_offset, end_offset, content"
+
+
+def row_to_message(row) -> Message:
+    """Builds a detached Message from an asyncpg record, ignoring computed columns such as distance."""
+    return Message(**{key: row[key] for key in row.keys() if key != "distance"})
+
+
+async def postgres_lexical_search(query_text: str, limit: int) -> List[Message]:
+    """Full-text search over the GIN-indexed `content_tsv` column."""
+    async with get_pool().acquire() as connection:
+        rows = await connection.fetch(
+            f"SELECT {MESSAGE_COLUMNS} FROM messages, websearch_to_tsquery('english', $1) AS query "
+            'WHERE content_tsv @@ query ORDER BY ts_rank_cd(content_tsv, query) DESC, id DESC LIMIT $2',
+            query_text, limit
+        )
+    return [row_to_message(row) for row in rows]
+
+
+def ef_search_for(ef_search: int | None, rows: int) -> int:
+    """The hnsw.ef_search to scan with: the requested (or default) value, raised to the rows fetched."""
+    return max(ef_search or DEFAULT_EF_SEARCH, rows)
+
+
+def merge_chunk_hits(message_hits: list, chunk_hits: list, limit: int) -> List[int]:
+    """
+    Ranks message ids by their closest hit, whether the whole message or one of
+    its chunks. Both inputs are (message id, distance) pairs.
+    """
+    best: dict[int, float] = {}
+    for message_id, distance in list(message_hits) + list(chunk_hits):
+        if message_id not in best or distance < best[message_id]:
+            best[message_id] = distance
+    return sorted(best, key=best.get)[:limit]
+
+
+class PgVectorBackend(SearchBackend):
+    """
+    Runs the nearest-neighbour query in Postgres using the pgvector ANN indexes.
+
+    With `chunks` enabled, the chunks of long messages (message_chunks) are
+    searched alongside whole messages; a message ranks by its closest hit, and
+    every returned message that has chunks carries its best-matching one as
+    `matched_chunk`.
+    """
+
+    def __init__(self, chunks: bool = True):
+        self.chunks = chunks
+
+    async def lexical_search(self, query_text, limit) -> List[Message]:
+        return await postgres_lexical_search(query_text, limit)
+
+    async def search(self, query_embedding, limit, metric, ef_search=None, probes=None) -> List[Message]:
+        operator = DISTANCE_OPERATORS[metric]
+        async with get_pool().acquire() as connection:
+            # SET LOCAL scopes the index tuning knobs to this transaction only
+            async with connection.transaction():
+                await connection.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search_for(ef_search, limit))}")
+                if probes:
+                    await connection.execute(f"SET LOCAL ivfflat.probes = {int(probes)}")
+                rows = await connection.fetch(
+                    f'SELECT {MESSAGE_COLUMNS}, embedding {operator} $1 AS distance FROM messages '
+                    f'WHERE embedding IS NOT NULL ORDER BY embedding {operator} $1 LIMIT $2',
+                    query_embedding, limit
+                )
+                messages = {row['id']: row_to_message(row) for row in rows}
+                if not self.chunks:
+                    return list(messages.values())
+
+                # Several chunks of one message can crowd the top hits, so over-fetch,
+                # with a candidate list large enough to return all of them
+                chunk_limit = limit * CHUNK_OVERFETCH
+                await connection.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search_for(ef_search, chunk_limit))}")
+                chunk_rows = await connection.fetch(
+                    f'SELECT message_id, embedding {operator} $1 AS distance FROM message_chunks '
+                    f'ORDER BY embedding {operator} $1 LIMIT $2',
+                    query_embedding, chunk_limit
+                )
+                ranked = merge_chunk_hits(
+                    [(row['id'], row['distance']) for row in rows],
+                    [(row['message_id'], row['distance']) for row in chunk_rows],
+                    limit,
+                )
+                missing = [message_id for message_id in ranked if message_id not in messages]
+                if missing:
+                    for row in await connection.fetch(
+                        f'SELECT {MESSAGE_COLUMNS} FROM messages WHERE id = ANY($1::int[])', missing
+                    ):
+                        messages[row['id']] = row_to_message(row)
+                # The best chunk of every chunked hit, including ones matched as a whole
+                best_chunks = await connection.fetch(
+                    f'SELECT DISTINCT ON (message_id) {CHUNK_COLUMNS} FROM message_chunks '
+                    f'WHERE message_id = ANY($2::int[]) ORDER BY message_id, embedding {operator} $1',
+                    query_embedding, ranked
+                )
+        for row in best_chunks:
+            messages[row['message_id']].matched_chunk = MessageChunk(**dict(row))
+        return [messages[message_id] for message_id in ranked if message_id in messages]
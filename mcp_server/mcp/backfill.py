@@ -0,0 +1,347 @@
+"""
+Backfills missing message embeddings and re-embeds messages into a new model.
+
+A message needs work when it has no vector or its vector came from a model
+other than the target (`messages.embedding_model`). Messages are scanned in id
+order, a page at a time; each page is embedded in concurrent batches through
+an EmbeddingBatcher (with retries) under a request rate limit, and its vectors
+are written in the same transaction as the checkpoint in `embedding_backfills`.
+A crashed or interrupted run therefore resumes after the last committed page.
+The checkpoint never moves past a message that failed to embed, so the next
+run retries it.
+
+When the target is the model search queries with (EMBEDDING_MODEL), vectors
+are written in place: they only replace missing or outdated ones. Any other
+target is staged in `embedding_next` and swapped into `embedding` for all
+messages in one transaction at the end, so search keeps using a consistent
+vector space throughout a full re-embed. Services keep writing old-model rows
+until EMBEDDING_MODEL changes, so the swap embeds those stragglers (up to
+`max_catch_up` of them) under a lock that holds writers off until it commits.
+It is refused, changing nothing, when there are more stragglers than that or
+one fails to embed; rerun the backfill first. The swap drops chunks embedded
+with other models; `--chunks` (re)builds message_chunks for long messages, for
+the serving model only. Run from mcp_server/:
+
+    python -m mcp.backfill                                    # fill missing vectors
+    python -m mcp.backfill --chunks                           # chunk long messages
+    python -m mcp.backfill --model models/text-embedding-004 --no-swap
+    python -m mcp.backfill --model models/text-embedding-004 --swap-only
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from .chunking import chunk_text
+from .database import db
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_providers import BaseEmbeddingProvider, create_embedding_provider
+from config import settings
+
+
+class RateLimiter:
+    """Spaces calls so that at most `rate` start per second (no limit when rate is None)."""
+
+    def __init__(self, rate: float | None, clock: Callable[[], float] = time.monotonic):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._clock = clock
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = self._clock()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def rate_limited(embed_batch: Callable[[List[str]], Awaitable[List[List[float]]]], limiter: RateLimiter):
+    async def call(texts: List[str]) -> List[List[float]]:
+        await limiter.acquire()
+        return await embed_batch(texts)
+    return call
+
+
+class IncompleteBackfill(Exception):
+    """Some messages have no vector from the target model yet, so swapping would mix models."""
+
+
+class Backfill:
+    def __init__(
+        self,
+        provider: BaseEmbeddingProvider,
+        staged: bool,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        max_rps: float | None = None,
+        max_retries: int = 3,
+        max_catch_up: int = 1000,
+    ):
+        self.provider = provider
+        self.model = provider.model_name
+        self.staged = staged
+        self.page_size = batch_size * concurrency
+        # Messages swap() may embed itself while holding the lock
+        self.max_catch_up = max_catch_up
+        self.batcher = EmbeddingBatcher(
+            rate_limited(provider.embed_batch, RateLimiter(max_rps)),
+            max_batch_size=batch_size,
+            max_wait=0.01,
+            max_concurrency=concurrency,
+            max_retries=max_retries,
+            backoff_base=settings.embedding_retry_backoff,
+        )
+        self.processed = 0
+        self.failed = 0
+        # Id before the first message this run failed to embed: the furthest the checkpoint may go
+        self._retry_after: int | None = None
+
+    @property
+    def _needs_work(self) -> str:
+        if self.staged:
+            return 'embedding_model IS DISTINCT FROM $3 AND embedding_next_model IS DISTINCT FROM $3'
+        return '(embedding IS NULL OR embedding_model IS DISTINCT FROM $3)'
+
+    @property
+    def _write_sql(self) -> str:
+        if self.staged:
+            return 'UPDATE messages SET embedding_next = $2, embedding_next_model = $3 WHERE id = $1'
+        return 'UPDATE messages SET embedding = $2, embedding_model = $3 WHERE id = $1'
+
+    async def checkpoint(self, restart: bool = False) -> int:
+        """Creates or resets this model's checkpoint and returns the id to resume after."""
+        async with db.get_pool().acquire() as connection:
+            return await connection.fetchval(
+                'INSERT INTO embedding_backfills (target_model, staged) VALUES ($1, $2) '
+                'ON CONFLICT (target_model) DO UPDATE SET staged = EXCLUDED.staged, updated_at = now(), '
+                'last_id = CASE WHEN $3 THEN 0 ELSE embedding_backfills.last_id END, '
+                'processed = CASE WHEN $3 THEN 0 ELSE embedding_backfills.processed END, '
+                'failed = CASE WHEN $3 THEN 0 ELSE embedding_backfills.failed END '
+                'RETURNING last_id',
+                self.model, self.staged, restart
+            )
+
+    async def run_page(self, after_id: int) -> int | None:
+        """Embeds and stores the next page after `after_id`; returns its last id, or None when done."""
+        async with db.get_pool().acquire() as connection:
+            rows = await connection.fetch(
+                f"SELECT id, content FROM messages WHERE id > $1 AND coalesce(content, '') <> '' "
+                f'AND {self._needs_work} ORDER BY id LIMIT $2',
+                after_id, self.page_size, self.model
+            )
+        if not rows:
+            return None
+        results = await asyncio.gather(
+            *(self.batcher.embed(row['content']) for row in rows), return_exceptions=True
+        )
+        updates = [(row['id'], vector, self.model) for row, vector in zip(rows, results) if not isinstance(vector, Exception)]
+        failed = len(rows) - len(updates)
+        last_id = rows[-1]['id']
+        if failed and self._retry_after is None:
+            first_failed = next(row['id'] for row, vector in zip(rows, results) if isinstance(vector, Exception))
+            self._retry_after = first_failed - 1
+        # This run carries on after the page; the next one resumes at the first failure
+        checkpoint_id = last_id if self._retry_after is None else self._retry_after
+        async with db.get_pool().acquire() as connection:
+            async with connection.transaction():
+                if updates:
+                    await connection.executemany(self._write_sql, updates)
+                await connection.execute(
+                    'UPDATE embedding_backfills SET last_id = $2, processed = processed + $3, failed = failed + $4, '
+                    'updated_at = now() WHERE target_model = $1',
+                    self.model, checkpoint_id, len(updates), failed
+                )
+        self.processed += len(updates)
+        self.failed += failed
+        return last_id
+
+    async def run(self, restart: bool = False, progress: Callable[[int, int, int], None] | None = None) -> int:
+        """Processes every remaining page and returns the id of the last message handled."""
+        self._retry_after = None
+        last_id = await self.checkpoint(restart)
+        while (page_end := await self.run_page(last_id)) is not None:
+            last_id = page_end
+            if progress is not None:
+                progress(last_id, self.processed, self.failed)
+        return last_id
+
+    async def run_chunk_page(self, after_id: int) -> int | None:
+        """
+        Chunks and embeds the next page of long messages after `after_id` that
+        have no chunks from the target model, replacing any older chunks.
+        Returns the page's last id, or None when done.
+        """
+        async with db.get_pool().acquire() as connection:
+            rows = await connection.fetch(
+                'SELECT id, content FROM messages m WHERE id > $1 AND length(content) > $2 AND NOT EXISTS '
+                '(SELECT 1 FROM message_chunks c WHERE c.message_id = m.id AND c.embedding_model = $3) '
+                'ORDER BY id LIMIT $4',
+                after_id, settings.chunk_max_chars, self.model, self.page_size // 4 or 1
+            )
+        if not rows:
+            return None
+        pieces = {row['id']: chunk_text(row['content'], settings.chunk_max_chars, settings.chunk_overlap) for row in rows}
+        results = await asyncio.gather(
+            *(self.batcher.embed(piece.text) for chunks in pieces.values() for piece in chunks), return_exceptions=True
+        )
+        vectors = iter(results)
+        records, done = [], []
+        for message_id, chunks in pieces.items():
+            embedded = [(piece, next(vectors)) for piece in chunks]
+            if any(isinstance(vector, Exception) for _, vector in embedded):
+                self.failed += 1
+                continue
+            done.append(message_id)
+            records += [
+                (message_id, piece.index, piece.start, piece.end, piece.text, vector, self.model)
+                for piece, vector in embedded
+            ]
+        if done:
+            async with db.get_pool().acquire() as connection:
+                async with connection.transaction():
+                    await connection.execute('DELETE FROM message_chunks WHERE message_id = ANY($1::int[])', done)
+                    await connection.executemany(
+                        'INSERT INTO message_chunks (message_id, chunk_index, start_offset, end_offset, content, '
+                        'embedding, embedding_model) VALUES ($1, $2, $3, $4, $5, $6, $7)',
+                        records
+                    )
+        self.processed += len(done)
+        return rows[-1]['id']
+
+    async def run_chunks(self, progress: Callable[[int, int, int], None] | None = None) -> int:
+        """Chunks every long message still missing chunks. Resumes by itself: finished messages no longer match."""
+        last_id = 0
+        while (page_end := await self.run_chunk_page(last_id)) is not None:
+            last_id = page_end
+            if progress is not None:
+                progress(last_id, self.processed, self.failed)
+        return last_id
+
+    async def swap(self) -> int:
+        """
+        Atomically replaces the live vectors with the staged ones; returns the
+        number of messages swapped. Non-empty messages written with another
+        model since the backfill ran are embedded first, inside the same
+        transaction. Raises IncompleteBackfill, changing nothing, if there are
+        more than `max_catch_up` of them or any fails to embed.
+        """
+        async with db.get_pool().acquire() as connection:
+            async with connection.transaction():
+                # Blocks writers (but not searches) until commit, so no message can be
+                # written with the old model between the catch-up and the swap
+                await connection.execute('LOCK TABLE messages IN SHARE ROW EXCLUSIVE MODE')
+                stragglers = await connection.fetch(
+                    "SELECT id, content FROM messages WHERE coalesce(content, '') <> '' AND "
+                    'embedding_model IS DISTINCT FROM $1 AND embedding_next_model IS DISTINCT FROM $1 '
+                    'ORDER BY id LIMIT $2',
+                    self.model, self.max_catch_up + 1
+                )
+                if len(stragglers) > self.max_catch_up:
+                    raise IncompleteBackfill(
+                        f"More than {self.max_catch_up} messages have no {self.model} vector yet; "
+                        "run the backfill again before swapping"
+                    )
+                if stragglers:
+                    results = await asyncio.gather(
+                        *(self.batcher.embed(row['content']) for row in stragglers), return_exceptions=True
+                    )
+                    failed = sum(isinstance(vector, Exception) for vector in results)
+                    if failed:
+                        raise IncompleteBackfill(f"{failed} messages could not be embedded with {self.model}")
+                    await connection.executemany(
+                        'UPDATE messages SET embedding_next = $2, embedding_next_model = $3 WHERE id = $1',
+                        [(row['id'], vector, self.model) for row, vector in zip(stragglers, results)]
+                    )
+                result = await connection.execute(
+                    'UPDATE messages SET embedding = embedding_next, embedding_model = embedding_next_model, '
+                    'embedding_next = NULL, embedding_next_model = NULL WHERE embedding_next_model = $1',
+                    self.model
+                )
+                # Chunk vectors from the old model would not be comparable to new queries
+                await connection.execute('DELETE FROM message_chunks WHERE embedding_model <> $1', self.model)
+                await connection.execute(
+                    'UPDATE embedding_backfills SET swapped_at = now(), updated_at = now() WHERE target_model = $1',
+                    self.model
+                )
+        return int(result.split()[-1])
+
+
+def create_provider(args) -> BaseEmbeddingProvider:
+    return create_embedding_provider(
+        args.provider,
+        api_key=settings.gemini_api_key,
+        model=args.model,
+        dimensions=settings.embedding_dimensions,
+        max_workers=args.concurrency,
+    )
+
+
+async def run(args):
+    # Only the model search embeds queries with may be written in place
+    serving = (args.provider, args.model) == (settings.embedding_provider, settings.embedding_model)
+    backfill = Backfill(
+        create_provider(args),
+        staged=not serving,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        max_rps=args.max_rps,
+        max_retries=settings.embedding_max_retries,
+        max_catch_up=args.max_catch_up,
+    )
+    mode = "staged" if backfill.staged else "in place"
+    if args.chunks and backfill.staged:
+        raise SystemExit("--chunks only builds chunks for the serving EMBEDDING_MODEL; run it after switching models.")
+    await db.connect_to_db()
+    try:
+        if args.chunks:
+            print(f"Chunking long messages with {backfill.model}")
+            await backfill.run_chunks(
+                progress=lambda last_id, done, failed: print(f"  up to id {last_id}: {done} chunked, {failed} failed")
+            )
+            print(f"Done: {backfill.processed} messages chunked, {backfill.failed} failed")
+        elif not args.swap_only:
+            started = time.perf_counter()
+            print(f"Embedding messages with {backfill.model} ({mode})")
+
+            def progress(last_id, processed, failed):
+                rate = processed / (time.perf_counter() - started)
+                print(f"  up to id {last_id}: {processed} embedded, {failed} failed ({rate:.0f}/s)")
+
+            await backfill.run(restart=args.restart, progress=progress)
+            print(f"Done: {backfill.processed} embedded, {backfill.failed} failed")
+        if backfill.staged and not args.no_swap:
+            try:
+                swapped = await backfill.swap()
+            except IncompleteBackfill as e:
+                raise SystemExit(f"Not swapped: {e}") from e
+            print(f"Swapped {swapped} messages to {backfill.model}. Set EMBEDDING_MODEL={args.model} on every service.")
+    finally:
+        await db.close_db_connection()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default=settings.embedding_provider)
+    parser.add_argument("--model", default=settings.embedding_model, help="target model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--batch-size", type=int, default=settings.embedding_batch_size, help="texts per provider call")
+    parser.add_argument("--concurrency", type=int, default=settings.embedding_max_concurrency, help="provider calls in flight")
+    parser.add_argument("--max-rps", type=float, default=None, help="provider calls started per second")
+    parser.add_argument("--restart", action="store_true", help="rescan from the first message instead of the checkpoint")
+    parser.add_argument("--no-swap", action="store_true", help="leave staged vectors in embedding_next")
+    parser.add_argument("--max-catch-up", type=int, default=1000,
+                        help="messages written since the backfill that the swap embeds itself")
+    parser.add_argument("--swap-only", action="store_true", help="only swap in vectors staged by an earlier run")
+    parser.add_argument("--chunks", action="store_true", help="chunk long messages instead of embedding whole ones")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
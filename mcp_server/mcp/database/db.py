@@ -1,11 +1,60 @@
 import asyncpg
+from pgvector.asyncpg import register_vector
 from config import settings
 
-db_pool = None
+# The single connection pool shared by search, the /chat write path and scripts.
+# It is created by connect_to_db() (called from the FastAPI lifespan in
+# mcp/server.py) and must be accessed through get_pool() rather than imported
+# directly, since the module-level name is rebound on startup.
+db_pool: asyncpg.Pool | None = None
 
-async def connect_to_db():
+
+async def _init_connection(connection: asyncpg.Connection):
+    """Registers the pgvector codec so embeddings round-trip as vectors."""
+    await register_vector(connection)
+
+
+async def connect_to_db() -> asyncpg.Pool:
     global db_pool
-    db_pool = await asyncpg.create_pool(dsn=settings.database_url)
+    if db_pool is None:
+        db_pool = await asyncpg.create_pool(
+            dsn=settings.database_url,
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            statement_cache_size=settings.db_statement_cache_size,
+            max_inactive_connection_lifetime=settings.db_max_inactive_connection_lifetime,
+            command_timeout=settings.db_command_timeout,
+            init=_init_connection,
+        )
+    return db_pool
+
 
 async def close_db_connection():
-    await db_pool.close()
+    global db_pool
+    if db_pool is not None:
+        await db_pool.close()
+        db_pool = None
+
+
+def get_pool() -> asyncpg.Pool:
+    """Returns the shared pool, failing loudly if the app has not started it."""
+    if db_pool is None:
+        raise RuntimeError("Database pool is not initialised; call connect_to_db() first.")
+    return db_pool
+
+
+def pool_stats() -> dict:
+    """Returns current pool usage, suitable for the /stats endpoint."""
+    if db_pool is None:
+        return {"connected": False}
+    size = db_pool.get_size()
+    idle = db_pool.get_idle_size()
+    return {
+        "connected": True,
+        "min_size": db_pool.get_min_size(),
+        "max_size": db_pool.get_max_size(),
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "statement_cache_size": settings.db_statement_cache_size,
+    }
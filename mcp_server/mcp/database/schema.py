@@ -1,5 +1,6 @@
 import datetime
-from sqlalchemy import (Column, DateTime, ForeignKey, Integer, String, Text)
+from sqlalchemy import (BigInteger, Boolean, Column, Computed, DateTime, ForeignKey, Index, Integer, String, Text, func, text)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import declarative_base, relationship
 from pgvector.sqlalchemy import Vector
 
@@ -9,6 +10,8 @@ class Conversation(Base):
     __tablename__ = "conversations"
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Client-chosen key that makes re-ingesting the same source a no-op (see conversation_feeder)
+    idempotency_key = Column(String(255), unique=True)
     messages = relationship("Message", back_populates="conversation")
 
 class Message(Base):
@@ -17,6 +20,124 @@ class Message(Base):
     conversation_id = Column(Integer, ForeignKey("conversations.id"))
     role = Column(String(50))  # e.g., 'user', 'assistant'
     content = Column(Text)
+    content_hash = Column(String(64))  # sha256 of whitespace-normalized content
+    position = Column(Integer)  # index within the ingested source; NULL for chat messages
     embedding = Column(Vector(768)) # For models/embedding-001
+    embedding_model = Column(String(100))  # model that produced `embedding`
+    # Vectors staged by mcp/backfill.py while re-embedding into a new model
+    embedding_next = Column(Vector(768))
+    embedding_next_model = Column(String(100))
+    # Set by a trigger whenever `embedding` is written (20261016_embedding_updated_at)
+    embedding_updated_at = Column(DateTime)
+    # Full-text search vector, generated by Postgres from `content`
+    content_tsv = Column(TSVECTOR, Computed("to_tsvector('english', coalesce(content, ''))", persisted=True))
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
-    conversation = relationship("Conversation", back_populates="messages")
\ No newline at end of file
+    conversation = relationship("Conversation", back_populates="messages")
+    chunks = relationship("MessageChunk", back_populates="message", order_by="MessageChunk.chunk_index")
+
+    # Not stored: the chunk of this message that best matched a search, if any
+    matched_chunk = None
+
+    # GIN index for lexical search (20261016_content_tsv) and the default ANN
+    # indexes (20261016_vector_index), one per distance metric accepted by search.
+    __table_args__ = (
+        Index("ix_messages_content_tsv", "content_tsv", postgresql_using="gin"),
+        Index("ix_messages_content_hash", "content_hash"),
+        Index("ix_messages_embedding_updated_at", "embedding_updated_at", "id"),
+        Index(
+            "ix_messages_embedding_next_model", "embedding_next_model",
+            postgresql_where=text("embedding_next_model IS NOT NULL"),
+        ),
+        Index(
+            "ix_messages_conversation_position", "conversation_id", "position",
+            unique=True, postgresql_where=text("position IS NOT NULL"),
+        ),
+    ) + tuple(
+        Index(
+            f"ix_messages_embedding_{metric}", "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": opclass},
+        )
+        for metric, opclass in (("l2", "vector_l2_ops"), ("cosine", "vector_cosine_ops"), ("ip", "vector_ip_ops"))
+    )
+
+class MessageChunk(Base):
+    """An overlapping slice of a long message with its own embedding (see mcp/chunking.py)."""
+    __tablename__ = "message_chunks"
+    id = Column(BigInteger, primary_key=True)
+    message_id = Column(Integer, ForeignKey("messages.id", ondelete="CASCADE"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    start_offset = Column(Integer, nullable=False)  # character offsets into messages.content
+    end_offset = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    embedding = Column(Vector(768), nullable=False)
+    embedding_model = Column(String(100), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    message = relationship("Message", back_populates="chunks")
+
+    __table_args__ = (
+        Index("ix_message_chunks_message_id_chunk_index", "message_id", "chunk_index", unique=True),
+    ) + tuple(
+        Index(
+            f"ix_message_chunks_embedding_{metric}", "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": opclass},
+        )
+        for metric, opclass in (("l2", "vector_l2_ops"), ("cosine", "vector_cosine_ops"), ("ip", "vector_ip_ops"))
+    )
+
+class EmbeddingCacheEntry(Base):
+    """Persistent second tier of the query embedding cache in mcp/embedding.py."""
+    __tablename__ = "embedding_cache"
+    model = Column(String(100), primary_key=True)
+    content_hash = Column(String(64), primary_key=True)  # sha256 of whitespace-normalized text
+    embedding = Column(Vector(768), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class EmbeddingBackfill(Base):
+    """Checkpoint of a backfill/re-embedding run of mcp/backfill.py, one row per target model."""
+    __tablename__ = "embedding_backfills"
+    target_model = Column(String(100), primary_key=True)
+    staged = Column(Boolean, nullable=False)  # writing to embedding_next, swapped in at the end
+    last_id = Column(Integer, nullable=False, server_default="0")  # messages up to here are done
+    processed = Column(Integer, nullable=False, server_default="0")
+    failed = Column(Integer, nullable=False, server_default="0")
+    started_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+    swapped_at = Column(DateTime)
+
+
+class ConversationSummary(Base):
+    """Rolling summary of a conversation, maintained by mcp/rolling_summary.py."""
+    __tablename__ = "conversation_summaries"
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text, nullable=False)
+    last_message_id = Column(Integer, nullable=False)  # newest message folded into the summary
+    message_count = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now())
+
+
+class IngestJob(Base):
+    """A queued /api/ingest request, processed by conversation_feeder's workers."""
+    __tablename__ = "ingest_jobs"
+    id = Column(BigInteger, primary_key=True)
+    status = Column(String(20), nullable=False, server_default="queued")  # queued, running, succeeded, failed
+    payload = Column(JSONB, nullable=False)  # {"messages": [{"role": ..., "content": ...}], "idempotency_key": ...}
+    message_count = Column(Integer, nullable=False)
+    processed_count = Column(Integer, nullable=False, server_default="0")
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="SET NULL"))
+    attempts = Column(Integer, nullable=False, server_default="0")
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+    available_at = Column(DateTime, nullable=False, server_default=func.now())  # earliest next attempt of a queued job
+
+    __table_args__ = (
+        Index("ix_ingest_jobs_runnable", "id", postgresql_where=text("status IN ('queued', 'running')")),
+    )
+
@@ -1,19 +1,130 @@
-import google.generativeai as genai
-import asyncio
+import hashlib
+import time
+from typing import List
+from . import metrics
+from .cache import LRUCache
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_providers import create_embedding_provider
+from .singleflight import SingleFlight
+from .database import db
 from config import settings
 
-# Configure the API key
-genai.configure(api_key=settings.gemini_api_key)
+embedding_provider = create_embedding_provider(
+    settings.embedding_provider,
+    api_key=settings.gemini_api_key,
+    model=settings.embedding_model,
+    dimensions=settings.embedding_dimensions,
+    max_workers=settings.embedding_max_concurrency,
+)
 
-async def generate_embedding(text: str) -> list[float]:
-    """Generates an embedding for the given text using the Google AI API."""
+
+async def _instrumented_embed_batch(texts: List[str]) -> List[List[float]]:
+    """The provider call, recorded in the embedding metrics."""
+    started = time.perf_counter()
+    metrics.embedding_texts.inc(len(texts))
+    metrics.embedding_chars.inc(sum(len(text) for text in texts))
     try:
-        loop = asyncio.get_running_loop()
-        # Use run_in_executor to avoid blocking the event loop with a sync call
-        result = await loop.run_in_executor(
-            None, lambda: genai.embed_content(model='models/embedding-001', content=text)
+        vectors = await embedding_provider.embed_batch(texts)
+    except Exception:
+        metrics.embedding_calls.labels("error").inc()
+        raise
+    finally:
+        metrics.embedding_latency.observe(time.perf_counter() - started)
+    metrics.embedding_calls.labels("ok").inc()
+    return vectors
+
+
+# Concurrent callers are coalesced into batched provider requests
+embedding_batcher = EmbeddingBatcher(
+    _instrumented_embed_batch,
+    max_batch_size=settings.embedding_batch_size,
+    max_wait=settings.embedding_batch_wait_ms / 1000,
+    max_concurrency=settings.embedding_max_concurrency,
+    max_retries=settings.embedding_max_retries,
+    backoff_base=settings.embedding_retry_backoff,
+)
+
+# In-process tier, keyed by (model, content hash)
+embedding_cache = LRUCache(settings.embedding_cache_size, settings.embedding_cache_ttl)
+
+# Concurrent misses for the same text share one cache lookup and remote call
+embedding_flights = SingleFlight()
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so trivially different inputs share a cache entry."""
+    return " ".join(text.split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+async def _load_persisted(model: str, digest: str) -> list[float] | None:
+    async with db.get_pool().acquire() as connection:
+        embedding = await connection.fetchval(
+            'SELECT embedding FROM embedding_cache WHERE model = $1 AND content_hash = $2',
+            model, digest
+        )
+    return embedding.tolist() if embedding is not None else None
+
+
+async def _persist(model: str, digest: str, embedding: list[float]):
+    async with db.get_pool().acquire() as connection:
+        await connection.execute(
+            'INSERT INTO embedding_cache (model, content_hash, embedding) VALUES ($1, $2, $3) '
+            'ON CONFLICT (model, content_hash) DO NOTHING',
+            model, digest, embedding
         )
-        return result['embedding']
+
+
+async def _embed_remote(text: str) -> list[float]:
+    return await embedding_batcher.embed(text)
+
+
+async def generate_embedding(text: str) -> list[float]:
+    """
+    Generates an embedding for the given text using the configured provider.
+
+    Results are cached in-process (LRU + TTL) and, when EMBEDDING_CACHE_PERSISTENT
+    is set, in the `embedding_cache` table so restarts and other services can
+    reuse vectors that were already computed. Failures are not cached.
+    Concurrent misses for the same text are coalesced into one lookup.
+    """
+    model = embedding_provider.model_name
+    digest = content_hash(text)
+    key = (model, digest)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return cached
+    if settings.coalesce_requests:
+        return await embedding_flights.do(key, lambda: _generate_uncached(text, key))
+    return await _generate_uncached(text, key)
+
+
+async def _generate_uncached(text: str, key: tuple[str, str]) -> list[float] | None:
+    model, digest = key
+    persistent = settings.embedding_cache_persistent and db.db_pool is not None
+    if persistent:
+        try:
+            embedding = await _load_persisted(model, digest)
+        except Exception as e:
+            print(f"Could not read the persistent embedding cache: {e}")
+            embedding = None
+        if embedding is not None:
+            embedding_cache.put(key, embedding)
+            return embedding
+
+    try:
+        embedding = await _embed_remote(text)
     except Exception as e:
         print(f"An error occurred during embedding generation: {e}")
         return None
+
+    embedding_cache.put(key, embedding)
+    if persistent:
+        try:
+            await _persist(model, digest, embedding)
+        except Exception as e:
+            print(f"Could not write the persistent embedding cache: {e}")
+    return embedding
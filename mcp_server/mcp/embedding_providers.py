@@ -0,0 +1,136 @@
+"""
+Embedding providers.
+
+Like embedding_batcher.py, this module is shared verbatim by mcp_server and
+conversation_feeder, so it must not import either service's `config`. Keep
+`conversation_feeder/embedding_providers.py` identical to this file.
+"""
+import asyncio
+import re
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+import numpy as np
+
+
+class BaseEmbeddingProvider(ABC):
+    """
+    This is the abstract base class for all embedding providers.
+    To add support for a new embedding model, create a class that inherits from this one.
+
+    Example of a new provider:
+    --------------------------
+
+    from .embedding_providers import BaseEmbeddingProvider
+
+    class MyEmbeddingProvider(BaseEmbeddingProvider):
+        model_name = "my-model-v1"
+        dimensions = 768
+
+        async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+            # ... one vector per text, in order ...
+            return await my_embedding_api_call(texts)
+
+    Then, register it in `create_embedding_provider` below and select it with the
+    EMBEDDING_PROVIDER setting.
+    """
+
+    # Identifies the vector space; used in cache keys so vectors from different
+    # models are never mixed up.
+    model_name: str
+    dimensions: int
+
+    @abstractmethod
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Returns one embedding per input text, in the same order."""
+        pass
+
+
+class GeminiEmbeddingProvider(BaseEmbeddingProvider):
+    """Google Gemini embeddings through the blocking SDK on a dedicated thread pool."""
+
+    def __init__(self, api_key: str, model: str = "models/embedding-001", dimensions: int = 768, max_workers: int = 4):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model_name = model
+        self.dimensions = dimensions
+        # Bounded pool so embedding bursts cannot starve the default executor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self._executor, lambda: self._genai.embed_content(model=self.model_name, content=texts)
+        )
+        return result['embedding']
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=65536)
+def _hash_token(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+class LocalEmbeddingProvider(BaseEmbeddingProvider):
+    """
+    A deterministic, offline embedder for load tests and development.
+
+    Word unigrams and bigrams are hashed (CRC32) into `n_buckets` signed
+    features, and the resulting sparse count matrix is multiplied by a fixed
+    Gaussian random projection seeded by `seed`. Texts sharing words therefore
+    get nearby vectors, results are stable across processes, and a batch is a
+    single matrix product. Vectors are L2-normalised. Batches are computed on a
+    small thread pool so large ones do not block the event loop.
+    """
+
+    def __init__(self, dimensions: int = 768, n_buckets: int = 4096, seed: int = 0, max_workers: int = 4):
+        self.dimensions = dimensions
+        self.n_buckets = n_buckets
+        self.model_name = f"local-hash-{dimensions}-{n_buckets}-{seed}"
+        rng = np.random.default_rng(seed)
+        self._projection = (rng.standard_normal((n_buckets, dimensions)) / np.sqrt(dimensions)).astype(np.float32)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="local-embedding")
+
+    def _feature(self, token: str) -> tuple[int, float]:
+        digest = _hash_token(token)
+        return digest % self.n_buckets, 1.0 if digest & 0x80000000 else -1.0
+
+    def _features(self, text: str) -> list[tuple[int, float]]:
+        words = _TOKEN_RE.findall(text.lower())
+        tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return [self._feature(token) for token in tokens]
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        counts = np.zeros((len(texts), self.n_buckets), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if features:
+                buckets, signs = zip(*features)
+                np.add.at(counts[row], np.asarray(buckets), np.asarray(signs, dtype=np.float32))
+        vectors = counts @ self._projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: self.embed_sync(texts).tolist())
+
+
+def create_embedding_provider(
+    name: str,
+    api_key: str | None = None,
+    model: str = "models/embedding-001",
+    dimensions: int = 768,
+    max_workers: int = 4,
+) -> BaseEmbeddingProvider:
+    """Builds the provider selected by the EMBEDDING_PROVIDER setting."""
+    if name == "gemini":
+        return GeminiEmbeddingProvider(api_key, model=model, dimensions=dimensions, max_workers=max_workers)
+    if name == "local":
+        return LocalEmbeddingProvider(dimensions=dimensions, max_workers=max_workers)
+    raise ValueError(f"Unknown embedding provider {name!r}; expected 'gemini' or 'local'")
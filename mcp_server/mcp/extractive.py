@@ -0,0 +1,75 @@
+import re
+from typing import List, Sequence
+import numpy as np
+from .database.schema import Message
+from .embedding_providers import LocalEmbeddingProvider
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Sentence vectors come from the offline hashing embedder: no network call, and
+# a whole context is scored with a couple of small matrix products.
+_sentence_embedder = LocalEmbeddingProvider(dimensions=256, n_buckets=2048)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text or "") if s and s.strip()]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def extractive_summary(
+    messages: List[Message],
+    query_text: str | None = None,
+    query_embedding: Sequence[float] | None = None,
+    max_chars: int = 1200,
+    centrality_weight: float = 0.4,
+    message_weight: float = 0.3,
+) -> str:
+    """
+    Picks the most useful sentences from `messages` without calling an LLM.
+
+    Each sentence is scored by a mix of
+      - similarity to the query (when `query_text` is given),
+      - centrality: mean similarity to the other sentences, i.e. how typical it
+        is of the retrieved context, and
+      - the cosine similarity between its message's stored embedding and
+        `query_embedding`, when both are available.
+    The best sentences are taken greedily until `max_chars` is reached and
+    returned in their original order, prefixed with the speaker's role.
+    """
+    sentences = [(i, msg.role, sentence) for i, msg in enumerate(messages) for sentence in split_sentences(msg.content)]
+    if not sentences:
+        return ""
+
+    vectors = _sentence_embedder.embed_sync([sentence for _, _, sentence in sentences])
+    similarity = vectors @ vectors.T
+    centrality = (similarity.sum(axis=1) - 1.0) / max(len(sentences) - 1, 1)
+
+    relevance = np.zeros(len(sentences), dtype=np.float32)
+    if query_text:
+        relevance = vectors @ _sentence_embedder.embed_sync([query_text])[0]
+
+    prior = np.zeros(len(sentences), dtype=np.float32)
+    usable = [i for i, msg in enumerate(messages) if msg.embedding is not None]
+    if query_embedding is not None and usable:
+        message_vectors = _normalize(np.asarray([messages[i].embedding for i in usable], dtype=np.float32))
+        query_vector = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        per_message = dict(zip(usable, message_vectors @ query_vector))
+        prior = np.asarray([per_message.get(i, 0.0) for i, _, _ in sentences], dtype=np.float32)
+
+    relevance_weight = 1.0 - centrality_weight - message_weight
+    scores = relevance_weight * relevance + centrality_weight * centrality + message_weight * prior
+
+    chosen, used = [], 0
+    for index in np.argsort(-scores, kind="stable"):
+        line = f"{sentences[index][1]}: {sentences[index][2]}"
+        if used + len(line) > max_chars:
+            if not chosen:
+                chosen.append((index, line[:max_chars]))
+            continue
+        chosen.append((index, line))
+        used += len(line) + 1
+    return "\n".join(line for _, line in sorted(chosen))
@@ -0,0 +1,103 @@
+"""
+Prometheus metrics for the hot path, served on /metrics.
+
+Latencies are recorded where the work happens (StageTimer stages, search,
+LLM and embedding calls); counters that components already keep for /stats
+(caches, batcher, pool usage) are read at scrape time instead of duplicated.
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+# A private registry keeps the exposition to this app's metrics
+registry = CollectorRegistry(auto_describe=True)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+stage_latency = Histogram(
+    "mcp_stage_latency_seconds", "Latency of each pipeline stage.",
+    ["component", "stage"], buckets=LATENCY_BUCKETS, registry=registry,
+)
+llm_calls = Counter(
+    "mcp_llm_calls_total", "LLM calls by operation and outcome.",
+    ["operation", "outcome"], registry=registry,
+)
+llm_latency = Histogram(
+    "mcp_llm_latency_seconds", "LLM call latency (until the last chunk for streams).",
+    ["operation"], buckets=LATENCY_BUCKETS, registry=registry,
+)
+llm_chars = Counter(
+    "mcp_llm_chars_total", "Characters sent to and received from the LLM.",
+    ["direction"], registry=registry,
+)
+embedding_calls = Counter(
+    "mcp_embedding_calls_total", "Batched embedding provider calls by outcome.",
+    ["outcome"], registry=registry,
+)
+embedding_latency = Histogram(
+    "mcp_embedding_latency_seconds", "Embedding provider call latency.",
+    buckets=LATENCY_BUCKETS, registry=registry,
+)
+embedding_texts = Counter(
+    "mcp_embedding_texts_total", "Texts sent to the embedding provider.", registry=registry,
+)
+embedding_chars = Counter(
+    "mcp_embedding_chars_total", "Characters sent to the embedding provider.", registry=registry,
+)
+summaries = Counter(
+    "mcp_summaries_total", "Context summaries by mode and whether they came from the cache.",
+    ["mode", "source"], registry=registry,
+)
+
+
+def observe_stage(component: str, stage: str, seconds: float):
+    stage_latency.labels(component, stage).observe(seconds)
+
+
+@contextmanager
+def timed(component: str, stage: str):
+    """Records the duration of the block as `stage` of `component`, even if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(component, stage, time.perf_counter() - started)
+
+
+class _StatsCollector:
+    """Exposes the numeric values of registered `stats()` dicts as gauges at scrape time."""
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], dict]] = {}
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "mcp_runtime_stat", "Runtime statistics also reported on /stats.", labels=["component", "stat"]
+        )
+        for component, source in self.sources.items():
+            for stat, value in _flatten(source()):
+                family.add_metric([component, stat], float(value))
+        yield family
+
+
+def _flatten(stats: dict, prefix: str = ""):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (int, float)):
+            yield f"{prefix}{key}", value
+
+
+_stats_collector = _StatsCollector()
+registry.register(_stats_collector)
+
+
+def register_stats(component: str, source: Callable[[], dict]):
+    """Publishes `source()` (e.g. a cache's stats method) under `component`."""
+    _stats_collector.sources[component] = source
+
+
+def render() -> bytes:
+    return generate_latest(registry)
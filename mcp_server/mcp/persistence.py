@@ -0,0 +1,69 @@
+from typing import List
+from .chunking import chunk_text
+from .database.db import get_pool
+from .database.schema import Message, MessageChunk
+from . import embedding
+from config import settings
+
+
+async def ensure_conversation(conversation_id: int | None) -> int:
+    """Returns `conversation_id`, creating a new conversation row if it is None."""
+    if conversation_id:
+        return conversation_id
+    async with get_pool().acquire() as connection:
+        return await connection.fetchval('INSERT INTO conversations DEFAULT VALUES RETURNING id')
+
+
+async def embed_chunks(text: str) -> List[MessageChunk]:
+    """
+    Chunks and embeds `text` if it is longer than CHUNK_MAX_CHARS. Chunks go
+    through the batcher directly rather than the query embedding cache. If any
+    chunk fails to embed, none are returned and the message is searched whole.
+    """
+    pieces = chunk_text(text, settings.chunk_max_chars, settings.chunk_overlap)
+    if not pieces:
+        return []
+    try:
+        vectors = await embedding.embedding_batcher.embed_many([piece.text for piece in pieces])
+    except Exception as e:
+        print(f"Could not embed message chunks: {e}")
+        return []
+    model = embedding.embedding_provider.model_name
+    return [
+        MessageChunk(
+            chunk_index=piece.index, start_offset=piece.start, end_offset=piece.end,
+            content=piece.text, embedding=vector, embedding_model=model,
+        )
+        for piece, vector in zip(pieces, vectors)
+    ]
+
+
+async def save_messages(conversation_id: int, messages: List[Message]) -> List[Message]:
+    """
+    Inserts `messages`, and the chunks attached to them, into a conversation in
+    one short transaction and returns them with their new ids. Embeddings must
+    already be computed so no remote call happens while the connection is held.
+    """
+    model = embedding.embedding_provider.model_name
+    async with get_pool().acquire() as connection:
+        async with connection.transaction():
+            for message in messages:
+                message.conversation_id = conversation_id
+                message.embedding_model = model if message.embedding is not None else None
+                message.id = await connection.fetchval(
+                    'INSERT INTO messages (conversation_id, role, content, content_hash, embedding, embedding_model) '
+                    'VALUES ($1, $2, $3, $4, $5, $6) RETURNING id',
+                    conversation_id, message.role, message.content, embedding.content_hash(message.content),
+                    message.embedding, message.embedding_model
+                )
+                if message.chunks:
+                    await connection.executemany(
+                        'INSERT INTO message_chunks (message_id, chunk_index, start_offset, end_offset, content, '
+                        'embedding, embedding_model) VALUES ($1, $2, $3, $4, $5, $6, $7)',
+                        [
+                            (message.id, chunk.chunk_index, chunk.start_offset, chunk.end_offset,
+                             chunk.content, chunk.embedding, chunk.embedding_model)
+                            for chunk in message.chunks
+                        ]
+                    )
+    return messages
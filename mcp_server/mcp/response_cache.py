@@ -0,0 +1,145 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable, Sequence
+import numpy as np
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    context_key: tuple
+    response: str
+    stored_at: float
+    # Ids of the exchanges persisted from this answer (see `exclude_messages`)
+    own_ids: frozenset = frozenset()
+
+
+def context_key(messages: Sequence) -> tuple:
+    """Identifies the context an answer was generated from: each hit's id and a digest of its text."""
+    return tuple(
+        (msg.id, hashlib.sha256((msg.content or "").encode("utf-8")).hexdigest()) for msg in messages
+    )
+
+
+def _same_context(entry: _Entry, key: tuple) -> bool:
+    if not entry.own_ids:
+        return entry.context_key == key
+    # The answer's own stored exchange is ignored. Each of its messages in the
+    # results may push one original hit off the end, but everything else must
+    # still be the original context
+    visible = tuple(hit for hit in key if hit[0] not in entry.own_ids)
+    pushed_out = len(key) - len(visible)
+    return len(visible) >= len(entry.context_key) - pushed_out and visible == entry.context_key[:len(visible)]
+
+
+class SemanticResponseCache:
+    """
+    Caches /chat answers by query meaning rather than exact text.
+
+    A lookup hits when a stored query's embedding is within `max_distance`
+    cosine distance of the new one *and* it was answered from the same context
+    (same retrieved message ids and text), so a near-duplicate question about
+    different material never gets a stale answer. The exchange stored from an
+    answer, once `exclude_messages` has recorded its ids, does not count as
+    different material: otherwise a repeated question would retrieve the stored
+    copy of its first asking and always miss. Any other new message in the
+    results does. Entries expire after
+    `ttl_seconds` and the least recently used ones are evicted beyond
+    `max_entries`. Lookups scan the entries sharing the context key, which stays
+    cheap for the few thousand entries this is sized for.
+
+    Not thread-safe: it is meant to be used from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_distance: float = 0.05,
+        ttl_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry.stored_at > self.ttl_seconds
+
+    def get(self, embedding: Sequence[float], key: tuple) -> str | None:
+        found = self.lookup(embedding, key)
+        return found[1] if found is not None else None
+
+    def lookup(self, embedding: Sequence[float], key: tuple) -> tuple[int, str] | None:
+        """Like `get`, but returns `(entry_id, response)` so the caller can `exclude_messages` later."""
+        now = self._clock()
+        candidates = []
+        for entry_id, entry in list(self._entries.items()):
+            if self._expired(entry, now):
+                del self._entries[entry_id]
+                self.expirations += 1
+            elif _same_context(entry, key):
+                candidates.append(entry_id)
+        if candidates:
+            query = self._unit(embedding)
+            vectors = np.stack([self._entries[entry_id].vector for entry_id in candidates])
+            distances = 1.0 - vectors @ query
+            best = int(np.argmin(distances))
+            if distances[best] <= self.max_distance:
+                self._entries.move_to_end(candidates[best])
+                self.hits += 1
+                return candidates[best], self._entries[candidates[best]].response
+        self.misses += 1
+        return None
+
+    def put(self, embedding: Sequence[float], key: tuple, response: str) -> int | None:
+        """Stores an answer and returns its entry id (None when the cache is disabled)."""
+        if self.max_entries <= 0:
+            return None
+        entry_id = self._next_id
+        self._entries[entry_id] = _Entry(self._unit(embedding), key, response, self._clock())
+        self._next_id += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry_id
+
+    def exclude_messages(self, entry_id: int, message_ids: Iterable[int]):
+        """Records messages stored from the entry's answer, which later lookups ignore."""
+        entry = self._entries.get(entry_id)
+        if entry is not None:
+            entry.own_ids = entry.own_ids.union(message_ids)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,207 @@
+import asyncio
+from typing import Dict, Iterable, List
+from .adapters.base import BaseAdapter
+from .database import db
+from .database.schema import Message
+
+
+def build_rolling_prompt(previous_summary: str | None, new_turns: List[Message]) -> str:
+    """Asks the LLM to fold new turns into the existing summary of a conversation."""
+    transcript = "\n".join(f"{msg.role}: {msg.content}" for msg in new_turns)
+    previous = previous_summary or "(none yet - this is the start of the conversation)"
+    return f"""You maintain running 'cliff notes' for a conversation. Update the existing summary with the new turns below.
+    Keep every key point, decision, name and identifier that is still relevant; drop small talk. Keep it concise.
+    Do not add any preamble or conversational text. Output only the updated summary.
+
+    Existing summary:
+    ---
+    {previous}
+    ---
+
+    New turns:
+    ---
+    {transcript}
+    ---
+
+    Updated summary:"""
+
+
+async def update_conversation_summary(
+    conversation_id: int,
+    llm_adapter: BaseAdapter,
+    min_messages: int = 1,
+    min_chars: int = 0,
+    max_new_messages: int = 200,
+) -> int:
+    """
+    Folds up to `max_new_messages` messages newer than the stored summary into
+    it with one LLM call.
+
+    Nothing happens unless at least `min_messages` new messages or `min_chars`
+    characters of new text have accumulated. No connection is held during the
+    LLM call; the upsert only applies if no concurrent update got further.
+    Returns the number of messages folded in, 0 if the summary was not updated.
+    """
+    async with db.get_pool().acquire() as connection:
+        current = await connection.fetchrow(
+            'SELECT summary, last_message_id, message_count FROM conversation_summaries WHERE conversation_id = $1',
+            conversation_id
+        )
+        last_message_id = current['last_message_id'] if current else 0
+        rows = await connection.fetch(
+            'SELECT id, role, content FROM messages WHERE conversation_id = $1 AND id > $2 ORDER BY id LIMIT $3',
+            conversation_id, last_message_id, max_new_messages
+        )
+    new_turns = [Message(id=row['id'], role=row['role'], content=row['content'] or "") for row in rows]
+    if not new_turns:
+        return 0
+    if len(new_turns) < min_messages and sum(len(msg.content) for msg in new_turns) < min_chars:
+        return 0
+
+    summary = await llm_adapter.send_message(
+        build_rolling_prompt(current['summary'] if current else None, new_turns)
+    )
+
+    message_count = (current['message_count'] if current else 0) + len(new_turns)
+    async with db.get_pool().acquire() as connection:
+        await connection.execute(
+            'INSERT INTO conversation_summaries (conversation_id, summary, last_message_id, message_count, updated_at) '
+            'VALUES ($1, $2, $3, $4, now()) '
+            'ON CONFLICT (conversation_id) DO UPDATE SET summary = EXCLUDED.summary, '
+            'last_message_id = EXCLUDED.last_message_id, message_count = EXCLUDED.message_count, updated_at = now() '
+            'WHERE conversation_summaries.last_message_id < EXCLUDED.last_message_id',
+            conversation_id, summary, new_turns[-1].id, message_count
+        )
+    return len(new_turns)
+
+
+async def get_conversation_summaries(conversation_ids: Iterable[int]) -> Dict[int, str]:
+    ids = [cid for cid in set(conversation_ids) if cid is not None]
+    if not ids:
+        return {}
+    async with db.get_pool().acquire() as connection:
+        rows = await connection.fetch(
+            'SELECT conversation_id, summary FROM conversation_summaries WHERE conversation_id = ANY($1::int[])', ids
+        )
+    return {row['conversation_id']: row['summary'] for row in rows}
+
+
+def format_context(messages: List[Message], summaries: Dict[int, str]) -> str:
+    """
+    Builds the prompt context for retrieved messages: the stored summary of each
+    conversation they belong to, or the raw messages for conversations that have
+    not been summarized yet. Conversations keep the order of their best hit.
+    """
+    by_conversation: Dict[int | None, List[Message]] = {}
+    for msg in messages:
+        by_conversation.setdefault(msg.conversation_id, []).append(msg)
+
+    sections = []
+    for conversation_id, hits in by_conversation.items():
+        if conversation_id in summaries:
+            sections.append(f"Summary of conversation {conversation_id}:\n{summaries[conversation_id]}")
+        else:
+            sections.append("\n".join(f"{msg.role}: {msg.content}" for msg in hits))
+    return "\n\n".join(sections)
+
+
+async def stored_summary_context(messages: List[Message]) -> str:
+    """Context for /chat built from stored summaries, with no LLM call."""
+    summaries = await get_conversation_summaries(msg.conversation_id for msg in messages)
+    return format_context(messages, summaries)
+
+
+class ConversationSummarizer:
+    """
+    Background worker that keeps `conversation_summaries` up to date.
+
+    /chat calls `notify()` after storing an exchange; a periodic scan also
+    queues conversations that grew through other writers (e.g. the feeder).
+    Each queued conversation is handled once at a time by a single worker, so
+    LLM calls for summaries never compete with the request path's concurrency.
+    """
+
+    def __init__(
+        self,
+        llm_adapter: BaseAdapter,
+        min_messages: int = 6,
+        min_chars: int = 4000,
+        max_new_messages: int = 200,
+        scan_interval: float = 60.0,
+    ):
+        self.llm_adapter = llm_adapter
+        self.min_messages = min_messages
+        self.min_chars = min_chars
+        self.max_new_messages = max_new_messages
+        self.scan_interval = scan_interval
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._queued: set[int] = set()
+        self._tasks: list[asyncio.Task] = []
+        self._scan_from_id = 0
+        self.updates = 0
+        self.failures = 0
+
+    def notify(self, conversation_id: int):
+        if conversation_id not in self._queued:
+            self._queued.add(conversation_id)
+            self._queue.put_nowait(conversation_id)
+
+    async def start(self):
+        self._tasks.append(asyncio.create_task(self._worker()))
+        if self.scan_interval > 0:
+            self._tasks.append(asyncio.create_task(self._scan_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _worker(self):
+        while True:
+            conversation_id = await self._queue.get()
+            self._queued.discard(conversation_id)
+            try:
+                folded = await update_conversation_summary(
+                    conversation_id, self.llm_adapter,
+                    min_messages=self.min_messages, min_chars=self.min_chars,
+                    max_new_messages=self.max_new_messages,
+                )
+                if folded:
+                    self.updates += 1
+                if folded == self.max_new_messages:
+                    # More turns may be waiting (e.g. a large feeder ingest); the
+                    # scan has already moved past them, so queue the rest here
+                    self.notify(conversation_id)
+            except Exception as e:
+                self.failures += 1
+                print(f"Failed to update summary for conversation {conversation_id}: {e}")
+
+    async def _scan_loop(self):
+        while True:
+            try:
+                await self.scan()
+            except Exception as e:
+                print(f"Conversation summary scan failed: {e}")
+            await asyncio.sleep(self.scan_interval)
+
+    async def scan(self):
+        """Queues conversations with enough unsummarized messages added since the last scan."""
+        async with db.get_pool().acquire() as connection:
+            newest = await connection.fetchval('SELECT coalesce(max(id), 0) FROM messages')
+            rows = await connection.fetch(
+                'WITH recent AS (SELECT DISTINCT conversation_id FROM messages WHERE id > $1) '
+                'SELECT m.conversation_id, max(m.id) AS newest FROM messages m '
+                'JOIN recent r ON r.conversation_id = m.conversation_id '
+                'LEFT JOIN conversation_summaries s ON s.conversation_id = m.conversation_id '
+                'WHERE m.id > coalesce(s.last_message_id, 0) '
+                'GROUP BY m.conversation_id '
+                'HAVING count(*) >= $2 OR sum(length(m.content)) >= $3',
+                self._scan_from_id, self.min_messages, self.min_chars
+            )
+        for row in rows:
+            self.notify(row['conversation_id'])
+        self._scan_from_id = max(self._scan_from_id, newest)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "updates": self.updates, "failures": self.failures}
@@ -1,21 +1,176 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select
+import asyncio
+from functools import partial
+from typing import Awaitable, List
+from .backends.base import SearchBackend
+from .backends.pgvector import DISTANCE_OPERATORS, PgVectorBackend
 from .database.schema import Message
-from .embedding import generate_embedding
+from .embedding import generate_embedding, normalize_text
+from .metrics import timed
+from .singleflight import SingleFlight
 from config import settings
 
-async def find_relevant_messages(query_text: str, limit: int = 5):
-    """Finds relevant messages in the database using vector similarity search."""
-    query_embedding = await generate_embedding(query_text)
-    if not query_embedding:
-        return []
+SEARCH_MODES = ("vector", "lexical", "hybrid")
 
-    engine = create_async_engine(settings.database_url)
-    async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+_search_backend: SearchBackend | None = None
 
-    async with async_session() as session:
-        # The l2_distance operator (<->) is provided by pgvector
-        stmt = select(Message).order_by(Message.embedding.l2_distance(query_embedding)).limit(limit)
-        result = await session.execute(stmt)
-        return result.scalars().all()
+# Identical concurrent searches share one embedding call and backend query
+search_flights = SingleFlight()
+
+
+def create_search_backend(name: str) -> SearchBackend:
+    """Builds the search backend selected by the SEARCH_BACKEND setting."""
+    if name == "pgvector":
+        return PgVectorBackend(chunks=settings.chunk_search)
+    if name == "mmap":
+        from .backends.mmap import MmapBackend
+        return MmapBackend(
+            settings.mmap_index_path,
+            dim=settings.embedding_dimensions,
+            dtype=settings.mmap_index_dtype,
+            sync_interval=settings.mmap_sync_interval,
+            sync_lookback=settings.mmap_sync_lookback,
+        )
+    raise ValueError(f"Unknown search backend {name!r}; expected 'pgvector' or 'mmap'")
+
+
+def get_search_backend() -> SearchBackend:
+    global _search_backend
+    if _search_backend is None:
+        _search_backend = create_search_backend(settings.search_backend)
+    return _search_backend
+
+
+def set_search_backend(backend: SearchBackend | None):
+    """Replaces the active backend, e.g. with an offline one in tests and benchmarks."""
+    global _search_backend
+    _search_backend = backend
+
+
+def context_view(message: Message) -> Message:
+    """
+    The part of a search hit worth putting in a prompt: a copy of the message
+    holding only its best-matching chunk if search found one, else the message.
+    """
+    chunk = message.matched_chunk
+    if chunk is None:
+        return message
+    view = Message(
+        id=message.id, conversation_id=message.conversation_id, role=message.role,
+        content=chunk.content, created_at=message.created_at,
+    )
+    view.matched_chunk = chunk
+    return view
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Message]], limit: int, k: int = 60) -> List[Message]:
+    """
+    Merges ranked result lists with reciprocal rank fusion: each message scores
+    sum(1 / (k + rank)) over the lists it appears in. Ties keep first-seen order.
+    """
+    scores: dict[int, float] = {}
+    messages: dict[int, Message] = {}
+    for results in result_lists:
+        for rank, message in enumerate(results, start=1):
+            scores[message.id] = scores.get(message.id, 0.0) + 1.0 / (k + rank)
+            messages.setdefault(message.id, message)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [messages[message_id] for message_id in ranked[:limit]]
+
+
+async def _embed_query(
+    query_text: str, query_embedding: list[float] | Awaitable[list[float] | None] | None = None
+) -> list[float] | None:
+    """Embeds the query, treating errors and timeouts as 'no embedding'."""
+    if isinstance(query_embedding, list):
+        return query_embedding
+    pending = query_embedding if query_embedding is not None else generate_embedding(query_text)
+    try:
+        # shield() keeps a caller-owned embedding task alive if we stop waiting for it
+        return await asyncio.wait_for(asyncio.shield(pending), timeout=settings.embedding_timeout)
+    except asyncio.TimeoutError:
+        print(f"Query embedding timed out after {settings.embedding_timeout}s; using lexical search only.")
+        return None
+
+
+async def find_relevant_messages(
+    query_text: str,
+    limit: int | None = None,
+    metric: str | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    mode: str | None = None,
+    query_embedding: list[float] | Awaitable[list[float] | None] | None = None,
+):
+    """
+    Finds relevant messages using the active search backend.
+
+    Concurrent calls with the same normalized query and parameters (and no
+    precomputed embedding) share a single search.
+
+    Args:
+        query_text: The text to search for.
+        limit: Maximum number of messages to return.
+        metric: Distance metric, one of 'l2', 'cosine' or 'ip' (inner product).
+        ef_search: HNSW candidate list size; higher trades latency for recall.
+        probes: IVFFlat lists to probe; higher trades latency for recall.
+        mode: 'vector', 'lexical' (full-text) or 'hybrid' (both, fused with
+            reciprocal rank fusion). Vector and hybrid searches fall back to
+            lexical results if the query embedding fails or times out.
+        query_embedding: A precomputed embedding, or an awaitable (e.g. a task
+            already in flight) resolving to one, to avoid embedding the query twice.
+    """
+    limit = limit or settings.search_limit
+    metric = metric or settings.search_metric
+    mode = mode or settings.search_mode
+    if metric not in DISTANCE_OPERATORS:
+        raise ValueError(f"Unknown distance metric {metric!r}; expected one of {sorted(DISTANCE_OPERATORS)}")
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+    ef_search = ef_search or settings.hnsw_ef_search
+    probes = probes or settings.ivfflat_probes
+
+    search = partial(_search, query_text, limit, metric, ef_search, probes, mode, query_embedding)
+    if settings.coalesce_requests and query_embedding is None:
+        key = (normalize_text(query_text), limit, metric, ef_search, probes, mode)
+        # Each caller gets its own list; the Message objects are shared read-only
+        return list(await search_flights.do(key, search))
+    return await search()
+
+
+async def _search(
+    query_text: str,
+    limit: int,
+    metric: str,
+    ef_search: int | None,
+    probes: int | None,
+    mode: str,
+    query_embedding: list[float] | Awaitable[list[float] | None] | None,
+) -> List[Message]:
+    backend = get_search_backend()
+
+    if mode == "lexical":
+        with timed("search", "lexical"):
+            return await backend.lexical_search(query_text, limit)
+
+    # In hybrid mode, start the lexical query right away so it overlaps the embedding call
+    candidates = max(limit, settings.hybrid_candidates) if mode == "hybrid" else limit
+    lexical_task = asyncio.create_task(backend.lexical_search(query_text, candidates)) if mode == "hybrid" else None
+    try:
+        with timed("search", "embed"):
+            query_embedding = await _embed_query(query_text, query_embedding)
+        if not query_embedding:
+            with timed("search", "lexical_fallback"):
+                lexical_results = await lexical_task if lexical_task else await backend.lexical_search(query_text, limit)
+            return lexical_results[:limit]
+
+        with timed("search", "vector"):
+            vector_results = await backend.search(query_embedding, candidates, metric, ef_search=ef_search, probes=probes)
+        if lexical_task is None:
+            return vector_results
+        # Time spent waiting on lexical results beyond the vector query
+        with timed("search", "lexical_wait"):
+            lexical_results = await lexical_task
+        return reciprocal_rank_fusion([vector_results, lexical_results], limit, k=settings.rrf_k)
+    finally:
+        if lexical_task and not lexical_task.done():
+            lexical_task.cancel()
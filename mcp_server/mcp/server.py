@@ -1,94 +1,361 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+from fastapi import BackgroundTasks, FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import Literal
 from contextlib import asynccontextmanager
 from .adapters.gemini import GeminiAdapter
-from .adapters.base import BaseAdapter
-from .database.db import db_pool
-from .database.schema import Conversation, Message
-from .embedding import generate_embedding
-from .search import find_relevant_messages
-from .summarize import summarize_messages
-from sqlalchemy.future import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from .adapters.gemini_http import GeminiHttpAdapter
+from .adapters.base import BaseAdapter, LLMError
+from .adapters.instrumented import InstrumentedAdapter
+from . import metrics
+from .database.db import connect_to_db, close_db_connection, pool_stats
+from .database.schema import Message
+from .embedding import embedding_batcher, embedding_cache, embedding_flights, generate_embedding
+from .extractive import extractive_summary
+from .search import context_view, find_relevant_messages, get_search_backend, search_flights
+from .persistence import embed_chunks, ensure_conversation, save_messages
+from .response_cache import SemanticResponseCache, context_key
+from .rolling_summary import ConversationSummarizer, stored_summary_context
+from .summarize import summarize_messages, summary_cache_stats
+from .timing import StageTimer
+from config import settings
+
+
+def create_llm_adapter() -> BaseAdapter:
+    """Builds the adapter selected by the LLM_ADAPTER setting, wrapped for metrics."""
+    if settings.llm_adapter == "gemini_http":
+        adapter = GeminiHttpAdapter(
+            settings.gemini_api_key,
+            model=settings.llm_model,
+            timeout=settings.llm_timeout,
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive,
+            max_concurrency=settings.llm_max_concurrency,
+            max_retries=settings.llm_max_retries,
+            backoff_base=settings.llm_retry_backoff,
+            max_backoff=settings.llm_max_retry_backoff,
+        )
+    elif settings.llm_adapter == "gemini":
+        adapter = GeminiAdapter()
+    else:
+        raise ValueError(f"Unknown LLM adapter {settings.llm_adapter!r}; expected 'gemini_http' or 'gemini'")
+    return InstrumentedAdapter(adapter)
 
 
 # Database and LLM Adapter setup
-llm_adapter: BaseAdapter = GeminiAdapter()
+llm_adapter: BaseAdapter = create_llm_adapter()
+
+# Keeps per-conversation summaries current off the request path
+conversation_summarizer = ConversationSummarizer(
+    llm_adapter,
+    min_messages=settings.rolling_summary_min_messages,
+    min_chars=settings.rolling_summary_min_chars,
+    max_new_messages=settings.rolling_summary_max_new_messages,
+    scan_interval=settings.rolling_summary_scan_interval,
+)
+
+
+# Answers to recent questions, reused for near-duplicates with the same context
+response_cache = SemanticResponseCache(
+    settings.response_cache_size,
+    max_distance=settings.response_cache_max_distance,
+    ttl_seconds=settings.response_cache_ttl,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    # In a real app, you would properly manage the pool
-    # For this example, we assume db.py handles it
+    # Startup: open the shared connection pool used by search and persistence
+    await connect_to_db()
+    await get_search_backend().start()
+    if settings.context_strategy == "rolling":
+        await conversation_summarizer.start()
     yield
     # Shutdown
-    pass
+    await conversation_summarizer.stop()
+    await get_search_backend().stop()
+    await close_db_connection()
+    await llm_adapter.aclose()
 
 
 app = FastAPI(title="MCP Server", lifespan=lifespan)
 
 
+@app.exception_handler(LLMError)
+async def llm_error_handler(request: Request, exc: LLMError):
+    """Upstream LLM failures: 503 when a retry may succeed, 502 otherwise."""
+    status_code = 503 if exc.retryable else 502
+    headers = {"Retry-After": str(int(exc.retry_after))} if exc.retry_after else None
+    return JSONResponse(status_code=status_code, content={"detail": str(exc)}, headers=headers)
+
+
 class ChatRequest(BaseModel):
     conversation_id: int | None = None
     message: str
+    search_mode: Literal["vector", "lexical", "hybrid"] | None = None
+    # Setting this summarizes the hits on the request path in the given mode
+    # instead of using CONTEXT_STRATEGY
+    summary_mode: Literal["abstractive", "extractive", "auto"] | None = None
+    # Set to false to always call the LLM, even when RESPONSE_CACHE_ENABLED is on
+    use_cache: bool = True
 
 class SearchRequest(BaseModel):
     query: str
+    mode: Literal["vector", "lexical", "hybrid"] | None = None
+    limit: int | None = Field(default=None, ge=1, le=100)
+    metric: Literal["l2", "cosine", "ip"] | None = None
+    ef_search: int | None = Field(default=None, ge=1, le=1000)
+    probes: int | None = Field(default=None, ge=1, le=10000)
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
-    """Handles a chat message, saves it, and returns a response from the LLM with context injection."""
-    # 1. Find relevant past messages
-    relevant_messages = await find_relevant_messages(request.message)
-
-    # 2. Summarize the messages if any are found
-    context_summary = ""
-    if relevant_messages:
-        context_summary = await summarize_messages(relevant_messages, llm_adapter)
-
-    # 3. Construct the prompt for the LLM
-    prompt = request.message
-    if context_summary:
-        prompt = f"""Based on the following context from past conversations, please answer the user's question.
+def build_prompt(message: str, context_summary: str) -> str:
+    """Wraps the user's message with retrieved context, if there is any."""
+    if not context_summary:
+        return message
+    return f"""Based on the following context from past conversations, please answer the user's question.
 
         Context:
         ---
         {context_summary}
         ---
 
-        User's question: {request.message}"""
-
-    # 4. Get response from LLM
-    llm_response_text = await llm_adapter.send_message(prompt)
+        User's question: {message}"""
 
-    # 5. Save the new exchange to the database
-    async with db_pool.acquire() as connection:
-        async with connection.transaction():
-            conv_id = request.conversation_id
-            if not conv_id:
-                new_conv = await connection.fetchrow('INSERT INTO conversations DEFAULT VALUES RETURNING id')
-                conv_id = new_conv['id']
 
-            user_embedding = await generate_embedding(request.message)
-            await connection.execute(
-                'INSERT INTO messages (conversation_id, role, content, embedding) VALUES ($1, $2, $3, $4)',
-                conv_id, 'user', request.message, user_embedding
+async def persist_exchange(
+    conversation_id: int,
+    user_message: str,
+    user_embedding: asyncio.Task,
+    reply: str,
+    cache_entry: int | None = None,
+):
+    """
+    Background write stage for /chat: embeds the reply, stores both messages in
+    one short transaction and hands them to the search backend. Runs after the
+    HTTP response has been sent. `cache_entry` is the response cache entry the
+    reply came from or went into; later lookups ignore the stored exchange.
+    """
+    timer = StageTimer("persist")
+    try:
+        with timer.stage("embed"):
+            # The user message reuses the embedding computed for retrieval
+            user_vector, reply_vector, user_chunks, reply_chunks = await asyncio.gather(
+                user_embedding, generate_embedding(reply), embed_chunks(user_message), embed_chunks(reply)
             )
+        with timer.stage("insert"):
+            saved = await save_messages(conversation_id, [
+                Message(role='user', content=user_message, embedding=user_vector, chunks=user_chunks),
+                Message(role='assistant', content=reply, embedding=reply_vector, chunks=reply_chunks),
+            ])
+        if cache_entry is not None:
+            response_cache.exclude_messages(cache_entry, [msg.id for msg in saved])
+        with timer.stage("index"):
+            # Let in-process search backends index the new rows without waiting for a sync
+            await get_search_backend().add(saved)
+        if settings.context_strategy == "rolling":
+            conversation_summarizer.notify(conversation_id)
+    except Exception as e:
+        print(f"Failed to persist chat exchange for conversation {conversation_id}: {e}")
+        return
+    print(f"Persisted chat exchange for conversation {conversation_id}: {timer.finish()}")
+
+
+async def prepare_chat(request: ChatRequest, timer: StageTimer):
+    """
+    Shared front half of /chat and /chat/stream: starts embedding the message,
+    retrieves with that embedding, then builds context from the hits. Returns
+    (user_embedding task, context summary, response cache key for the
+    retrieved context).
+    """
+    # 1. Start embedding the message; retrieval and persistence share the task
+    user_embedding = asyncio.create_task(generate_embedding(request.message))
+    try:
+        context_summary, cache_key = await _build_context(request, timer, user_embedding)
+    except BaseException:
+        # Neither leave the embedding running nor its failure unretrieved
+        user_embedding.cancel()
+        if user_embedding.done() and not user_embedding.cancelled():
+            user_embedding.exception()
+        raise
+    return user_embedding, context_summary, cache_key
+
+
+async def _build_context(request: ChatRequest, timer: StageTimer, user_embedding: asyncio.Task):
+    # 2. Find relevant past messages, reusing the in-flight embedding
+    with timer.stage("retrieval"):
+        relevant_messages = await find_relevant_messages(
+            request.message, mode=request.search_mode, query_embedding=user_embedding
+        )
+
+    # 3. Turn the hits into context: stored conversation summaries (no LLM call),
+    #    or an on-demand abstractive/extractive summary of the retrieved messages.
+    #    Long messages contribute only their best-matching chunk.
+    relevant_messages = [context_view(msg) for msg in relevant_messages]
+    context_summary = ""
+    if relevant_messages:
+        with timer.stage("context"):
+            if settings.context_strategy == "rolling" and request.summary_mode is None:
+                context_summary = await stored_summary_context(relevant_messages)
+            else:
+                query_embedding = user_embedding.result() if user_embedding.done() and not user_embedding.exception() else None
+                try:
+                    context_summary = await summarize_messages(
+                        relevant_messages, llm_adapter,
+                        mode=request.summary_mode or settings.summary_mode,
+                        query_text=request.message,
+                        query_embedding=query_embedding,
+                    )
+                except LLMError as e:
+                    # Degrade to a local summary rather than failing the chat
+                    print(f"Abstractive summary failed, using extractive context: {e}")
+                    context_summary = await asyncio.to_thread(
+                        extractive_summary, relevant_messages, query_text=request.message, query_embedding=query_embedding,
+                        max_chars=settings.extractive_max_chars,
+                    )
+    return context_summary, context_key(relevant_messages)
 
-            assistant_embedding = await generate_embedding(llm_response_text)
-            await connection.execute(
-                'INSERT INTO messages (conversation_id, role, content, embedding) VALUES ($1, $2, $3, $4)',
-                conv_id, 'assistant', llm_response_text, assistant_embedding
-            )
 
-            return {"conversation_id": conv_id, "response": llm_response_text, "context_used": bool(context_summary)}
+async def cached_query_embedding(request: ChatRequest, user_embedding: asyncio.Task):
+    """The query embedding when the response cache applies to this request, else None."""
+    if not (settings.response_cache_enabled and request.use_cache):
+        return None
+    try:
+        return await user_embedding
+    except Exception:
+        return None
+
+
+@app.post("/chat")
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks, response: Response):
+    """Handles a chat message, saves it, and returns a response from the LLM with context injection."""
+    timer = StageTimer("chat")
+    user_embedding, context_summary, cache_key = await prepare_chat(request, timer)
+
+    # 4. Get response from LLM, unless a near-identical question was just answered
+    query_embedding = await cached_query_embedding(request, user_embedding)
+    cached = response_cache.lookup(query_embedding, cache_key) if query_embedding is not None else None
+    cache_hit = cached is not None
+    if cache_hit:
+        cache_entry, llm_response_text = cached
+    else:
+        with timer.stage("llm"):
+            llm_response_text = await llm_adapter.send_message(build_prompt(request.message, context_summary))
+        cache_entry = response_cache.put(query_embedding, cache_key, llm_response_text) if query_embedding is not None else None
+
+    # Only once there is a reply, so a failed request leaves no empty conversation behind
+    with timer.stage("conversation"):
+        conv_id = await ensure_conversation(request.conversation_id)
+
+    # 5. Embed the reply and save the exchange after the response is sent
+    background_tasks.add_task(persist_exchange, conv_id, request.message, user_embedding, llm_response_text, cache_entry)
+
+    if settings.server_timing_header:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return {
+        "conversation_id": conv_id,
+        "response": llm_response_text,
+        "context_used": bool(context_summary),
+        "cache_hit": cache_hit,
+        "timings_ms": timer.finish(),
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event; data is JSON so newlines in tokens are safe."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Like /chat, but streams the reply as Server-Sent Events: a `context` event
+    (context_used, conversation_id) first, then `token` events as the LLM
+    generates text, then a `done` event with timings. If the LLM fails mid-way an
+    `error` event is sent instead of `done`. A cached answer is sent as a single
+    `token` event. The full reply is embedded and stored once the stream has
+    finished.
+    """
+    timer = StageTimer("chat_stream")
+    user_embedding, context_summary, cache_key = await prepare_chat(request, timer)
+    # The context event announces the conversation, so it is created before the stream starts
+    conv_id = await ensure_conversation(request.conversation_id)
+    query_embedding = await cached_query_embedding(request, user_embedding)
+    cached = response_cache.lookup(query_embedding, cache_key) if query_embedding is not None else None
+    cache_entry = cached[0] if cached is not None else None
+    reply_parts: list[str] = []
+    finished = False
+
+    async def events():
+        nonlocal finished, cache_entry
+        yield _sse("context", {"context_used": bool(context_summary), "conversation_id": conv_id, "cache_hit": cached is not None})
+        if cached is not None:
+            reply_parts.append(cached[1])
+            yield _sse("token", {"text": cached[1]})
+            finished = True
+            yield _sse("done", {"conversation_id": conv_id, "timings_ms": timer.finish()})
+            return
+        try:
+            with timer.stage("llm"):
+                async for chunk in llm_adapter.stream_message(build_prompt(request.message, context_summary)):
+                    if not reply_parts:
+                        timer.mark("time_to_first_token")
+                    reply_parts.append(chunk)
+                    yield _sse("token", {"text": chunk})
+        except LLMError as e:
+            yield _sse("error", {"detail": str(e), "retryable": e.retryable})
+            return
+        finished = True
+        if query_embedding is not None:
+            cache_entry = response_cache.put(query_embedding, cache_key, "".join(reply_parts))
+        yield _sse("done", {"conversation_id": conv_id, "timings_ms": timer.finish()})
+
+    async def persist_when_finished():
+        # Skip persistence if the client disconnected before the reply completed
+        if finished:
+            await persist_exchange(conv_id, request.message, user_embedding, "".join(reply_parts), cache_entry)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Headers go out before the reply is generated, so Server-Timing only covers retrieval and context
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **({"Server-Timing": timer.server_timing()} if settings.server_timing_header else {}),
+        },
+        background=BackgroundTask(persist_when_finished),
+    )
+
+def search_result(message: Message) -> dict:
+    """A /search hit: the parent message, plus its best-matching chunk for long messages."""
+    chunk = message.matched_chunk
+    return {
+        "role": message.role,
+        "content": message.content,
+        "conversation_id": message.conversation_id,
+        "chunk": {
+            "index": chunk.chunk_index,
+            "start": chunk.start_offset,
+            "end": chunk.end_offset,
+            "content": chunk.content,
+        } if chunk is not None else None,
+    }
 
 @app.post("/search")
 async def search(request: SearchRequest):
     """Performs semantic search over past conversations."""
-    relevant_messages = await find_relevant_messages(request.query)
-    return {"results": [{"role": msg.role, "content": msg.content, "conversation_id": msg.conversation_id} for msg in relevant_messages]}
+    relevant_messages = await find_relevant_messages(
+        request.query,
+        limit=request.limit,
+        metric=request.metric,
+        ef_search=request.ef_search,
+        probes=request.probes,
+        mode=request.mode,
+    )
+    return {"results": [search_result(msg) for msg in relevant_messages]}
 
 from fastapi.responses import FileResponse
 
@@ -100,4 +367,32 @@ async def ingest_page():
 @app.get("/")
 def read_root():
     """Root endpoint for the MCP Server."""
-    return {"message": "MCP Server is running. Go to /docs for API documentation."}
\ No newline at end of file
+    return {"message": "MCP Server is running. Go to /docs for API documentation."}
+
+metrics.register_stats("db_pool", pool_stats)
+metrics.register_stats("embedding_cache", lambda: embedding_cache.stats())
+metrics.register_stats("embedding_batcher", lambda: embedding_batcher.stats())
+metrics.register_stats("summary_cache", summary_cache_stats)
+metrics.register_stats("response_cache", lambda: response_cache.stats())
+metrics.register_stats("conversation_summarizer", lambda: conversation_summarizer.stats())
+metrics.register_stats("coalescing", lambda: {"embeddings": embedding_flights.stats(), "searches": search_flights.stats()})
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Stage latencies, LLM/embedding call counts and volumes, cache and pool usage in Prometheus format."""
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/stats")
+def stats():
+    """Reports runtime statistics such as database pool usage."""
+    return {
+        "db_pool": pool_stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "summary_cache": summary_cache_stats(),
+        "response_cache": response_cache.stats(),
+        "coalescing": {"embeddings": embedding_flights.stats(), "searches": search_flights.stats()},
+        "conversation_summarizer": conversation_summarizer.stats(),
+    }
\ No newline at end of file
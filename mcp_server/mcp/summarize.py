@@ -1,22 +1,102 @@
+import asyncio
+import hashlib
 from .adapters.base import BaseAdapter
 from .adapters.gemini import GeminiAdapter
+from . import metrics
+from .cache import LRUCache
 from .database.schema import Message
-from typing import List
+from .extractive import extractive_summary
+from typing import List, Sequence
+from config import settings
 
-async def summarize_messages(messages: List[Message], llm_adapter: BaseAdapter = None) -> str:
+SUMMARY_MODES = ("abstractive", "extractive", "auto")
+
+# Bump whenever the summarization prompt below changes so cached summaries
+# produced by the old prompt are no longer served.
+SUMMARY_PROMPT_VERSION = 1
+
+# Maps (prompt version, ordered message ids) -> (content fingerprint, summary)
+summary_cache = LRUCache(settings.summary_cache_size, settings.summary_cache_ttl)
+summary_cache_invalidations = 0
+
+
+def _fingerprint(messages: List[Message]) -> str:
+    """Hashes roles and contents so an edited message invalidates cached summaries."""
+    digest = hashlib.sha256()
+    for msg in messages:
+        digest.update(f"{msg.role}\0{msg.content}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def summary_cache_stats() -> dict:
+    return {**summary_cache.stats(), "invalidations": summary_cache_invalidations}
+
+
+def resolve_summary_mode(messages: List[Message], mode: str | None) -> str:
+    """Maps 'auto' to a concrete mode based on how much text was retrieved."""
+    mode = mode or "abstractive"
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode {mode!r}; expected one of {SUMMARY_MODES}")
+    if mode == "auto":
+        total = sum(len(msg.content or "") for msg in messages)
+        return "extractive" if total <= settings.extractive_auto_max_chars else "abstractive"
+    return mode
+
+
+async def summarize_messages(
+    messages: List[Message],
+    llm_adapter: BaseAdapter = None,
+    use_cache: bool = True,
+    mode: str | None = None,
+    query_text: str | None = None,
+    query_embedding: Sequence[float] | None = None,
+) -> str:
     """
     Summarizes a list of conversation messages into concise cliff notes.
 
     Args:
         messages: A list of Message objects to be summarized.
         llm_adapter: An optional LLM adapter. If not provided, a new GeminiAdapter is created.
+        use_cache: Reuse a previous summary of exactly the same messages (same ids
+            in the same order, unchanged content) instead of calling the LLM.
+        mode: 'abstractive' (default; LLM summary), 'extractive' (selects the
+            most central and query-relevant sentences locally, no LLM call) or
+            'auto' (extractive when the retrieved text is small).
+        query_text: The user's query, used to rank sentences in extractive mode.
+        query_embedding: The query's embedding, compared with the messages'
+            stored embeddings in extractive mode.
 
     Returns:
         A string containing the summarized cliff notes.
+
+    Raises:
+        LLMError: If the abstractive summary could not be generated.
     """
+    global summary_cache_invalidations
     if not messages:
         return "No messages to summarize."
 
+    if resolve_summary_mode(messages, mode) == "extractive":
+        metrics.summaries.labels("extractive", "generated").inc()
+        # NumPy scoring of every sentence; keep it off the event loop
+        return await asyncio.to_thread(
+            extractive_summary, messages, query_text=query_text, query_embedding=query_embedding,
+            max_chars=settings.extractive_max_chars,
+        )
+
+    key = None
+    if use_cache and all(msg.id is not None for msg in messages):
+        # Keyed by chunk too: a hit contributes only its matched chunk (see search.context_view)
+        key = (SUMMARY_PROMPT_VERSION, tuple((msg.id, getattr(msg.matched_chunk, "id", None)) for msg in messages))
+        fingerprint = _fingerprint(messages)
+        cached = summary_cache.get(key)
+        if cached is not None:
+            if cached[0] == fingerprint:
+                metrics.summaries.labels("abstractive", "cache").inc()
+                return cached[1]
+            summary_cache.discard(key)
+            summary_cache_invalidations += 1
+
     # For simplicity, create a new adapter if one isn't provided.
     # In a larger app, you might want to manage this via dependency injection.
     if llm_adapter is None:
@@ -36,6 +116,10 @@ async def summarize_messages(messages: List[Message], llm_adapter: BaseAdapter =
 
     Summary:"""
 
-    # Use the LLM to generate the summary.
+    # Use the LLM to generate the summary. Failures raise LLMError, so only
+    # real summaries reach the cache.
     summary = await llm_adapter.send_message(prompt)
+    metrics.summaries.labels("abstractive", "generated").inc()
+    if key is not None:
+        summary_cache.put(key, (fingerprint, summary))
     return summary
@@ -0,0 +1,49 @@
+import time
+from contextlib import contextmanager
+from .metrics import observe_stage
+
+
+class StageTimer:
+    """
+    Accumulates wall-clock time per named pipeline stage, in milliseconds. With a
+    `component` name, each stage is also recorded in the stage latency histogram.
+    """
+
+    def __init__(self, component: str | None = None):
+        self.component = component
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed * 1000
+            if self.component:
+                observe_stage(self.component, name, elapsed)
+
+    def mark(self, name: str):
+        """Records the time elapsed since the timer started, e.g. time to first token."""
+        elapsed = time.perf_counter() - self.started
+        self.stages[name] = elapsed * 1000
+        if self.component:
+            observe_stage(self.component, name, elapsed)
+
+    def finish(self) -> dict[str, float]:
+        """Records the total time in the histogram and returns `as_dict()`."""
+        timings = self.as_dict()
+        if self.component:
+            observe_stage(self.component, "total", timings["total"] / 1000)
+        return timings
+
+    def as_dict(self) -> dict[str, float]:
+        timings = {name: round(ms, 2) for name, ms in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 2)
+        return timings
+
+    def server_timing(self) -> str:
+        """The stages formatted for a `Server-Timing` response header."""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.as_dict().items())
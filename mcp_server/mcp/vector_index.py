@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import numpy as np
+
+METRICS = ("l2", "cosine", "ip")
+
+
+class MmapVectorIndex:
+    """
+    An exact nearest-neighbour index over a memory-mapped embedding matrix.
+
+    The index lives in a directory holding three files:
+
+        vectors.bin  -- a row-major (capacity, dim) matrix of float32 or float16
+        ids.bin      -- an int64 array with the message id of each row
+        meta.json    -- dim, dtype and the number of committed rows
+
+    Rows are appended in place and the file is grown by doubling, so adding a
+    message never rewrites the existing matrix. Removing a message marks its
+    row with id -1; searches skip such rows and later adds reuse them.
+    `meta.json` is written last and acts as the commit point: rows beyond its
+    `count` are ignored on reopen.
+    Searches are vectorised dot products over fixed-size chunks followed by
+    `argpartition`, so memory use is bounded regardless of index size.
+    """
+
+    def __init__(self, path: str, dim: int = 768, dtype: str = "float32", chunk_rows: int = 65536):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"dtype must be 'float32' or 'float16', got {dtype!r}")
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        meta = self._read_meta()
+        if meta:
+            if meta["dim"] != dim or meta["dtype"] != dtype:
+                raise ValueError(
+                    f"Index at {path} was built with dim={meta['dim']} dtype={meta['dtype']}, "
+                    f"not dim={dim} dtype={dtype}; delete it to rebuild."
+                )
+            self.count = meta["count"]
+        else:
+            self.count = 0
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._open(max(self.count, 1024))
+        # Norms and the id -> row map are derived data, kept in RAM and rebuilt on open
+        self._sq_norms = self._compute_sq_norms(0, self.count)
+        self._rows = {int(msg_id): row for row, msg_id in enumerate(self._ids[:self.count]) if msg_id >= 0}
+        # Rows of removed ids: masked out of searches and refilled by add()
+        self._free = np.flatnonzero(np.asarray(self._ids[:self.count]) < 0)
+
+    # --- Storage ---
+    @property
+    def _vectors_file(self):
+        return os.path.join(self.path, "vectors.bin")
+
+    @property
+    def _ids_file(self):
+        return os.path.join(self.path, "ids.bin")
+
+    @property
+    def _meta_file(self):
+        return os.path.join(self.path, "meta.json")
+
+    def _read_meta(self) -> dict | None:
+        try:
+            with open(self._meta_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self):
+        tmp = self._meta_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "count": self.count}, f)
+        os.replace(tmp, self._meta_file)
+
+    def _open(self, capacity: int):
+        """(Re)maps the backing files with room for at least `capacity` rows."""
+        for name, row_bytes in ((self._vectors_file, self.dim * self.dtype.itemsize), (self._ids_file, 8)):
+            needed = capacity * row_bytes
+            with open(name, "ab") as f:
+                if f.tell() < needed:
+                    f.truncate(needed)
+        self.capacity = capacity
+        self._vectors = np.memmap(self._vectors_file, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        self._ids = np.memmap(self._ids_file, dtype=np.int64, mode="r+", shape=(capacity,))
+
+    def _compute_sq_norms(self, start: int, stop: int) -> np.ndarray:
+        norms = np.empty(stop - start, dtype=np.float32)
+        for offset in range(start, stop, self.chunk_rows):
+            end = min(offset + self.chunk_rows, stop)
+            block = np.asarray(self._vectors[offset:end], dtype=np.float32)
+            norms[offset - start:end - start] = np.einsum("ij,ij->i", block, block)
+        return norms
+
+    def flush(self):
+        self._vectors.flush()
+        self._ids.flush()
+        self._write_meta()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def ids(self) -> np.ndarray:
+        ids = np.asarray(self._ids[:self.count])
+        return ids[ids >= 0]
+
+    # --- Mutation ---
+    def add(self, ids, vectors):
+        """Inserts or overwrites the rows for `ids`. `vectors` is (n, dim) array-like."""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        if not len(ids):
+            return
+        with self._lock:
+            # Overwrite rows whose id is already indexed (e.g. a re-embed); a
+            # duplicate id within one call keeps its last vector
+            new_rows = {}
+            for position, msg_id in enumerate(ids.tolist()):
+                row = self._rows.get(msg_id)
+                if row is None:
+                    new_rows[msg_id] = position
+                else:
+                    self._vectors[row] = vectors[position]
+                    self._sq_norms[row] = float(np.dot(vectors[position], vectors[position]))
+            if len(new_rows) < len(ids):
+                positions = list(new_rows.values())
+                ids, vectors = ids[positions], vectors[positions]
+
+            reused = min(len(self._free), len(ids))
+            if reused:
+                rows = self._free[:reused]
+                self._vectors[rows] = vectors[:reused]
+                self._sq_norms[rows] = np.einsum("ij,ij->i", vectors[:reused], vectors[:reused])
+                self._ids[rows] = ids[:reused]
+                self._rows.update(zip(ids[:reused].tolist(), rows.tolist()))
+                # Unmask the rows only once they hold their new vectors
+                self._free = self._free[reused:]
+                ids, vectors = ids[reused:], vectors[reused:]
+
+            start, stop = self.count, self.count + len(ids)
+            if stop > self.capacity:
+                capacity = self.capacity
+                while capacity < stop:
+                    capacity *= 2
+                self._vectors.flush()
+                self._ids.flush()
+                self._open(capacity)
+            self._vectors[start:stop] = vectors
+            self._ids[start:stop] = ids
+            # Publish the norms before the count: lock-free searches read `count`
+            # first and must never see more rows than norms
+            self._sq_norms = np.concatenate([self._sq_norms, self._compute_sq_norms(start, stop)])
+            self.count = stop
+            self._rows.update(zip(ids.tolist(), range(start, stop)))
+            self.flush()
+
+    def remove(self, ids) -> int:
+        """Removes the rows for `ids`, ignoring ids that are not indexed; returns how many were removed."""
+        with self._lock:
+            rows = [self._rows.pop(msg_id) for msg_id in {int(i) for i in ids} if msg_id in self._rows]
+            if not rows:
+                return 0
+            # Mask the rows before clearing their ids, so searches never see them half-removed
+            self._free = np.concatenate([self._free, np.asarray(rows, dtype=np.int64)])
+            self._ids[rows] = -1
+            self.flush()
+            return len(rows)
+
+    # --- Query ---
+    def search(self, query, k: int, metric: str = "l2") -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns `(ids, distances)` of the `k` nearest rows, closest first.
+
+        Distances follow pgvector's conventions so results are comparable across
+        backends: Euclidean distance for 'l2', 1 - cosine similarity for 'cosine'
+        and the negated inner product for 'ip'.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown distance metric {metric!r}; expected one of {METRICS}")
+        # Snapshot the committed rows; concurrent appends only touch rows beyond `count`
+        count, vectors, ids, sq_norms, free = self.count, self._vectors, self._ids, self._sq_norms, self._free
+        k = min(k, count - len(free))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        dots = np.empty(count, dtype=np.float32)
+        for offset in range(0, count, self.chunk_rows):
+            end = min(offset + self.chunk_rows, count)
+            dots[offset:end] = np.asarray(vectors[offset:end], dtype=np.float32) @ query
+
+        if metric == "ip":
+            distances = -dots
+        elif metric == "cosine":
+            denom = np.sqrt(sq_norms[:count]) * np.linalg.norm(query)
+            distances = 1.0 - dots / np.where(denom == 0, 1.0, denom)
+        else:
+            distances = np.sqrt(np.maximum(sq_norms[:count] - 2.0 * dots + float(query @ query), 0.0))
+        distances[free] = np.inf
+
+        top = np.argpartition(distances, k - 1)[:k] if k < count else np.arange(count)
+        top = top[np.argsort(distances[top], kind="stable")]
+        # A row removed while this search ran is dropped rather than returned as id -1
+        top_ids = np.asarray(ids[top])
+        return top_ids[top_ids >= 0], distances[top][top_ids >= 0]
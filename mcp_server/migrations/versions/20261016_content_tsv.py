@@ -0,0 +1,38 @@
+"""Add full-text search column and GIN index on messages.content
+
+Revision ID: 20261016_content_tsv
+Revises: 20261016_vector_index
+Create Date: 2026-10-16 10:00:00.000000
+
+`content_tsv` is a stored generated column, so Postgres keeps it in sync with
+`content` on every INSERT/UPDATE without a trigger or application code.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_content_tsv'
+down_revision = '20261016_vector_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('messages', sa.Column(
+        'content_tsv', TSVECTOR(),
+        sa.Computed("to_tsvector('english', coalesce(content, ''))", persisted=True),
+        nullable=True,
+    ))
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_content_tsv "
+            "ON messages USING gin (content_tsv)"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_messages_content_tsv")
+    op.drop_column('messages', 'content_tsv')
@@ -0,0 +1,32 @@
+"""Add rolling per-conversation summaries
+
+Revision ID: 20261016_conversation_summaries
+Revises: 20261016_embedding_cache
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_conversation_summaries'
+down_revision = '20261016_embedding_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('conversation_summaries',
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('summary', sa.Text(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('conversation_id')
+    )
+
+
+def downgrade():
+    op.drop_table('conversation_summaries')
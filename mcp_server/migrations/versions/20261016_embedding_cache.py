@@ -0,0 +1,31 @@
+"""Add persistent embedding cache table
+
+Revision ID: 20261016_embedding_cache
+Revises: 20261016_content_tsv
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_embedding_cache'
+down_revision = '20261016_content_tsv'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('embedding_cache',
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('embedding', Vector(768), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('model', 'content_hash')
+    )
+
+
+def downgrade():
+    op.drop_table('embedding_cache')
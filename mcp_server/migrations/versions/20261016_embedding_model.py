@@ -0,0 +1,47 @@
+"""Track the embedding model per message and checkpoint re-embedding backfills
+
+Revision ID: 20261016_embedding_model
+Revises: 20261016_message_dedup
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_embedding_model'
+down_revision = '20261016_message_dedup'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('messages', sa.Column('embedding_model', sa.String(length=100), nullable=True))
+    # Staging columns for re-embedding into a new model; swapped in by mcp/backfill.py
+    op.add_column('messages', sa.Column('embedding_next', Vector(768), nullable=True))
+    op.add_column('messages', sa.Column('embedding_next_model', sa.String(length=100), nullable=True))
+    # Every stored vector so far came from the original default model
+    op.execute("UPDATE messages SET embedding_model = 'models/embedding-001' WHERE embedding IS NOT NULL")
+    op.create_index('ix_messages_embedding_next_model', 'messages', ['embedding_next_model'],
+                    postgresql_where=sa.text('embedding_next_model IS NOT NULL'))
+    op.create_table('embedding_backfills',
+    sa.Column('target_model', sa.String(length=100), nullable=False),
+    sa.Column('staged', sa.Boolean(), nullable=False),
+    sa.Column('last_id', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('processed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('failed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('started_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('swapped_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('target_model')
+    )
+
+
+def downgrade():
+    op.drop_table('embedding_backfills')
+    op.drop_index('ix_messages_embedding_next_model', table_name='messages')
+    op.drop_column('messages', 'embedding_next_model')
+    op.drop_column('messages', 'embedding_next')
+    op.drop_column('messages', 'embedding_model')
@@ -0,0 +1,48 @@
+"""Track when each message's embedding was last written
+
+Revision ID: 20261016_embedding_updated_at
+Revises: 20261016_message_chunks
+Create Date: 2026-10-16 16:00:00.000000
+
+The mmap search backend syncs from Postgres by `embedding_updated_at` rather
+than by id, so it also picks up vectors that are backfilled or swapped to a new
+model after the row was inserted. A trigger keeps the column current for every
+writer (the feeder's COPY, /chat persistence, mcp/backfill.py) without
+application code.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_embedding_updated_at'
+down_revision = '20261016_message_chunks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('messages', sa.Column('embedding_updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE messages SET embedding_updated_at = coalesce(created_at, now()) WHERE embedding IS NOT NULL")
+    op.create_index('ix_messages_embedding_updated_at', 'messages', ['embedding_updated_at', 'id'])
+    # clock_timestamp() rather than now(): the time of the write, not of the
+    # start of a possibly long ingest transaction
+    op.execute("""
+        CREATE FUNCTION messages_touch_embedding() RETURNS trigger AS $$
+        BEGIN
+            NEW.embedding_updated_at := clock_timestamp();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(
+        "CREATE TRIGGER messages_touch_embedding BEFORE INSERT OR UPDATE OF embedding ON messages "
+        "FOR EACH ROW EXECUTE FUNCTION messages_touch_embedding()"
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER messages_touch_embedding ON messages")
+    op.execute("DROP FUNCTION messages_touch_embedding()")
+    op.drop_index('ix_messages_embedding_updated_at', table_name='messages')
+    op.drop_column('messages', 'embedding_updated_at')
@@ -0,0 +1,26 @@
+"""Delay retries of failed ingest jobs
+
+Revision ID: 20261016_ingest_job_backoff
+Revises: 20261016_embedding_updated_at
+Create Date: 2026-10-16 17:00:00.000000
+
+A failed job is queued again with `available_at` in the future, and workers
+only claim queued jobs whose time has come (see conversation_feeder/ingest_jobs.py).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_ingest_job_backoff'
+down_revision = '20261016_embedding_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('ingest_jobs', sa.Column('available_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade():
+    op.drop_column('ingest_jobs', 'available_at')
@@ -0,0 +1,44 @@
+"""Add the ingest_jobs queue used by conversation_feeder
+
+Revision ID: 20261016_ingest_jobs
+Revises: 20261016_conversation_summaries
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_ingest_jobs'
+down_revision = '20261016_conversation_summaries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ingest_jobs',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='queued', nullable=False),
+    sa.Column('payload', postgresql.JSONB(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('processed_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('conversation_id', sa.Integer(), nullable=True),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Workers claim the oldest runnable job; keep that lookup off the finished rows
+    op.create_index('ix_ingest_jobs_runnable', 'ingest_jobs', ['id'],
+                    postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade():
+    op.drop_index('ix_ingest_jobs_runnable', table_name='ingest_jobs')
+    op.drop_table('ingest_jobs')
@@ -0,0 +1,52 @@
+"""Add message_chunks: overlapping chunks of long messages with their own embeddings
+
+Revision ID: 20261016_message_chunks
+Revises: 20261016_embedding_model
+Create Date: 2026-10-16 15:00:00.000000
+
+Chunks are written by both services for new messages longer than
+CHUNK_MAX_CHARS; `python -m mcp.backfill --chunks` chunks existing ones. Like
+20261016_vector_index, one HNSW index is built per supported metric.
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_message_chunks'
+down_revision = '20261016_embedding_model'
+branch_labels = None
+depends_on = None
+
+OPERATOR_CLASSES = {
+    'l2': 'vector_l2_ops',
+    'cosine': 'vector_cosine_ops',
+    'ip': 'vector_ip_ops',
+}
+
+
+def upgrade():
+    op.create_table('message_chunks',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('start_offset', sa.Integer(), nullable=False),
+    sa.Column('end_offset', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('embedding', Vector(768), nullable=False),
+    sa.Column('embedding_model', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_message_chunks_message_id_chunk_index', 'message_chunks', ['message_id', 'chunk_index'], unique=True)
+    for metric, opclass in OPERATOR_CLASSES.items():
+        op.execute(
+            f"CREATE INDEX ix_message_chunks_embedding_{metric} ON message_chunks "
+            f"USING hnsw (embedding {opclass}) WITH (m = 16, ef_construction = 64)"
+        )
+
+
+def downgrade():
+    op.drop_table('message_chunks')
@@ -0,0 +1,60 @@
+"""Add message content hashes, positions and conversation idempotency keys
+
+Revision ID: 20261016_message_dedup
+Revises: 20261016_ingest_jobs
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_message_dedup'
+down_revision = '20261016_ingest_jobs'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def content_hash(text):
+    # Same as content_hash() in mcp/embedding.py and the feeder. Computed here
+    # rather than in SQL: str.split() also splits on whitespace (vertical tab,
+    # \x1c-\x1f, Unicode spaces) that Postgres' btrim and \s handle differently
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def backfill_content_hashes():
+    bind = op.get_bind()
+    select = sa.text("SELECT id, content FROM messages WHERE id > :last_id ORDER BY id LIMIT :limit")
+    update = sa.text("UPDATE messages SET content_hash = :content_hash WHERE id = :id")
+    last_id = 0
+    while True:
+        rows = bind.execute(select, {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        bind.execute(update, [{"id": row.id, "content_hash": content_hash(row.content or "")} for row in rows])
+        last_id = rows[-1].id
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('idempotency_key', sa.String(length=255), nullable=True))
+    op.create_unique_constraint('uq_conversations_idempotency_key', 'conversations', ['idempotency_key'])
+    op.add_column('messages', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('messages', sa.Column('position', sa.Integer(), nullable=True))
+    backfill_content_hashes()
+    op.create_index('ix_messages_content_hash', 'messages', ['content_hash'])
+    op.create_index('ix_messages_conversation_position', 'messages', ['conversation_id', 'position'],
+                    unique=True, postgresql_where=sa.text('position IS NOT NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_messages_conversation_position', table_name='messages')
+    op.drop_index('ix_messages_content_hash', table_name='messages')
+    op.drop_column('messages', 'position')
+    op.drop_column('messages', 'content_hash')
+    op.drop_constraint('uq_conversations_idempotency_key', 'conversations', type_='unique')
+    op.drop_column('conversations', 'idempotency_key')
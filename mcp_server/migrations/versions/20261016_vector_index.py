@@ -0,0 +1,62 @@
+"""Add approximate nearest-neighbour indexes on messages.embedding
+
+Revision ID: 20261016_vector_index
+Revises: 20250926_pgvector
+Create Date: 2026-10-16 09:00:00.000000
+
+The index type and the metrics to index can be chosen at upgrade time, e.g.
+
+    alembic upgrade head -x index_type=ivfflat -x metrics=cosine -x lists=200
+
+Defaults build an HNSW index for each supported metric (l2, cosine, ip) so
+that every metric accepted by /search is served by an index. Indexes are built
+CONCURRENTLY so the messages table stays writable during the build.
+"""
+from alembic import context, op
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_vector_index'
+down_revision = '20250926_pgvector'
+branch_labels = None
+depends_on = None
+
+OPERATOR_CLASSES = {
+    'l2': 'vector_l2_ops',
+    'cosine': 'vector_cosine_ops',
+    'ip': 'vector_ip_ops',
+}
+INDEX_TYPES = ('hnsw', 'ivfflat')
+
+
+def _options():
+    args = context.get_x_argument(as_dictionary=True)
+    index_type = args.get('index_type', 'hnsw')
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {index_type!r}")
+    metrics = [m.strip() for m in args.get('metrics', 'l2,cosine,ip').split(',') if m.strip()]
+    for metric in metrics:
+        if metric not in OPERATOR_CLASSES:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {sorted(OPERATOR_CLASSES)}")
+    if index_type == 'hnsw':
+        storage = f"m = {int(args.get('m', 16))}, ef_construction = {int(args.get('ef_construction', 64))}"
+    else:
+        storage = f"lists = {int(args.get('lists', 100))}"
+    return index_type, metrics, storage
+
+
+def upgrade():
+    index_type, metrics, storage = _options()
+    with op.get_context().autocommit_block():
+        for metric in metrics:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_embedding_{metric} "
+                f"ON messages USING {index_type} (embedding {OPERATOR_CLASSES[metric]}) "
+                f"WITH ({storage})"
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for metric in OPERATOR_CLASSES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_messages_embedding_{metric}")
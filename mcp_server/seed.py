@@ -1,32 +1,26 @@
 import asyncio
-from mcp.database.db import db_pool, connect_to_db, close_db_connection
-from mcp.database.schema import Conversation, Message
-from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import AsyncSession
-from config import settings
+from mcp.database.db import connect_to_db, close_db_connection, get_pool
 
 async def seed_data():
     await connect_to_db()
-    engine = create_async_engine(settings.database_url)
-    async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    try:
+        async with get_pool().acquire() as connection:
+            async with connection.transaction():
+                # Create a new conversation
+                conv_id = await connection.fetchval('INSERT INTO conversations DEFAULT VALUES RETURNING id')
 
-    async with async_session() as session:
-        async with session.begin():
-            # Create a new conversation
-            conversation = Conversation()
-            session.add(conversation)
-            await session.flush()
-
-            # Add messages to the conversation
-            messages = [
-                Message(conversation_id=conversation.id, role="user", content="Hello, world!"),
-                Message(conversation_id=conversation.id, role="assistant", content="Hello! How can I help you today?")
-            ]
-            session.add_all(messages)
-
-    await close_db_connection()
-    print("Database seeded with sample data.")
+                # Add messages to the conversation
+                messages = [
+                    ("user", "Hello, world!"),
+                    ("assistant", "Hello! How can I help you today?")
+                ]
+                await connection.executemany(
+                    'INSERT INTO messages (conversation_id, role, content) VALUES ($1, $2, $3)',
+                    [(conv_id, role, content) for role, content in messages]
+                )
+    finally:
+        await close_db_connection()
+    print("Database seeded with sample data. Run `python -m mcp.backfill` to embed the messages.")
 
 if __name__ == "__main__":
     asyncio.run(seed_data())
@@ -0,0 +1,30 @@
+import pytest
+from mcp_server.tests.feeder_support import FakeFeederDatabase, feeder_modules
+
+
+@pytest.fixture(scope="module")
+def feeder():
+    # Module-scoped: the feeder's modules are only on sys.path inside this block
+    with feeder_modules() as main:
+        yield main
+
+
+@pytest.fixture
+def database(feeder, monkeypatch):
+    database = FakeFeederDatabase()
+    monkeypatch.setattr(feeder, "db_pool", database)
+    return database
+
+
+@pytest.fixture
+def embedded(feeder, monkeypatch):
+    """Texts sent to the embedding provider."""
+    texts = []
+    embed = feeder.embedding_batcher.embed
+
+    async def recording_embed(text):
+        texts.append(text)
+        return await embed(text)
+
+    monkeypatch.setattr(feeder.embedding_batcher, "embed", recording_embed)
+    return texts
@@ -0,0 +1,94 @@
+"""
+An in-memory stand-in for an asyncpg pool, shared by the tests that run code
+against Postgres tables.
+
+A FakePool is its own pool, connection and transaction. Subclasses hold the
+tables a test needs and mark the methods that answer a statement with
+`@handles(<SQL prefix>, ...)`. fetch, fetchrow, fetchval, execute and
+executemany all dispatch the same way, on the statement with its whitespace
+collapsed, and each handler is called as `handler(sql, *args)`. A statement
+that no handler recognises fails the test. Subclasses that implement
+`snapshot` and `restore` get transactions that roll their tables back when
+the block raises.
+"""
+from typing import ClassVar
+
+
+def handles(*prefixes: str):
+    """Marks a FakePool method as the handler of statements starting with any of `prefixes`."""
+    def mark(method):
+        method.sql_prefixes = prefixes
+        return method
+    return mark
+
+
+class FakePool:
+    _handlers: ClassVar[list] = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        handlers = {
+            prefix: name
+            for klass in reversed(cls.__mro__)
+            for name, member in vars(klass).items()
+            for prefix in getattr(member, "sql_prefixes", ())
+        }
+        # The longest matching prefix wins, so specific statements can share a stem
+        cls._handlers = sorted(handlers.items(), key=lambda item: -len(item[0]))
+
+    def _dispatch(self, sql: str, args: tuple):
+        sql = " ".join(sql.split())
+        for prefix, name in self._handlers:
+            if sql.startswith(prefix):
+                return getattr(self, name)(sql, *args)
+        raise AssertionError(f"{type(self).__name__} does not handle: {sql}")
+
+    # --- Pool / connection protocol ---
+    def acquire(self):
+        return self
+
+    def transaction(self):
+        return _Transaction(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def snapshot(self):
+        """The state to restore if a transaction fails; None disables rollback."""
+
+    def restore(self, snapshot):
+        pass
+
+    # --- Queries ---
+    async def fetch(self, sql, *args):
+        return self._dispatch(sql, args)
+
+    async def fetchrow(self, sql, *args):
+        return self._dispatch(sql, args)
+
+    async def fetchval(self, sql, *args):
+        return self._dispatch(sql, args)
+
+    async def execute(self, sql, *args):
+        return self._dispatch(sql, args)
+
+    async def executemany(self, sql, args_list):
+        for args in args_list:
+            self._dispatch(sql, tuple(args))
+
+
+class _Transaction:
+    def __init__(self, pool: FakePool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        self.saved = self.pool.snapshot()
+        return self
+
+    async def __aexit__(self, exc_type, *exc):
+        if exc_type is not None and self.saved is not None:
+            self.pool.restore(self.saved)
+        return False
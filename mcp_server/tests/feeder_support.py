@@ -0,0 +1,189 @@
+"""
+Loads conversation_feeder's modules for testing from mcp_server/tests, and a
+FakePool holding the tables they use.
+
+The feeder is a separate service with its own top-level `config` module, so
+its modules are imported with conversation_feeder/ on sys.path and then
+removed from sys.modules again, leaving mcp_server's `config` untouched.
+"""
+import copy
+import importlib
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import asyncpg
+import numpy as np
+
+from mcp_server.tests.fake_pool import FakePool, handles
+
+FEEDER_DIR = Path(__file__).resolve().parents[2] / "conversation_feeder"
+FEEDER_MODULES = ("config", "chunking", "embedding_batcher", "embedding_providers", "ingest_jobs", "main")
+FEEDER_ENV = {
+    "GEMINI_API_KEY": "test",
+    "DATABASE_URL": "postgresql://localhost/feeder_test",
+    "FEEDER_AUTH_TOKEN": "test_token",
+    "EMBEDDING_PROVIDER": "local",
+    "EMBEDDING_CACHE_PERSISTENT": "false",
+    "EMBEDDING_BATCH_WAIT_MS": "0",
+}
+
+
+@contextmanager
+def feeder_modules():
+    """Imports conversation_feeder/main.py (and what it imports) with offline settings; yields main."""
+    saved_modules = {name: sys.modules.pop(name) for name in FEEDER_MODULES if name in sys.modules}
+    saved_env = {name: os.environ.get(name) for name in FEEDER_ENV}
+    os.environ.update(FEEDER_ENV)
+    sys.path.insert(0, str(FEEDER_DIR))
+    try:
+        yield importlib.import_module("main")
+    finally:
+        sys.path.remove(str(FEEDER_DIR))
+        for name in FEEDER_MODULES:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved_modules)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def messages(feeder, *contents):
+    """Feeder Messages with the given contents, alternating user and assistant."""
+    return [feeder.Message(role="user" if i % 2 == 0 else "assistant", content=c) for i, c in enumerate(contents)]
+
+
+class FakeFeederDatabase(FakePool):
+    """
+    The feeder's tables: conversations, messages, message_chunks and
+    ingest_jobs. Transactions roll back every table when their block raises,
+    and `now` stands in for Postgres' clock.
+    """
+
+    def __init__(self):
+        self.conversations = {}  # id -> idempotency_key
+        self.messages = []
+        self.chunks = []
+        self.jobs = {}
+        self.now = 0.0
+        self._ids = {"conversations": 0, "messages": 0, "ingest_jobs": 0}
+
+    def _next_id(self, table):
+        self._ids[table] += 1
+        return self._ids[table]
+
+    def snapshot(self):
+        return copy.deepcopy((self.conversations, self.messages, self.chunks, self.jobs, self._ids))
+
+    def restore(self, snapshot):
+        self.conversations, self.messages, self.chunks, self.jobs, self._ids = snapshot
+
+    # --- conversations ---
+    @handles("INSERT INTO conversations DEFAULT VALUES")
+    def _new_conversation(self, sql):
+        conv_id = self._next_id("conversations")
+        self.conversations[conv_id] = None
+        return conv_id
+
+    @handles("INSERT INTO conversations (idempotency_key)")
+    def _upsert_conversation(self, sql, key):
+        conv_id = self._find_conversation(sql, key)
+        if conv_id is None:
+            conv_id = self._next_id("conversations")
+            self.conversations[conv_id] = key
+        return conv_id
+
+    @handles("SELECT id FROM conversations WHERE idempotency_key")
+    def _find_conversation(self, sql, key):
+        return next((conv_id for conv_id, stored in self.conversations.items() if stored == key), None)
+
+    # --- messages ---
+    @handles("SELECT DISTINCT ON (content_hash)")
+    def _stored_embeddings(self, sql, digests, model):
+        rows = {}
+        for msg in self.messages:
+            if msg["content_hash"] in digests and msg["embedding_model"] == model and msg["embedding"] is not None:
+                rows.setdefault(msg["content_hash"], np.asarray(msg["embedding"]))
+        return [{"content_hash": digest, "embedding": vector} for digest, vector in rows.items()]
+
+    @handles("SELECT position, content_hash FROM messages")
+    def _stored_positions(self, sql, conv_id):
+        return [msg for msg in self.conversation(conv_id) if msg["position"] is not None]
+
+    @handles("SELECT id, position FROM messages")
+    def _message_ids(self, sql, conv_id, positions):
+        return [msg for msg in self.conversation(conv_id) if msg["position"] in positions]
+
+    async def copy_records_to_table(self, table, records, columns):
+        for record in records:
+            row = dict(zip(columns, record))
+            if table == "messages":
+                if row["position"] is not None and any(
+                    msg["position"] == row["position"] for msg in self.conversation(row["conversation_id"])
+                ):
+                    raise asyncpg.UniqueViolationError("ix_messages_conversation_position")
+                row["id"] = self._next_id("messages")
+                self.messages.append(row)
+            else:
+                self.chunks.append(row)
+
+    # --- ingest_jobs ---
+    @handles("INSERT INTO ingest_jobs")
+    def _enqueue(self, sql, payload, message_count):
+        job_id = self._next_id("ingest_jobs")
+        self.jobs[job_id] = {
+            "id": job_id, "status": "queued", "payload": payload, "message_count": message_count,
+            "processed_count": 0, "conversation_id": None, "attempts": 0, "error": None,
+            "updated_at": self.now, "available_at": self.now,
+        }
+        return job_id
+
+    @handles("UPDATE ingest_jobs SET status = 'running'")
+    def _claim(self, sql, stale_after):
+        for job in sorted(self.jobs.values(), key=lambda job: job["id"]):
+            if (job["status"] == "queued" and job["available_at"] <= self.now) or (
+                job["status"] == "running" and job["updated_at"] < self.now - stale_after
+            ):
+                job.update(status="running", attempts=job["attempts"] + 1, updated_at=self.now, error=None)
+                return {"id": job["id"], "payload": job["payload"], "attempts": job["attempts"]}
+        return None
+
+    @handles("SELECT id, status")
+    def _job(self, sql, job_id):
+        return self.jobs.get(job_id)
+
+    def _update_job(self, job_id, attempt, running=False, **changes):
+        job = self.jobs[job_id]
+        if job["attempts"] != attempt or (running and job["status"] != "running"):
+            return "UPDATE 0"
+        job.update(changes, updated_at=self.now)
+        return "UPDATE 1"
+
+    @handles("UPDATE ingest_jobs SET status = 'succeeded'")
+    def _succeed(self, sql, job_id, conv_id, attempt):
+        job = self.jobs[job_id]
+        return self._update_job(job_id, attempt, running=True, status="succeeded", conversation_id=conv_id,
+                                processed_count=job["message_count"], payload="{}")
+
+    @handles("UPDATE ingest_jobs SET processed_count")
+    def _progress(self, sql, job_id, processed, attempt):
+        return self._update_job(job_id, attempt, processed_count=processed)
+
+    @handles("UPDATE ingest_jobs SET status = $2, error")
+    def _finish(self, sql, job_id, status, error, attempt):
+        return self._update_job(job_id, attempt, status=status, error=error)
+
+    @handles("UPDATE ingest_jobs SET status = 'queued', error")
+    def _retry_later(self, sql, job_id, error, delay, attempt):
+        return self._update_job(job_id, attempt, status="queued", error=error, available_at=self.now + delay)
+
+    @handles("UPDATE ingest_jobs SET status = 'queued', attempts = attempts - 1")
+    def _release(self, sql, job_id, attempt):
+        return self._update_job(job_id, attempt, status="queued", attempts=attempt - 1)
+
+    # --- Helpers for assertions ---
+    def conversation(self, conv_id):
+        return [msg for msg in self.messages if msg["conversation_id"] == conv_id]
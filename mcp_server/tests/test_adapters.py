@@ -0,0 +1,133 @@
+import asyncio
+import json
+import httpx
+import pytest
+from mcp_server.mcp.adapters.base import LLMError, LLMRateLimitError
+from mcp_server.mcp.adapters.gemini_http import GeminiHttpAdapter
+
+
+def reply(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+
+def make_adapter(handler, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://llm.test")
+    return GeminiHttpAdapter("key", client=client, backoff_base=0, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_send_message_posts_prompt_and_extracts_text():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=reply("hello back"))
+
+    adapter = make_adapter(handler, model="gemini-test")
+    assert await adapter.send_message("hello") == "hello back"
+    assert requests[0].url.path == "/models/gemini-test:generateContent"
+    assert json.loads(requests[0].content)["contents"][0]["parts"][0]["text"] == "hello"
+    await adapter.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_are_retried_and_client_errors_are_not():
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return httpx.Response(429, headers={"retry-after": "0"})
+        if b"bad" in request.content:
+            return httpx.Response(400)
+        return httpx.Response(200, json=reply("ok"))
+
+    adapter = make_adapter(handler)
+    assert await adapter.send_message("good") == "ok"
+    assert calls == 2
+
+    with pytest.raises(LLMError) as excinfo:
+        await adapter.send_message("bad")
+    assert excinfo.value.status_code == 400 and not excinfo.value.retryable
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_capped_at_max_backoff(monkeypatch):
+    from mcp_server.mcp.adapters import gemini_http
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(gemini_http.asyncio, "sleep", fake_sleep)
+    responses = iter([httpx.Response(503, headers={"retry-after": "86400"}), httpx.Response(200, json=reply("ok"))])
+    adapter = make_adapter(lambda request: next(responses), max_backoff=5)
+
+    assert await adapter.send_message("hello") == "ok"
+    assert sleeps == [5]
+    await adapter.aclose()
+
+
+@pytest.mark.asyncio
+async def test_retries_are_bounded():
+    adapter = make_adapter(lambda request: httpx.Response(429), max_retries=2)
+    with pytest.raises(LLMRateLimitError):
+        await adapter.send_message("hello")
+
+
+@pytest.mark.asyncio
+async def test_send_batch_keeps_order_and_can_return_errors():
+    def handler(request):
+        text = json.loads(request.content)["contents"][0]["parts"][0]["text"]
+        if text == "fail":
+            return httpx.Response(400)
+        return httpx.Response(200, json=reply(text.upper()))
+
+    adapter = make_adapter(handler)
+    results = await adapter.send_batch(["a", "fail", "b"], return_exceptions=True)
+    assert results[0] == "A" and results[2] == "B"
+    assert isinstance(results[1], LLMError)
+
+
+@pytest.mark.asyncio
+async def test_stream_message_parses_server_sent_events():
+    body = "".join(f"data: {json.dumps(reply(chunk))}\r\n\r\n" for chunk in ["the ", "answer"])
+
+    def handler(request):
+        assert request.url.params["alt"] == "sse"
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    adapter = make_adapter(handler)
+    assert [chunk async for chunk in adapter.stream_message("hello")] == ["the ", "answer"]
+
+
+@pytest.mark.asyncio
+async def test_sdk_stream_closed_early_stops_its_producer_without_waiting():
+    import threading
+    import time
+    from types import SimpleNamespace
+    from mcp_server.mcp.adapters.gemini import GeminiAdapter
+
+    produced, release = [], threading.Event()
+
+    def generate_content(message, stream):
+        for i in range(3):
+            produced.append(i)
+            yield SimpleNamespace(text=f"chunk {i} ")
+            release.wait(5)
+
+    adapter = GeminiAdapter()
+    adapter.model = SimpleNamespace(generate_content=generate_content)
+    stream = adapter.stream_message("hello")
+    assert await stream.__anext__() == "chunk 0 "
+
+    # The client disconnects while the SDK call is still blocked in its thread
+    started = time.monotonic()
+    await stream.aclose()
+    assert time.monotonic() - started < 1
+    release.set()
+    await asyncio.sleep(0.1)
+    assert produced == [0, 1]
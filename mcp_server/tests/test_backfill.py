@@ -0,0 +1,222 @@
+import pytest
+from mcp_server.mcp import backfill
+from mcp_server.mcp.database import db
+from mcp_server.tests.fake_pool import FakePool, handles
+
+
+class FakeProvider:
+    model_name = "model-v2"
+    dimensions = 2
+
+    def __init__(self):
+        self.calls = []
+        self.failing = {"bad"}
+
+    async def embed_batch(self, texts):
+        self.calls.append(list(texts))
+        if self.failing.intersection(texts):
+            raise ValueError("cannot embed")
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeConnection(FakePool):
+    """A messages table, its chunks and the checkpoint row, as Backfill uses them."""
+
+    def __init__(self, messages, chunks=()):
+        self.messages = messages  # id -> {"content", "embedding", "embedding_model", ...}
+        self.chunks = list(chunks)  # {"message_id", "embedding_model"}
+        self.checkpoint = None
+        self.locked = False
+
+    @handles("INSERT INTO embedding_backfills")
+    def _checkpoint(self, sql, model, staged, restart):
+        if self.checkpoint is None or restart:
+            self.checkpoint = {"last_id": 0, "processed": 0, "failed": 0, "swapped": False}
+        return self.checkpoint["last_id"]
+
+    @handles("UPDATE embedding_backfills SET last_id")
+    def _advance(self, sql, model, last_id, processed, failed):
+        self.checkpoint.update(last_id=last_id, processed=self.checkpoint["processed"] + processed,
+                               failed=self.checkpoint["failed"] + failed)
+
+    @handles("UPDATE embedding_backfills SET swapped_at")
+    def _swapped(self, sql, model):
+        self.checkpoint["swapped"] = True
+
+    @handles("SELECT id, content FROM messages WHERE id > $1")
+    def _page(self, sql, after_id, limit, model):
+        column = "embedding_next_model" if "embedding_next_model IS DISTINCT" in sql else "embedding_model"
+        rows = [
+            {"id": id, "content": row["content"]}
+            for id, row in sorted(self.messages.items())
+            if id > after_id and row["content"] and row[column] != model
+        ]
+        return rows[:limit]
+
+    @handles("SELECT id, content FROM messages WHERE coalesce")
+    def _stragglers(self, sql, model, limit):
+        return [
+            {"id": id, "content": row["content"]} for id, row in sorted(self.messages.items())
+            if row["content"] and model not in (row["embedding_model"], row["embedding_next_model"])
+        ][:limit]
+
+    @handles("UPDATE messages SET embedding = $2", "UPDATE messages SET embedding_next = $2")
+    def _write(self, sql, id, vector, model):
+        prefix = "embedding_next" if sql.startswith("UPDATE messages SET embedding_next") else "embedding"
+        self.messages[id].update({prefix: vector, f"{prefix}_model": model})
+
+    @handles("LOCK TABLE messages")
+    def _lock(self, sql):
+        self.locked = True
+
+    @handles("UPDATE messages SET embedding = embedding_next")
+    def _swap(self, sql, model):
+        assert self.locked
+        swapped = [row for row in self.messages.values() if row["embedding_next_model"] == model]
+        for row in swapped:
+            row.update(embedding=row["embedding_next"], embedding_model=row["embedding_next_model"],
+                       embedding_next=None, embedding_next_model=None)
+        return f"UPDATE {len(swapped)}"
+
+    @handles("DELETE FROM message_chunks WHERE embedding_model")
+    def _drop_old_chunks(self, sql, model):
+        self.chunks = [chunk for chunk in self.chunks if chunk["embedding_model"] == model]
+
+
+def message(content, embedding=None, model=None):
+    return {"content": content, "embedding": embedding, "embedding_model": model,
+            "embedding_next": None, "embedding_next_model": None}
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_calls(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(backfill.asyncio, "sleep", fake_sleep)
+    limiter = backfill.RateLimiter(4, clock=lambda: 10.0)
+    for _ in range(3):
+        await limiter.acquire()
+    assert sleeps == [0.25, 0.5]
+
+
+@pytest.mark.asyncio
+async def test_backfill_fills_outdated_vectors_in_place_and_checkpoints(monkeypatch):
+    conn = FakeConnection({
+        1: message("hello"),
+        2: message("current", [1.0, 1.0], "model-v2"),
+        3: message("old", [9.0, 9.0], "model-v1"),
+        4: message("bad"),
+    })
+    monkeypatch.setattr(db, "db_pool", conn)
+    provider = FakeProvider()
+    job = backfill.Backfill(provider, staged=False, batch_size=2, concurrency=1, max_retries=0)
+
+    assert await job.run() == 4
+    assert conn.messages[1]["embedding"] == [5.0, 1.0]
+    assert conn.messages[2]["embedding"] == [1.0, 1.0]  # already current, never re-embedded
+    assert conn.messages[3]["embedding_model"] == "model-v2"
+    assert conn.messages[4]["embedding"] is None
+    # The checkpoint stays before the failed message
+    assert conn.checkpoint == {"last_id": 3, "processed": 2, "failed": 1, "swapped": False}
+    assert "current" not in sum(provider.calls, [])
+
+    # A resumed run retries id 4, and only it
+    provider.calls.clear()
+    provider.failing.clear()
+    assert await job.run() == 4
+    assert provider.calls == [["bad"]]
+    assert conn.messages[4]["embedding"] == [3.0, 1.0]
+    assert conn.checkpoint == {"last_id": 4, "processed": 3, "failed": 1, "swapped": False}
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_stays_at_the_first_failure_while_the_run_continues(monkeypatch):
+    conn = FakeConnection({1: message("one"), 2: message("bad"), 3: message("three"), 4: message("four")})
+    monkeypatch.setattr(db, "db_pool", conn)
+    job = backfill.Backfill(FakeProvider(), staged=False, batch_size=1, concurrency=1, max_retries=0)
+
+    assert await job.run() == 4
+
+    assert [conn.messages[id]["embedding"] is not None for id in range(1, 5)] == [True, False, True, True]
+    assert conn.checkpoint["last_id"] == 1
+
+
+@pytest.mark.asyncio
+async def test_staged_backfill_leaves_live_vectors_until_swap(monkeypatch):
+    conn = FakeConnection({1: message("hello", [9.0, 9.0], "model-v1")})
+    monkeypatch.setattr(db, "db_pool", conn)
+    job = backfill.Backfill(FakeProvider(), staged=True, batch_size=10, concurrency=1)
+
+    await job.run()
+
+    assert conn.messages[1]["embedding"] == [9.0, 9.0]
+    assert conn.messages[1]["embedding_next"] == [5.0, 1.0]
+    assert conn.messages[1]["embedding_next_model"] == "model-v2"
+    # Staged rows are not picked up again by a later run
+    assert await job.run_page(0) is None
+
+
+@pytest.mark.asyncio
+async def test_swap_replaces_live_vectors_and_drops_old_chunks(monkeypatch):
+    conn = FakeConnection(
+        {1: message("hello", [9.0, 9.0], "model-v1"), 2: message("", [9.0, 9.0], "model-v1")},
+        chunks=[{"message_id": 1, "embedding_model": "model-v1"}],
+    )
+    monkeypatch.setattr(db, "db_pool", conn)
+    job = backfill.Backfill(FakeProvider(), staged=True, batch_size=10, concurrency=1)
+    await job.run()
+
+    assert await job.swap() == 1
+
+    assert (conn.messages[1]["embedding"], conn.messages[1]["embedding_model"]) == ([5.0, 1.0], "model-v2")
+    assert (conn.messages[1]["embedding_next"], conn.messages[1]["embedding_next_model"]) == (None, None)
+    assert conn.messages[2]["embedding_model"] == "model-v1"  # empty messages are never embedded
+    assert conn.chunks == []
+    assert conn.checkpoint["swapped"] is True
+
+
+@pytest.mark.asyncio
+async def test_swap_embeds_messages_written_since_the_backfill(monkeypatch):
+    conn = FakeConnection({1: message("hello", [9.0, 9.0], "model-v1")})
+    monkeypatch.setattr(db, "db_pool", conn)
+    provider = FakeProvider()
+    job = backfill.Backfill(provider, staged=True, batch_size=10, concurrency=1, max_retries=0)
+    await job.run()
+
+    # Services keep writing with the old model until EMBEDDING_MODEL changes
+    conn.messages[2] = message("late", [9.0, 9.0], "model-v1")
+    provider.calls.clear()
+    assert await job.swap() == 2
+
+    assert provider.calls == [["late"]]
+    assert {row["embedding_model"] for row in conn.messages.values()} == {"model-v2"}
+    assert conn.messages[2]["embedding"] == [4.0, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_swap_is_refused_when_stragglers_fail_or_are_too_many(monkeypatch):
+    conn = FakeConnection({1: message("hello", [9.0, 9.0], "model-v1"), 2: message("bad", [9.0, 9.0], "model-v1")})
+    monkeypatch.setattr(db, "db_pool", conn)
+    provider = FakeProvider()
+    job = backfill.Backfill(provider, staged=True, batch_size=1, concurrency=1, max_retries=0, max_catch_up=1)
+    await job.run()
+
+    # Message 2 failed in the run and again during the swap
+    with pytest.raises(backfill.IncompleteBackfill, match="1 messages could not be embedded"):
+        await job.swap()
+    assert conn.messages[1]["embedding_model"] == "model-v1"
+    assert conn.checkpoint["swapped"] is False
+
+    provider.failing.clear()
+    conn.messages[3] = message("late", [9.0, 9.0], "model-v1")
+    with pytest.raises(backfill.IncompleteBackfill, match="More than 1 messages"):
+        await job.swap()
+
+    # A rerun stages the bulk; the swap catches up with what remains
+    await job.run()
+    conn.messages[4] = message("later", [9.0, 9.0], "model-v1")
+    assert await job.swap() == 4
+    assert {row["embedding_model"] for row in conn.messages.values()} == {"model-v2"}
@@ -0,0 +1,107 @@
+import asyncio
+import numpy as np
+import pytest
+from mcp_server.benchmarks.stats import (
+    compare, drive, exact_top_k, latency_summary, mean_reciprocal_rank, pareto_front, recall_at_k, result_row,
+)
+
+
+def report(p95, rps):
+    row = result_row("chat", 10_000, 8, [], [], 0, 1.0)
+    row["latency_ms"]["p95"], row["throughput_rps"] = p95, rps
+    return {"results": [row]}
+
+
+def test_latency_summary_percentiles():
+    summary = latency_summary([float(i) for i in range(1, 101)])
+    assert (summary["p50"], summary["p95"], summary["p99"], summary["max"]) == (50.5, 95.05, 99.01, 100.0)
+    assert latency_summary([])["p95"] is None
+
+
+@pytest.mark.asyncio
+async def test_drive_runs_every_request_with_bounded_concurrency():
+    active = peak = 0
+
+    async def send(i):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0)
+        active -= 1
+        if i == 3:
+            raise RuntimeError("boom")
+        return {"llm": 1.0}
+
+    latencies, stages, errors, elapsed = await drive(send, 20, 4)
+    assert (len(latencies), len(stages), errors, peak) == (19, 19, 1, 4)
+    assert result_row("chat", 100, 4, latencies, stages, errors, elapsed)["stages_ms"]["llm"]["p50"] == 1.0
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    deltas, regressions = compare(report(100.0, 50.0), report(105.0, 49.0), threshold=0.1)
+    assert len(deltas) == 1 and regressions == []
+
+    _, regressions = compare(report(100.0, 50.0), report(130.0, 50.0), threshold=0.1)
+    assert len(regressions) == 1
+    _, regressions = compare(report(100.0, 50.0), report(100.0, 40.0), threshold=0.1)
+    assert len(regressions) == 1
+
+
+def test_exact_top_k_matches_brute_force_across_chunks():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((257, 8)).astype(np.float32)
+    ids = np.arange(1000, 1257)
+    queries = rng.standard_normal((5, 8)).astype(np.float32)
+
+    for metric in ("l2", "cosine", "ip"):
+        found = exact_top_k(vectors, ids, queries, 7, metric, chunk_rows=50)
+        if metric == "l2":
+            distances = np.linalg.norm(vectors[None, :, :] - queries[:, None, :], axis=2)
+        elif metric == "cosine":
+            distances = 1 - (queries @ vectors.T) / np.outer(np.linalg.norm(queries, axis=1), np.linalg.norm(vectors, axis=1))
+        else:
+            distances = -(queries @ vectors.T)
+        assert (found == ids[np.argsort(distances, axis=1)[:, :7]]).all()
+
+
+def test_recall_mrr_and_pareto_front():
+    truth = np.array([[1, 2], [3, 4]])
+    assert recall_at_k([[1, 2], [4, 9]], truth) == 0.75
+    assert mean_reciprocal_rank([[2, 1], [9, 8]], truth) == 0.25
+
+    rows = [
+        {"name": "fast", "recall": 0.8, "latency_ms": {"p50": 1.0}},
+        {"name": "exact", "recall": 1.0, "latency_ms": {"p50": 5.0}},
+        {"name": "worse", "recall": 0.8, "latency_ms": {"p50": 3.0}},
+    ]
+    assert pareto_front(rows) == {"fast", "exact"}
+
+
+def test_recall_only_labels_index_knobs_for_indexes_that_exist():
+    from mcp_server.benchmarks.recall import pgvector_configurations, vector_index_methods
+
+    indexdefs = [
+        "CREATE UNIQUE INDEX messages_pkey ON public.messages USING btree (id)",
+        "CREATE INDEX ix_messages_embedding_l2 ON public.messages USING hnsw (embedding vector_l2_ops) WITH (m='16')",
+        "CREATE INDEX ix_messages_embedding_ip ON public.messages USING ivfflat (embedding vector_ip_ops) WITH (lists='100')",
+    ]
+    assert vector_index_methods(indexdefs, "l2") == {"hnsw"}
+    assert vector_index_methods(indexdefs, "ip") == {"ivfflat"}
+    assert vector_index_methods(indexdefs, "cosine") == set()
+
+    names = [config.name for config in pgvector_configurations({"hnsw"}, [40, 80], [4])]
+    assert names == ["pgvector hnsw ef_search=40", "pgvector hnsw ef_search=80"]
+    assert [config.name for config in pgvector_configurations(set(), [40], [4])] == ["pgvector exact"]
+
+
+def test_corpus_chunks_end_on_conversation_boundaries():
+    from mcp_server.benchmarks.corpus import SyntheticCorpus
+
+    corpus = SyntheticCorpus(vocab_size=50, messages_per_conversation=20)
+    chunks = list(corpus.chunks(30, 170, 50))
+
+    # 50 rounds down to two whole conversations; only the ends cut one
+    assert [(start, len(rows)) for start, rows in chunks] == [(30, 10), (40, 40), (80, 40), (120, 40), (160, 10)]
+    assert [row for _, rows in chunks for row in rows] == corpus.messages(30, 170)
+    for _, rows in chunks[1:-1]:
+        assert len({conversation_id for _, _, conversation_id in rows}) == 2
@@ -0,0 +1,226 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from httpx import ASGITransport, AsyncClient
+from mcp_server.mcp import server
+from mcp_server.mcp.adapters.base import LLMRateLimitError
+from mcp_server.mcp.backends.base import SearchBackend
+from mcp_server.mcp.database.schema import Message, MessageChunk
+
+
+class RecordingBackend(SearchBackend):
+    def __init__(self):
+        self.added = []
+
+    async def add(self, messages):
+        self.added.extend(messages)
+
+    async def search(self, query_embedding, limit, metric, ef_search=None, probes=None):
+        return []
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    embedded = []
+
+    async def fake_embedding(text):
+        embedded.append(text)
+        return [float(len(text))]
+
+    async def fake_search(query_text, mode=None, query_embedding=None):
+        assert await query_embedding == [float(len(query_text))]
+        return [Message(id=7, role="user", content="earlier context")]
+
+    async def fake_save(conversation_id, messages):
+        for i, message in enumerate(messages, start=100):
+            message.id, message.conversation_id = i, conversation_id
+        return messages
+
+    backend = RecordingBackend()
+    monkeypatch.setattr(server, "generate_embedding", fake_embedding)
+    monkeypatch.setattr(server, "find_relevant_messages", fake_search)
+    monkeypatch.setattr(server, "summarize_messages", AsyncMock(return_value="summary"))
+    monkeypatch.setattr(server, "stored_summary_context", AsyncMock(return_value="summary"))
+    monkeypatch.setattr(server, "ensure_conversation", AsyncMock(return_value=42))
+    monkeypatch.setattr(server, "save_messages", AsyncMock(side_effect=fake_save))
+    monkeypatch.setattr(server, "get_search_backend", lambda: backend)
+    monkeypatch.setattr(server.llm_adapter, "send_message", AsyncMock(return_value="the answer"))
+    return embedded, backend
+
+
+@pytest.mark.asyncio
+async def test_chat_reuses_query_embedding_and_persists_in_background(pipeline):
+    embedded, backend = pipeline
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as ac:
+        response = await ac.post("/chat", json={"message": "hello"})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["conversation_id"] == 42
+    assert body["response"] == "the answer"
+    assert body["context_used"] is True
+    assert {"retrieval", "context", "llm", "total"} <= set(body["timings_ms"])
+
+    # The user message is embedded once (shared by search and storage), the reply once
+    assert embedded == ["hello", "the answer"]
+    assert [(m.role, m.id, m.embedding) for m in backend.added] == [
+        ("user", 100, [5.0]),
+        ("assistant", 101, [10.0]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_sends_context_then_tokens_then_persists(pipeline, monkeypatch):
+    embedded, backend = pipeline
+
+    async def fake_stream(prompt):
+        for chunk in ["the ", "answer"]:
+            yield chunk
+
+    monkeypatch.setattr(server.llm_adapter, "stream_message", fake_stream)
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as ac:
+        response = await ac.post("/chat/stream", json={"message": "hello"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == ["event: context", "event: token", "event: token", "event: done"]
+    assert '"context_used": true' in response.text
+    assert "time_to_first_token" in response.text
+    assert [m.content for m in backend.added] == ["hello", "the answer"]
+
+
+@pytest.mark.asyncio
+async def test_chat_maps_llm_failures_to_service_unavailable(pipeline, monkeypatch):
+    monkeypatch.setattr(
+        server.llm_adapter, "send_message",
+        AsyncMock(side_effect=LLMRateLimitError("quota exceeded", status_code=429, retry_after=3)),
+    )
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as ac:
+        response = await ac.post("/chat", json={"message": "hello"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    assert response.json() == {"detail": "quota exceeded"}
+    # The failed request created no conversation
+    server.ensure_conversation.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_chat_cancels_the_query_embedding_when_retrieval_fails(pipeline, monkeypatch):
+    async def slow_embedding(text):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(server, "generate_embedding", slow_embedding)
+    monkeypatch.setattr(server, "find_relevant_messages", AsyncMock(side_effect=RuntimeError("database unavailable")))
+    with pytest.raises(RuntimeError):
+        await server.prepare_chat(server.ChatRequest(message="hello"), server.StageTimer("chat"))
+
+    await asyncio.sleep(0)
+    assert not [task for task in asyncio.all_tasks() if task.get_coro().__name__ == "slow_embedding"]
+    server.ensure_conversation.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_is_answered_from_the_response_cache(pipeline, monkeypatch):
+    monkeypatch.setattr(server.settings, "response_cache_enabled", True)
+    monkeypatch.setattr(server, "response_cache", server.SemanticResponseCache(10))
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as ac:
+        first = await ac.post("/chat", json={"message": "hello"})
+        second = await ac.post("/chat", json={"message": "hello"})
+        opted_out = await ac.post("/chat", json={"message": "hello", "use_cache": False})
+
+    assert [r.json()["cache_hit"] for r in (first, second, opted_out)] == [False, True, False]
+    assert second.json()["response"] == "the answer"
+    assert server.llm_adapter.send_message.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_response_cache_still_hits_after_the_exchange_is_persisted(pipeline, monkeypatch):
+    stored = [Message(id=7, conversation_id=1, role="user", content="earlier context")]
+
+    async def search_stored(query_text, mode=None, query_embedding=None):
+        # The stored copy of an identical question is its nearest neighbour
+        return sorted(stored, key=lambda m: m.content != query_text)[:3]
+
+    async def save(conversation_id, messages):
+        for message in messages:
+            message.id, message.conversation_id = max(m.id for m in stored) + 1, conversation_id
+            stored.append(message)
+        return messages
+
+    monkeypatch.setattr(server.settings, "response_cache_enabled", True)
+    monkeypatch.setattr(server, "response_cache", server.SemanticResponseCache(10))
+    monkeypatch.setattr(server, "find_relevant_messages", search_stored)
+    monkeypatch.setattr(server, "save_messages", AsyncMock(side_effect=save))
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as ac:
+        # Background persistence finishes before each response is returned to the client
+        first = await ac.post("/chat", json={"message": "hello"})
+        second = await ac.post("/chat", json={"message": "hello"})
+        # Material that existed before the answer still invalidates it when it changes
+        stored[0].content = "edited context"
+        third = await ac.post("/chat", json={"message": "hello"})
+
+    assert [m.id for m in stored if m.content == "hello"] == [8, 10, 12]
+    assert [r.json()["cache_hit"] for r in (first, second, third)] == [False, True, False]
+    assert server.llm_adapter.send_message.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_response_cache_misses_when_newer_unrelated_material_is_retrieved(pipeline, monkeypatch):
+    stored = [Message(id=7, conversation_id=1, role="user", content="earlier context")]
+
+    async def search_stored(query_text, mode=None, query_embedding=None):
+        return sorted(stored, key=lambda m: (m.content != query_text, -m.id))[:3]
+
+    async def save(conversation_id, messages):
+        for message in messages:
+            message.id, message.conversation_id = max(m.id for m in stored) + 1, conversation_id
+            stored.append(message)
+        return messages
+
+    monkeypatch.setattr(server.settings, "response_cache_enabled", True)
+    monkeypatch.setattr(server, "response_cache", server.SemanticResponseCache(10))
+    monkeypatch.setattr(server, "find_relevant_messages", search_stored)
+    monkeypatch.setattr(server, "save_messages", AsyncMock(side_effect=save))
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as ac:
+        first = await ac.post("/chat", json={"message": "hello"})
+        # Another conversation stores a relevant message after the answer
+        stored.append(Message(id=50, conversation_id=2, role="user", content="new material"))
+        second = await ac.post("/chat", json={"message": "hello"})
+
+    assert [r.json()["cache_hit"] for r in (first, second)] == [False, False]
+    assert server.llm_adapter.send_message.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_metrics_and_server_timing_cover_chat_stages(pipeline, monkeypatch):
+    monkeypatch.setattr(server.settings, "server_timing_header", True)
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as ac:
+        response = await ac.post("/chat", json={"message": "hello"})
+        scrape = await ac.get("/metrics")
+
+    assert "retrieval;dur=" in response.headers["server-timing"]
+    assert scrape.headers["content-type"].startswith("text/plain")
+    assert 'mcp_stage_latency_seconds_count{component="chat",stage="llm"}' in scrape.text
+    assert 'mcp_runtime_stat{component="embedding_cache",stat="hits"}' in scrape.text
+
+
+@pytest.mark.asyncio
+async def test_chat_and_search_use_the_matched_chunk_of_long_messages(pipeline, monkeypatch):
+    long_message = Message(id=8, conversation_id=3, role="user", content="stack trace line\n" * 500)
+    long_message.matched_chunk = MessageChunk(id=1, chunk_index=4, start_offset=100, end_offset=900, content="ERR_CONN_RESET")
+
+    async def fake_search(query_text, mode=None, query_embedding=None, **kwargs):
+        return [long_message]
+
+    summarize = AsyncMock(return_value="summary")
+    monkeypatch.setattr(server, "find_relevant_messages", fake_search)
+    monkeypatch.setattr(server, "summarize_messages", summarize)
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as ac:
+        await ac.post("/chat", json={"message": "why did it reset?", "summary_mode": "abstractive"})
+        response = await ac.post("/search", json={"query": "why did it reset?"})
+
+    assert [m.content for m in summarize.await_args.args[0]] == ["ERR_CONN_RESET"]
+    result = response.json()["results"][0]
+    assert result["content"] == long_message.content
+    assert result["chunk"] == {"index": 4, "start": 100, "end": 900, "content": "ERR_CONN_RESET"}
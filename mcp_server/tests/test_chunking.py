@@ -0,0 +1,40 @@
+import pytest
+from mcp_server.mcp.chunking import chunk_text
+from mcp_server.tests.feeder_support import messages
+
+
+def test_short_text_is_not_chunked():
+    assert chunk_text("short message", max_chars=100) == []
+
+
+def test_chunks_overlap_and_end_on_breaks():
+    paragraphs = [f"Paragraph {i}. " + "word " * 30 for i in range(10)]
+    text = "\n\n".join(paragraph.strip() for paragraph in paragraphs)
+
+    chunks = chunk_text(text, max_chars=400, overlap=80)
+
+    assert len(chunks) > 1
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    assert all(len(chunk.text) <= 400 for chunk in chunks)
+    assert chunks[-1].end == len(text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.start < previous.end  # overlaps the previous chunk
+        assert text[previous.end - 2:previous.end] == "\n\n"  # cut at a paragraph break
+    assert all(text[chunk.start:chunk.end].strip() == chunk.text for chunk in chunks)
+
+
+def test_unbroken_text_is_cut_at_max_chars():
+    chunks = chunk_text("x" * 2500, max_chars=1000, overlap=200)
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [(0, 1000), (800, 1800), (1600, 2500)]
+
+
+@pytest.mark.asyncio
+async def test_feeder_stores_chunks_of_long_messages(feeder, database):
+    long_text = "A paragraph about HNSW. " * 120
+
+    conv_id, _ = await feeder.save_conversation_to_db(messages(feeder, "hello", long_text))
+
+    rows = database.conversation(conv_id)
+    assert len(database.chunks) > 1
+    assert {chunk["message_id"] for chunk in database.chunks} == {rows[1]["id"]}
+    assert all(len(chunk["embedding"]) == 768 for chunk in database.chunks)
@@ -0,0 +1,26 @@
+import pytest
+from mcp_server.mcp.database import db
+from mcp_server.mcp.database.db import get_pool, pool_stats
+
+
+def test_get_pool_requires_connect(monkeypatch):
+    monkeypatch.setattr(db, "db_pool", None)
+    with pytest.raises(RuntimeError):
+        get_pool()
+
+
+def test_pool_stats_reports_usage(monkeypatch):
+    class FakePool:
+        def get_size(self): return 5
+        def get_idle_size(self): return 3
+        def get_min_size(self): return 2
+        def get_max_size(self): return 10
+
+    monkeypatch.setattr(db, "db_pool", None)
+    assert pool_stats() == {"connected": False}
+
+    monkeypatch.setattr(db, "db_pool", FakePool())
+    stats = pool_stats()
+    assert stats["connected"] is True
+    assert stats["in_use"] == 2
+    assert stats["max_size"] == 10
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from mcp_server.mcp import embedding
+from mcp_server.mcp.cache import LRUCache
+
+
+def test_lru_cache_evicts_and_expires():
+    now = [0.0]
+    cache = LRUCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts "b", the least recently used
+    assert "b" not in cache
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (1, 1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_generate_embedding_caches_by_normalized_text(monkeypatch):
+    calls = []
+
+    async def fake_remote(text):
+        calls.append(text)
+        return [0.5, 0.5]
+
+    monkeypatch.setattr(embedding, "_embed_remote", fake_remote)
+    monkeypatch.setattr(embedding, "embedding_cache", LRUCache(10, 60))
+
+    assert await embedding.generate_embedding("hello   world") == [0.5, 0.5]
+    assert await embedding.generate_embedding(" hello world\n") == [0.5, 0.5]
+    assert calls == ["hello   world"]
+    assert embedding.embedding_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_embedding_does_not_cache_failures(monkeypatch):
+    async def failing_remote(text):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(embedding, "_embed_remote", failing_remote)
+    monkeypatch.setattr(embedding, "embedding_cache", LRUCache(10, 60))
+
+    assert await embedding.generate_embedding("hello") is None
+    assert len(embedding.embedding_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_remote_call(monkeypatch):
+    calls = []
+
+    async def slow_remote(text):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return [0.5, 0.5]
+
+    monkeypatch.setattr(embedding, "_embed_remote", slow_remote)
+    monkeypatch.setattr(embedding, "embedding_cache", LRUCache(10, 60))
+
+    results = await asyncio.gather(*(embedding.generate_embedding("hello") for _ in range(3)))
+    assert results == [[0.5, 0.5]] * 3
+    assert calls == ["hello"]
@@ -0,0 +1,68 @@
+import asyncio
+from pathlib import Path
+import pytest
+from mcp_server.mcp.embedding_batcher import EmbeddingBatcher
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+class ResourceExhausted(Exception):
+    """Stands in for google.api_core.exceptions.ResourceExhausted."""
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    async def embed_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_batch_size=10, max_wait=0.01)
+    results = await asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "a", "ccc"]))
+
+    assert results == [[1.0], [2.0], [1.0], [3.0]]
+    assert calls == [["a", "bb", "ccc"]]
+
+
+@pytest.mark.asyncio
+async def test_full_batches_flush_immediately():
+    calls = []
+
+    async def embed_batch(texts):
+        calls.append(len(texts))
+        return [[0.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_batch_size=2, max_wait=10)
+    await asyncio.wait_for(batcher.embed_many(["a", "b", "c", "d"]), timeout=1)
+    assert calls == [2, 2]
+
+
+@pytest.mark.asyncio
+async def test_retries_quota_errors_then_propagates_others():
+    attempts = []
+
+    async def flaky(texts):
+        attempts.append(texts)
+        if len(attempts) < 3:
+            raise ResourceExhausted("429 quota")
+        return [[1.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(flaky, max_wait=0, backoff_base=0.001)
+    assert await batcher.embed("x") == [1.0]
+    assert batcher.retries == 2
+
+    async def broken(texts):
+        raise ValueError("bad input")
+
+    batcher = EmbeddingBatcher(broken, max_wait=0, backoff_base=0.001)
+    with pytest.raises(ValueError):
+        await batcher.embed("x")
+    assert batcher.retries == 0
+
+
+@pytest.mark.parametrize("module", ["embedding_batcher.py", "embedding_providers.py", "chunking.py"])
+def test_feeder_copy_is_in_sync(module):
+    shared = REPO_ROOT / "mcp_server" / "mcp" / module
+    feeder = REPO_ROOT / "conversation_feeder" / module
+    assert shared.read_text() == feeder.read_text()
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from mcp_server.mcp.embedding_providers import LocalEmbeddingProvider, create_embedding_provider
+
+
+@pytest.mark.asyncio
+async def test_local_provider_is_deterministic_and_normalized():
+    texts = ["postgres connection pool", "postgres connection pooling", "bake a chocolate cake"]
+    first = np.array(await LocalEmbeddingProvider().embed_batch(texts))
+    second = np.array(await LocalEmbeddingProvider().embed_batch(texts))
+
+    assert first.shape == (3, 768)
+    assert np.allclose(first, second)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+    # Texts sharing words land closer together than unrelated ones
+    assert first[0] @ first[1] > first[0] @ first[2]
+
+
+def test_create_embedding_provider_rejects_unknown_names():
+    assert isinstance(create_embedding_provider("local", dimensions=32), LocalEmbeddingProvider)
+    with pytest.raises(ValueError):
+        create_embedding_provider("word2vec")
+
+
+@pytest.mark.asyncio
+async def test_local_provider_embeds_off_the_event_loop(monkeypatch):
+    import threading
+
+    provider = LocalEmbeddingProvider(dimensions=8)
+    threads = []
+    embed_sync = provider.embed_sync
+
+    def record_thread(texts):
+        threads.append(threading.current_thread())
+        return embed_sync(texts)
+
+    monkeypatch.setattr(provider, "embed_sync", record_thread)
+    vectors = await provider.embed_batch(["hello world"])
+
+    assert len(vectors) == 1 and len(vectors[0]) == 8
+    assert threads[0] is not threading.main_thread()
@@ -0,0 +1,39 @@
+import pytest
+from unittest.mock import AsyncMock
+from mcp_server.mcp.database.schema import Message
+from mcp_server.mcp.extractive import extractive_summary, split_sentences
+from mcp_server.mcp.summarize import summarize_messages
+
+
+MESSAGES = [
+    Message(id=1, role="user", content="How do I tune the pgvector HNSW index? Also, nice weather today."),
+    Message(id=2, role="assistant", content="Raise ef_search on the HNSW index for better recall.\nLower it for speed."),
+]
+
+
+def test_split_sentences():
+    assert split_sentences("One. Two?\nThree") == ["One.", "Two?", "Three"]
+
+
+def test_extractive_summary_keeps_relevant_sentences_within_budget():
+    summary = extractive_summary(MESSAGES, query_text="HNSW index ef_search", max_chars=120)
+
+    assert len(summary) <= 120
+    assert "ef_search" in summary
+    assert "weather" not in summary
+    # Output keeps the order the chosen sentences have in the source messages
+    positions = []
+    for line in summary.split("\n"):
+        sentence = line.split(": ", 1)[1]
+        positions.append(next((i, msg.content.index(sentence)) for i, msg in enumerate(MESSAGES) if sentence in msg.content))
+    assert len(positions) >= 2
+    assert positions == sorted(positions)
+
+
+@pytest.mark.asyncio
+async def test_auto_mode_skips_the_llm_for_small_contexts():
+    adapter = AsyncMock()
+    summary = await summarize_messages(MESSAGES, llm_adapter=adapter, mode="auto", query_text="HNSW")
+
+    assert "HNSW" in summary
+    adapter.send_message.assert_not_awaited()
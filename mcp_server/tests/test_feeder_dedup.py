@@ -0,0 +1,64 @@
+import pytest
+from mcp_server.tests.feeder_support import messages
+
+
+@pytest.mark.asyncio
+async def test_messages_are_stored_with_positions_and_content_hashes(feeder, database, embedded):
+    conv_id, _ = await feeder.save_conversation_to_db(messages(feeder, "hello", "hi there"))
+
+    rows = database.conversation(conv_id)
+    assert [row["position"] for row in rows] == [0, 1]
+    assert rows[0]["content_hash"] == feeder.content_hash("  hello ")
+    assert {row["embedding_model"] for row in rows} == {feeder.embedding_provider.model_name}
+
+    # Vectors of stored messages with the same content are reused, not re-embedded
+    embedded.clear()
+    await feeder.save_conversation_to_db(messages(feeder, "hello", "something new"))
+    assert embedded == ["something new"]
+
+
+@pytest.mark.asyncio
+async def test_stored_positions_reads_the_conversation_under_a_key(feeder, database):
+    assert await feeder.stored_positions(database, "upload-1") == (None, {})
+
+    conv_id, _ = await feeder.save_conversation_to_db(messages(feeder, "hello", "hi  there"), idempotency_key="upload-1")
+    await feeder.save_conversation_to_db(messages(feeder, "unrelated"), idempotency_key="upload-2")
+
+    assert await feeder.stored_positions(database, "upload-1") == (
+        conv_id, {0: feeder.content_hash("hello"), 1: feeder.content_hash("hi there")},
+    )
+
+
+def test_pending_positions_skips_matching_content_and_rejects_changes(feeder):
+    stored = {0: feeder.content_hash("hello"), 2: feeder.content_hash("bye")}
+
+    # Whitespace differences hash the same; gaps and new trailing messages are pending
+    assert feeder.pending_positions(messages(feeder, " hello\v", "new", "bye", "more"), stored) == [1, 3]
+    assert feeder.pending_positions(messages(feeder, "a", "b"), {}) == [0, 1]
+    with pytest.raises(feeder.IdempotencyConflict, match="Message 2"):
+        feeder.pending_positions(messages(feeder, "hello", "new", "edited"), stored)
+
+
+@pytest.mark.asyncio
+async def test_ingest_with_an_idempotency_key_stores_each_message_once(feeder, database, embedded):
+    from httpx import ASGITransport, AsyncClient
+
+    headers = {"X-API-Token": "test_token", "Idempotency-Key": "upload-1"}
+
+    def body(*contents):
+        return {"messages": [{"role": "user", "content": content} for content in contents]}
+
+    async with AsyncClient(transport=ASGITransport(app=feeder.app), base_url="http://test") as ac:
+        first = await ac.post("/api/ingest", json=body("hello", "world"), headers=headers)
+        grown = await ac.post("/api/ingest", json=body("hello", "world", "again"), headers=headers)
+        embedded.clear()
+        conflict = await ac.post("/api/ingest", json=body("hello", "edited"), headers=headers)
+
+    assert (first.json()["stored_count"], first.json()["skipped_count"]) == (2, 0)
+    assert (grown.json()["stored_count"], grown.json()["skipped_count"]) == (1, 2)
+    assert grown.json()["conversation_id"] == first.json()["conversation_id"]
+    assert conflict.status_code == 409
+    assert "Message 1 differs" in conflict.json()["detail"]
+    # Rejected before anything is embedded or written
+    assert embedded == []
+    assert [row["content"] for row in database.messages] == ["hello", "world", "again"]
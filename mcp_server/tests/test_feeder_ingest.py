@@ -0,0 +1,40 @@
+import pytest
+from mcp_server.tests.feeder_support import messages
+
+
+@pytest.mark.asyncio
+async def test_save_conversation_embeds_first_then_copies_the_rows(feeder, database, embedded, monkeypatch):
+    acquire = database.acquire
+    embedded_on_acquire = []
+
+    def recording_acquire():
+        embedded_on_acquire.append(len(embedded))
+        return acquire()
+
+    monkeypatch.setattr(database, "acquire", recording_acquire)
+    contents = ("hello", "hi there", "how are you?")
+
+    conv_id, stored = await feeder.save_conversation_to_db(messages(feeder, *contents))
+
+    rows = database.conversation(conv_id)
+    assert stored == 3
+    assert [(row["role"], row["content"]) for row in rows] == [
+        ("user", "hello"), ("assistant", "hi there"), ("user", "how are you?"),
+    ]
+    assert all(len(row["embedding"]) == 768 for row in rows)
+    # Every message was embedded before a connection was taken from the pool
+    assert sorted(embedded) == sorted(contents)
+    assert embedded_on_acquire == [3]
+
+
+@pytest.mark.asyncio
+async def test_api_ingest_returns_the_new_conversation(feeder, database):
+    from httpx import ASGITransport, AsyncClient
+
+    body = {"messages": [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "hi"}]}
+    async with AsyncClient(transport=ASGITransport(app=feeder.app), base_url="http://test") as ac:
+        response = await ac.post("/api/ingest", json=body, headers={"X-API-Token": "test_token"})
+
+    assert response.status_code == 200
+    conv_id = response.json()["conversation_id"]
+    assert [row["content"] for row in database.conversation(conv_id)] == ["hello", "hi"]
@@ -0,0 +1,107 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+async def aiter_chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("gzipped", [False, True])
+async def test_ndjson_lines_are_split_across_chunks(feeder, gzipped):
+    data = b'{"a": 1}\n\n{"b": "\xc3\xa9"}\r\n{"c": 3}'
+    body = gzip.compress(data) if gzipped else data
+    lines = await collect(feeder.iter_ndjson_lines(aiter_chunks(body, 3), gzipped=gzipped))
+    assert lines == [b'{"a": 1}', b'{"b": "\xc3\xa9"}\r', b'{"c": 3}']
+
+    with pytest.raises(ValueError):
+        await collect(feeder.iter_ndjson_lines(aiter_chunks(b"x" * 50, 10), max_line_bytes=20))
+    with pytest.raises(ValueError):
+        await collect(feeder.iter_ndjson_lines(aiter_chunks(b"not gzip", 4), gzipped=True))
+
+
+def test_inflate_bounds_each_decompressed_piece(feeder):
+    bomb = gzip.compress(b"\0" * 1_000_000)
+    pieces = list(feeder._inflate(zlib.decompressobj(16 + zlib.MAX_WBITS), bomb, max_length=4096))
+    assert max(len(piece) for piece in pieces) == 4096
+    assert sum(len(piece) for piece in pieces) == 1_000_000
+
+
+@pytest.mark.asyncio
+async def test_ingest_in_batches_commits_each_batch_and_reports_errors(feeder, database):
+    async def stream():
+        for i in range(5):
+            yield feeder.Message(role="user", content=f"message {i}")
+        raise ValueError("Invalid message on line 6")
+
+    records = await collect(feeder.ingest_in_batches(stream(), batch_size=2, queue_batches=1))
+
+    assert [record.get("message_count") for record in records] == [2, 4, 4]
+    assert records[-1]["status"] == "error"
+    # Batches committed before the error stay committed; the incomplete one is dropped
+    assert [row["content"] for row in database.conversation(records[-1]["conversation_id"])] == [
+        f"message {i}" for i in range(4)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("gzipped", [False, True])
+async def test_stream_endpoint_stores_the_whole_upload(feeder, database, monkeypatch, gzipped):
+    monkeypatch.setattr(feeder.settings, "ingest_batch_size", 50)
+    lines = [json.dumps({"role": "user", "content": f"line {i} " + "x" * 100}) for i in range(400)]
+    body = "\n".join(lines).encode()
+    headers = {"X-API-Token": "test_token", "Content-Type": "application/x-ndjson"}
+    if gzipped:
+        body, headers["Content-Encoding"] = gzip.compress(body), "gzip"
+
+    # A chunked upload. Like uvicorn, the transport declares ASGI < 2.4, so the
+    # response listens for disconnects and must not start before the body is read
+    async with AsyncClient(transport=ASGITransport(app=feeder.app), base_url="http://test") as ac:
+        response = await asyncio.wait_for(
+            ac.post("/api/ingest/stream", content=aiter_chunks(body, 1024), headers=headers), timeout=30
+        )
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[-1] == {"status": "success", "conversation_id": 1, "message_count": 400, "batches": 8}
+    assert [record["message_count"] for record in records[:-1]] == list(range(50, 401, 50))
+    assert [row["content"] for row in database.conversation(1)] == [json.loads(line)["content"] for line in lines]
+
+
+@pytest.mark.asyncio
+async def test_ingest_form_stores_the_transcript_in_one_transaction(feeder, database, monkeypatch):
+    monkeypatch.setattr(feeder.settings, "ingest_batch_size", 1)
+    async with AsyncClient(transport=ASGITransport(app=feeder.app), base_url="http://test") as ac:
+        stored = await ac.post("/ingest-form", data={"transcript": "user: hello\nmodel: hi there"})
+        invalid = await ac.post("/ingest-form", data={"transcript": "user: hello\nno role here"})
+
+    assert stored.status_code == 200 and "success" in stored.text
+    assert [(row["role"], row["content"]) for row in database.conversation(1)] == [("user", "hello"), ("model", "hi there")]
+    assert invalid.status_code == 400
+    assert len(database.conversations) == 1
+
+
+@pytest.mark.asyncio
+async def test_ingest_form_stores_nothing_when_the_write_fails(feeder, database, monkeypatch):
+    copy_messages = feeder.copy_messages
+
+    async def failing_copy_messages(conn, *args):
+        # The rows are written, then the connection drops before the commit
+        await copy_messages(conn, *args)
+        raise OSError("connection lost")
+
+    monkeypatch.setattr(feeder, "copy_messages", failing_copy_messages)
+    async with AsyncClient(transport=ASGITransport(app=feeder.app, raise_app_exceptions=False), base_url="http://test") as ac:
+        response = await ac.post("/ingest-form", data={"transcript": "user: hello\nmodel: hi there"})
+
+    assert response.status_code == 500
+    assert database.messages == [] and database.conversations == {}
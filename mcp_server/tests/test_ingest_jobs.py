@@ -0,0 +1,132 @@
+import asyncio
+import json
+import pytest
+from mcp_server.tests.feeder_support import messages
+
+
+def workers(feeder, process=None, **kwargs):
+    return feeder.ingest_jobs.IngestWorkers(
+        feeder.get_pool, process or feeder.process_ingest_job,
+        permanent_errors=(feeder.IdempotencyConflict,), **kwargs,
+    )
+
+
+async def enqueue(feeder, database, *contents, idempotency_key=None):
+    payload = [{"role": "user", "content": content} for content in contents]
+    return await feeder.ingest_jobs.enqueue(database, payload, idempotency_key=idempotency_key)
+
+
+@pytest.mark.asyncio
+async def test_save_conversation_reports_progress_per_batch(feeder, database, monkeypatch):
+    monkeypatch.setattr(feeder.settings, "ingest_batch_size", 2)
+    progress = []
+
+    async def report_progress(processed):
+        progress.append(processed)
+
+    await feeder.save_conversation_to_db(messages(feeder, "one", "two", "three"), report_progress=report_progress)
+
+    assert progress == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_save_conversation_rolls_back_when_on_commit_fails(feeder, database):
+    async def on_commit(conn, conv_id):
+        raise RuntimeError("job was reclaimed")
+
+    with pytest.raises(RuntimeError):
+        await feeder.save_conversation_to_db(messages(feeder, "hello"), on_commit=on_commit)
+
+    assert database.messages == [] and database.conversations == {}
+
+
+@pytest.mark.asyncio
+async def test_worker_stores_a_queued_job_and_marks_it_succeeded(feeder, database):
+    job_id = await enqueue(feeder, database, "hello", "world")
+    pool = workers(feeder)
+
+    assert await pool.run_once() is True
+    assert await pool.run_once() is False
+
+    job = database.jobs[job_id]
+    assert (job["status"], job["attempts"], job["processed_count"], job["payload"]) == ("succeeded", 1, 2, "{}")
+    assert [row["content"] for row in database.conversation(job["conversation_id"])] == ["hello", "world"]
+    assert pool.stats()["succeeded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_jobs_are_retried_up_to_max_attempts(feeder, database):
+    calls = []
+
+    async def flaky(job_id, attempt, payload, report_progress):
+        calls.append(attempt)
+        raise OSError("embedding service unavailable")
+
+    job_id = await enqueue(feeder, database, "hello")
+    pool = workers(feeder, flaky, max_attempts=3, retry_backoff=10, max_retry_backoff=15)
+    assert await pool.run_once() is True
+
+    # Each retry waits, twice as long as the last, up to the maximum
+    for delay in (10, 15):
+        assert database.jobs[job_id]["available_at"] == database.now + delay
+        database.now += delay - 1
+        assert await pool.run_once() is False
+        database.now += 1
+        assert await pool.run_once() is True
+
+    assert calls == [1, 2, 3]
+    assert (database.jobs[job_id]["status"], database.jobs[job_id]["error"]) == ("failed", "embedding service unavailable")
+    assert (pool.retried, pool.failed) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_idempotency_conflicts_fail_without_retrying(feeder, database):
+    await feeder.save_conversation_to_db([feeder.Message(role="user", content="original")], idempotency_key="upload-1")
+    job_id = await enqueue(feeder, database, "edited", idempotency_key="upload-1")
+    pool = workers(feeder, max_attempts=3)
+
+    assert await pool.run_once() is True
+
+    job = database.jobs[job_id]
+    assert (job["status"], job["attempts"], pool.retried) == ("failed", 1, 0)
+    assert "differs" in job["error"]
+
+
+@pytest.mark.asyncio
+async def test_reclaimed_job_is_stored_once(feeder, database):
+    job_id = await enqueue(feeder, database, "hello")
+    resume = asyncio.Event()
+
+    async def slow(job_id, attempt, payload, report_progress):
+        await resume.wait()
+        return await feeder.process_ingest_job(job_id, attempt, payload, report_progress)
+
+    slow_worker, fresh_worker = workers(feeder, slow, stale_after=300), workers(feeder, stale_after=300)
+    stalled = asyncio.create_task(slow_worker.run_once())
+    await asyncio.sleep(0)
+    assert database.jobs[job_id]["attempts"] == 1
+
+    # No heartbeat for longer than stale_after: another worker takes over and finishes
+    database.now += 301
+    assert await fresh_worker.run_once() is True
+    resume.set()
+    assert await stalled is True
+
+    job = database.jobs[job_id]
+    assert (job["status"], job["attempts"], job["error"]) == ("succeeded", 2, None)
+    assert len(database.conversations) == 1
+    assert [row["content"] for row in database.messages] == ["hello"]
+    assert (slow_worker.succeeded, slow_worker.retried, slow_worker.failed) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_jobs_abandoned_too_often_are_given_up(feeder, database):
+    job_id = await enqueue(feeder, database, "hello")
+    database.jobs[job_id].update(status="running", attempts=3, updated_at=-1000)
+    pool = workers(feeder, max_attempts=3, stale_after=300)
+
+    assert await pool.run_once() is True
+
+    assert database.jobs[job_id]["status"] == "failed"
+    assert database.messages == []
+    assert json.loads(database.jobs[job_id]["payload"])["messages"] == [{"role": "user", "content": "hello"}]
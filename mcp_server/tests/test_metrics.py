@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import AsyncMock
+from mcp_server.mcp import metrics
+from mcp_server.mcp.adapters.base import LLMRateLimitError
+from mcp_server.mcp.adapters.instrumented import InstrumentedAdapter
+from mcp_server.mcp.timing import StageTimer
+
+
+def sample(name, **labels):
+    return metrics.registry.get_sample_value(name, labels) or 0.0
+
+
+def test_stage_timer_records_stages_for_named_components():
+    before = sample("mcp_stage_latency_seconds_count", component="unit", stage="work")
+    timer = StageTimer("unit")
+    with timer.stage("work"):
+        pass
+    timings = timer.finish()
+
+    assert set(timings) == {"work", "total"}
+    assert sample("mcp_stage_latency_seconds_count", component="unit", stage="work") == before + 1
+    assert timer.server_timing().startswith("work;dur=")
+
+
+@pytest.mark.asyncio
+async def test_instrumented_adapter_counts_calls_outcomes_and_chars():
+    inner = AsyncMock()
+    inner.send_message.side_effect = ["four", LLMRateLimitError("slow down")]
+    adapter = InstrumentedAdapter(inner)
+    ok = sample("mcp_llm_calls_total", operation="send", outcome="ok")
+    limited = sample("mcp_llm_calls_total", operation="send", outcome="LLMRateLimitError")
+    response_chars = sample("mcp_llm_chars_total", direction="response")
+
+    assert await adapter.send_message("prompt") == "four"
+    with pytest.raises(LLMRateLimitError):
+        await adapter.send_message("prompt")
+
+    assert sample("mcp_llm_calls_total", operation="send", outcome="ok") == ok + 1
+    assert sample("mcp_llm_calls_total", operation="send", outcome="LLMRateLimitError") == limited + 1
+    assert sample("mcp_llm_chars_total", direction="response") == response_chars + 4
+
+
+def test_registered_stats_are_exposed_as_gauges():
+    metrics.register_stats("unit_cache", lambda: {"hits": 3, "nested": {"size": 2}, "name": "ignored"})
+    text = metrics.render().decode()
+    assert 'mcp_runtime_stat{component="unit_cache",stat="hits"} 3.0' in text
+    assert 'mcp_runtime_stat{component="unit_cache",stat="nested_size"} 2.0' in text
+    del metrics._stats_collector.sources["unit_cache"]
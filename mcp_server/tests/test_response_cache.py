@@ -0,0 +1,71 @@
+from mcp_server.mcp.database.schema import Message
+from mcp_server.mcp.response_cache import SemanticResponseCache, context_key
+
+
+def hits(*ids, content="context"):
+    return context_key([Message(id=i, content=content) for i in ids])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_near_duplicate_queries_hit_only_with_the_same_context():
+    cache = SemanticResponseCache(10, max_distance=0.05)
+    key = hits(1, 2)
+    cache.put([1.0, 0.0], key, "answer")
+
+    assert cache.get([0.99, 0.05], key) == "answer"
+    assert cache.get([0.0, 1.0], key) is None
+    assert cache.get([1.0, 0.0], hits(1, 3)) is None
+    assert cache.get([1.0, 0.0], hits(1, 2, content="updated context")) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+
+def test_entries_expire_and_are_evicted_least_recently_used_first():
+    clock = FakeClock()
+    cache = SemanticResponseCache(2, ttl_seconds=10, clock=clock)
+    key = context_key([])
+    cache.put([1.0, 0.0], key, "a")
+    cache.put([0.0, 1.0], key, "b")
+    assert cache.get([1.0, 0.0], key) == "a"
+    cache.put([-1.0, 0.0], key, "c")
+    assert cache.get([0.0, 1.0], key) is None
+    assert cache.stats()["evictions"] == 1
+
+    clock.now = 11
+    assert cache.get([1.0, 0.0], key) is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 2
+
+
+def test_the_stored_exchange_of_an_answer_does_not_change_its_context():
+    cache = SemanticResponseCache(10)
+    entry_id = cache.put([1.0, 0.0], hits(7, 3, 5), "answer")
+    # The exchange is persisted as ids 100 and 101; repeats retrieve those copies first
+    cache.exclude_messages(entry_id, [100, 101])
+
+    assert cache.lookup([1.0, 0.0], hits(100, 101, 7)) == (entry_id, "answer")
+    assert cache.get([1.0, 0.0], hits(100, 7, 3, 5)) == "answer"
+    # Older material that was not part of the context still makes it a different question
+    assert cache.get([1.0, 0.0], hits(100, 42, 7)) is None
+    # Original hits can only be pushed out by the exchange's own messages
+    assert cache.get([1.0, 0.0], hits(7, 5)) is None
+    assert cache.get([1.0, 0.0], hits(100, 7)) is None
+    assert cache.get([1.0, 0.0], hits()) is None
+
+
+def test_newer_unrelated_messages_in_the_results_miss():
+    cache = SemanticResponseCache(10)
+    entry_id = cache.put([1.0, 0.0], hits(7, 3), "answer")
+    cache.exclude_messages(entry_id, [100, 101])
+
+    # Message 102 was ingested after the answer, by another conversation or the feeder
+    assert cache.get([1.0, 0.0], hits(102, 7)) is None
+    assert cache.get([1.0, 0.0], hits(100, 102, 7)) is None
+    assert cache.get([1.0, 0.0], hits(7, 3)) == "answer"
@@ -0,0 +1,69 @@
+import asyncio
+from unittest.mock import AsyncMock
+import pytest
+from mcp_server.mcp.database import db
+from mcp_server.mcp.database.schema import Message
+from mcp_server.mcp.rolling_summary import ConversationSummarizer, build_rolling_prompt, format_context
+from mcp_server.tests.fake_pool import FakePool, handles
+
+
+def test_format_context_prefers_stored_summaries():
+    hits = [
+        Message(id=1, conversation_id=10, role="user", content="pgvector index?"),
+        Message(id=2, conversation_id=20, role="user", content="deploy to render"),
+        Message(id=3, conversation_id=10, role="assistant", content="use HNSW"),
+    ]
+
+    context = format_context(hits, {10: "Discussed HNSW vs IVFFlat."})
+
+    assert context == (
+        "Summary of conversation 10:\nDiscussed HNSW vs IVFFlat.\n\n"
+        "user: deploy to render"
+    )
+
+
+def test_rolling_prompt_includes_previous_summary_and_new_turns():
+    prompt = build_rolling_prompt("Old notes.", [Message(role="user", content="New question")])
+    assert "Old notes." in prompt
+    assert "user: New question" in prompt
+
+
+class FakeSummaryTables(FakePool):
+    """One conversation's messages and its summary row."""
+
+    def __init__(self, message_ids):
+        self.message_ids = message_ids
+        self.summary = None
+
+    @handles("SELECT summary, last_message_id, message_count FROM conversation_summaries")
+    def _summary(self, sql, conversation_id):
+        return self.summary
+
+    @handles("SELECT id, role, content FROM messages")
+    def _new_turns(self, sql, conversation_id, after_id, limit):
+        ids = [i for i in self.message_ids if i > after_id][:limit]
+        return [{"id": i, "role": "user", "content": f"turn {i}"} for i in ids]
+
+    @handles("INSERT INTO conversation_summaries")
+    def _store_summary(self, sql, conversation_id, summary, last_message_id, message_count):
+        self.summary = {"summary": summary, "last_message_id": last_message_id, "message_count": message_count}
+
+
+@pytest.mark.asyncio
+async def test_summarizer_requeues_conversations_with_more_pending_turns(monkeypatch):
+    tables = FakeSummaryTables(list(range(1, 451)))
+    monkeypatch.setattr(db, "db_pool", tables)
+    adapter = AsyncMock()
+    adapter.send_message.return_value = "notes"
+    summarizer = ConversationSummarizer(adapter, min_messages=1, max_new_messages=200, scan_interval=0)
+
+    await summarizer.start()
+    summarizer.notify(7)
+    for _ in range(50):
+        if summarizer.updates == 3:
+            break
+        await asyncio.sleep(0)
+    await summarizer.stop()
+
+    assert tables.summary == {"summary": "notes", "last_message_id": 450, "message_count": 450}
+    assert adapter.send_message.await_count == 3
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from mcp_server.mcp import search
+from mcp_server.mcp.backends.base import SearchBackend
+from mcp_server.mcp.backends.pgvector import ef_search_for, merge_chunk_hits
+from mcp_server.mcp.database.schema import Message, MessageChunk
+from mcp_server.mcp.search import find_relevant_messages, reciprocal_rank_fusion
+
+
+def make_messages(*ids):
+    return [Message(id=i, role="user", content=f"message {i}") for i in ids]
+
+
+class FakeBackend(SearchBackend):
+    def __init__(self, vector_ids, lexical_ids):
+        self.vector_ids = vector_ids
+        self.lexical_ids = lexical_ids
+        self.vector_calls = 0
+
+    async def search(self, query_embedding, limit, metric, ef_search=None, probes=None):
+        self.vector_calls += 1
+        return make_messages(*self.vector_ids)[:limit]
+
+    async def lexical_search(self, query_text, limit):
+        return make_messages(*self.lexical_ids)[:limit]
+
+
+@pytest.fixture
+def backend():
+    fake = FakeBackend(vector_ids=[1, 2, 3], lexical_ids=[3, 4])
+    search.set_search_backend(fake)
+    yield fake
+    search.set_search_backend(None)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([make_messages(1, 2, 3), make_messages(3, 4)], limit=3)
+    assert [m.id for m in fused] == [3, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_fuses_vector_and_lexical(backend, monkeypatch):
+    async def fake_embedding(text):
+        return [0.1, 0.2]
+    monkeypatch.setattr(search, "generate_embedding", fake_embedding)
+
+    results = await find_relevant_messages("ERR_CONN_RESET", limit=4, mode="hybrid")
+
+    assert [m.id for m in results] == [3, 1, 2, 4]
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_lexical_when_embedding_fails(backend, monkeypatch):
+    async def failed_embedding(text):
+        return None
+    monkeypatch.setattr(search, "generate_embedding", failed_embedding)
+
+    for mode in ("vector", "hybrid"):
+        results = await find_relevant_messages("ERR_CONN_RESET", mode=mode)
+        assert [m.id for m in results] == [3, 4]
+    assert backend.vector_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_searches_are_coalesced(backend, monkeypatch):
+    embedded = []
+
+    async def slow_embedding(text):
+        embedded.append(text)
+        await asyncio.sleep(0.01)
+        return [0.1, 0.2]
+    monkeypatch.setattr(search, "generate_embedding", slow_embedding)
+
+    results = await asyncio.gather(
+        find_relevant_messages("ERR_CONN_RESET", mode="vector"),
+        find_relevant_messages("  ERR_CONN_RESET ", mode="vector"),
+        find_relevant_messages("ERR_CONN_RESET", mode="vector", limit=1),
+    )
+
+    assert [[m.id for m in r] for r in results] == [[1, 2, 3], [1, 2, 3], [1]]
+    assert results[0] is not results[1]
+    assert len(embedded) == 2 and backend.vector_calls == 2
+
+
+def test_context_view_keeps_only_the_matched_chunk():
+    message = Message(id=5, conversation_id=2, role="user", content="a long pasted log " * 200)
+    assert search.context_view(message) is message
+
+    message.matched_chunk = MessageChunk(id=9, message_id=5, chunk_index=3, content="the relevant lines")
+    view = search.context_view(message)
+    assert (view.id, view.conversation_id, view.content) == (5, 2, "the relevant lines")
+    assert view.matched_chunk.id == 9
+    assert message.content.startswith("a long pasted log")
+
+
+def test_chunk_hits_rank_their_parent_message():
+    # Message 2 is only a middling whole-message match, but one of its chunks is the closest hit
+    ranked = merge_chunk_hits([(1, 0.4), (2, 0.6), (3, 0.7)], [(2, 0.1), (2, 0.3), (4, 0.5)], limit=3)
+    assert ranked == [2, 1, 4]
+
+
+def test_ef_search_is_never_below_the_rows_fetched():
+    assert ef_search_for(None, 5) == 40
+    assert ef_search_for(None, 100) == 100
+    assert ef_search_for(200, 100) == 200
+    assert ef_search_for(10, 25) == 25
@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from mcp_server.mcp.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_task_until_it_finishes():
+    flights = SingleFlight()
+    started = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal started
+        started += 1
+        await release.wait()
+        return started
+
+    waiters = [asyncio.create_task(flights.do("key", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*waiters) == [1] * 5
+    assert flights.stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+
+    # Once finished, the next call runs the work again
+    assert await flights.do("key", work) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_work():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flights.do("key", work))
+    second = asyncio.create_task(flights.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+    assert await second == "done"
@@ -24,3 +24,44 @@ async def test_summarize_messages():
     call_args = mock_adapter.send_message.call_args[0][0]
     assert "user: Hello" in call_args
     assert "assistant: Hi there" in call_args
+
+
+@pytest.mark.asyncio
+async def test_summaries_are_cached_by_message_ids(monkeypatch):
+    from unittest.mock import AsyncMock
+    from mcp_server.mcp import summarize
+    from mcp_server.mcp.cache import LRUCache
+
+    monkeypatch.setattr(summarize, "summary_cache", LRUCache(10, 60))
+    adapter = AsyncMock()
+    adapter.send_message.return_value = "Cached summary."
+    messages = [Message(id=1, role="user", content="Hello"), Message(id=2, role="assistant", content="Hi")]
+
+    assert await summarize_messages(messages, llm_adapter=adapter) == "Cached summary."
+    assert await summarize_messages(messages, llm_adapter=adapter) == "Cached summary."
+    assert adapter.send_message.await_count == 1
+
+    # Different order, edited content or opting out all bypass the cached entry
+    await summarize_messages(list(reversed(messages)), llm_adapter=adapter)
+    messages[0].content = "Hello again"
+    await summarize_messages(messages, llm_adapter=adapter)
+    await summarize_messages(messages, llm_adapter=adapter, use_cache=False)
+    assert adapter.send_message.await_count == 4
+
+
+@pytest.mark.asyncio
+async def test_extractive_summaries_are_scored_off_the_event_loop(monkeypatch):
+    import threading
+    from mcp_server.mcp import summarize
+
+    threads = []
+
+    def recording_summary(messages, **kwargs):
+        threads.append(threading.current_thread())
+        return "extract"
+
+    monkeypatch.setattr(summarize, "extractive_summary", recording_summary)
+    messages = [Message(id=1, role="user", content="Hello")]
+
+    assert await summarize_messages(messages, mode="extractive", query_text="hello") == "extract"
+    assert threads and threads[0] is not threading.main_thread()
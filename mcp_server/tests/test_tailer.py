@@ -0,0 +1,125 @@
+import asyncio
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+
+# conversation_logger is a separate service; tailer.py only needs the standard library
+_spec = importlib.util.spec_from_file_location(
+    "tailer", Path(__file__).resolve().parents[2] / "conversation_logger" / "tailer.py"
+)
+tailer = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(tailer)
+
+
+def append(path, data: bytes):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def test_reads_only_appended_text(tmp_path):
+    log = tmp_path / "chat.log"
+    log.write_bytes(b"old line\n")
+    tail = tailer.FileTail(str(log), start_at_end=True)
+
+    assert tail.read_new() == ""
+    append(log, b"first\n")
+    append(log, b"second\n")
+    assert tail.read_new() == "first\nsecond\n"
+    assert tail.read_new() == ""
+    assert tail.offset == log.stat().st_size
+    tail.close()
+
+
+def test_rotation_drains_the_old_file_then_reads_the_new_one(tmp_path):
+    log = tmp_path / "chat.log"
+    log.write_bytes(b"")
+    tail = tailer.FileTail(str(log))
+
+    with open(log, "ab") as writer:
+        writer.write(b"before\n")
+        writer.flush()
+        assert tail.read_new() == "before\n"
+        os.rename(log, tmp_path / "chat.log.1")
+        # Still written through the old handle after the rename
+        writer.write(b"late\n")
+    log.write_bytes(b"new file\n")
+
+    assert tail.read_new() == "late\nnew file\n"
+    append(log, b"more\n")
+    assert tail.read_new() == "more\n"
+    tail.close()
+
+
+def test_removed_file_is_read_again_once_it_reappears(tmp_path):
+    log = tmp_path / "chat.log"
+    log.write_bytes(b"one\n")
+    tail = tailer.FileTail(str(log))
+    assert tail.read_new() == "one\n"
+
+    log.unlink()
+    assert tail.read_new() == ""
+    assert not tail.is_open
+
+    log.write_bytes(b"two\n")
+    assert tail.read_new() == "two\n"
+    tail.close()
+
+
+def test_truncated_file_is_read_from_the_start(tmp_path):
+    log = tmp_path / "chat.log"
+    log.write_bytes(b"a long first session\n")
+    tail = tailer.FileTail(str(log))
+    assert tail.read_new() == "a long first session\n"
+
+    with open(log, "wb") as f:
+        f.write(b"fresh\n")
+
+    assert tail.read_new() == "fresh\n"
+    assert tail.offset == 6
+    tail.close()
+
+
+def test_multibyte_characters_split_across_reads(tmp_path):
+    log = tmp_path / "chat.log"
+    text = "héllo → 世界 🙂\n"
+    encoded = text.encode("utf-8")
+    log.write_bytes(b"")
+    tail = tailer.FileTail(str(log), max_read_bytes=1)
+
+    # Byte by byte, as a writer flushing mid-character would leave them
+    decoded = []
+    for byte in encoded:
+        append(log, bytes([byte]))
+        decoded.append(tail.read_new())
+
+    assert "".join(decoded) == text
+    assert decoded[1] == "" and decoded[2] == "é"
+    tail.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_inotify", [False, True])
+async def test_tailer_follows_existing_and_new_files_matching_a_glob(tmp_path, use_inotify):
+    existing = tmp_path / "a.log"
+    existing.write_bytes(b"history\n")
+    logs = tailer.Tailer([str(tmp_path / "*.log")], poll_interval=0.05, use_inotify=use_inotify)
+    if use_inotify and not logs.uses_inotify:
+        pytest.skip("inotify is not available")
+    updates = logs.follow()
+
+    async def next_update():
+        return await asyncio.wait_for(updates.__anext__(), timeout=5)
+
+    try:
+        append(existing, b"appended\n")
+        assert await next_update() == (str(existing), "appended\n")
+
+        # A file created later is read from its start; other names are ignored
+        (tmp_path / "notes.txt").write_bytes(b"ignored\n")
+        (tmp_path / "b.log").write_bytes(b"new session\n")
+        assert await next_update() == (str(tmp_path / "b.log"), "new session\n")
+    finally:
+        await updates.aclose()
+        logs.close()
@@ -0,0 +1,185 @@
+import numpy as np
+import pytest
+from mcp_server.mcp.vector_index import MmapVectorIndex
+from mcp_server.mcp.backends.mmap import MmapBackend
+from mcp_server.mcp.database.schema import Message
+from mcp_server.tests.fake_pool import FakePool, handles
+
+DIM = 16
+
+
+def exact_top_k(vectors, query, k, metric):
+    if metric == "ip":
+        distances = -(vectors @ query)
+    elif metric == "cosine":
+        distances = 1 - (vectors @ query) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    else:
+        distances = np.linalg.norm(vectors - query, axis=1)
+    return np.argsort(distances)[:k]
+
+
+@pytest.mark.parametrize("metric", ["l2", "cosine", "ip"])
+def test_search_matches_exact_top_k(tmp_path, metric):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, DIM)).astype(np.float32)
+    ids = np.arange(1, 501)
+    index = MmapVectorIndex(str(tmp_path), dim=DIM, chunk_rows=64)
+    index.add(ids, vectors)
+
+    query = rng.standard_normal(DIM).astype(np.float32)
+    found, distances = index.search(query, 5, metric)
+
+    assert list(found) == list(ids[exact_top_k(vectors, query, 5, metric)])
+    assert list(distances) == sorted(distances)
+
+
+def test_index_grows_and_persists(tmp_path):
+    rng = np.random.default_rng(1)
+    index = MmapVectorIndex(str(tmp_path), dim=DIM, dtype="float16")
+    for start in range(0, 3000, 500):
+        index.add(np.arange(start, start + 500), rng.standard_normal((500, DIM)))
+    target = rng.standard_normal(DIM)
+    index.add([42], [target])  # overwrites an existing row in place
+    assert len(index) == 3000
+
+    reopened = MmapVectorIndex(str(tmp_path), dim=DIM, dtype="float16")
+    assert len(reopened) == 3000
+    found, _ = reopened.search(target, 1, "cosine")
+    assert found[0] == 42
+
+    with pytest.raises(ValueError):
+        MmapVectorIndex(str(tmp_path), dim=DIM, dtype="float32")
+
+
+@pytest.mark.asyncio
+async def test_mmap_backend_runs_without_database(tmp_path):
+    backend = MmapBackend(str(tmp_path), dim=3, sync_interval=0)
+    await backend.start()
+    await backend.add([
+        Message(id=1, conversation_id=1, role="user", content="postgres tuning", embedding=[1.0, 0.0, 0.0]),
+        Message(id=2, conversation_id=1, role="assistant", content="use an index", embedding=[0.0, 1.0, 0.0]),
+        Message(id=3, conversation_id=2, role="user", content="no embedding", embedding=None),
+    ])
+
+    results = await backend.search([0.9, 0.1, 0.0], 5, "l2")
+
+    assert [m.content for m in results] == ["postgres tuning", "use an index"]
+    await backend.stop()
+
+
+def test_reopened_index_overwrites_rows_by_id(tmp_path):
+    index = MmapVectorIndex(str(tmp_path), dim=3)
+    index.add([5, 6, 6], [[1, 0, 0], [0, 1, 0], [0, 0, 1]])  # a repeated id keeps its last vector
+    assert len(index) == 2
+
+    reopened = MmapVectorIndex(str(tmp_path), dim=3)
+    reopened.add([5, 7], [[0, 0, 2], [0, 3, 0]])
+
+    assert list(reopened.ids) == [5, 6, 7]
+    assert list(reopened.search([0, 0, 1], 2, "ip")[0]) == [5, 6]
+
+
+def test_removed_rows_are_skipped_and_reused(tmp_path):
+    index = MmapVectorIndex(str(tmp_path), dim=3)
+    index.add([1, 2, 3], [[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+
+    assert index.remove([2, 99]) == 1
+    assert len(index) == 2
+    assert list(index.search([0, 1, 0], 3, "l2")[0]) == [1, 3]
+
+    index.add([4], [[0, 2, 0]])
+    assert index.count == 3  # id 4 took the row id 2 left
+    reopened = MmapVectorIndex(str(tmp_path), dim=3)
+    assert list(reopened.ids) == [1, 4, 3]
+    assert list(reopened.search([0, 1, 0], 1, "ip")[0]) == [4]
+
+
+class FakeMessagesTable(FakePool):
+    """Messages with an embedding_updated_at, as MmapBackend.sync reads them."""
+
+    def __init__(self):
+        self.rows = {}  # id -> (embedding or None, embedding_updated_at)
+        self.vector_fetches = []
+
+    def _embedded(self, ids=None):
+        return sorted(i for i, (embedding, _) in self.rows.items() if embedding is not None and (ids is None or i in ids))
+
+    @handles("SELECT id, embedding_updated_at FROM messages")
+    def _changed(self, sql, after_at, after_id, limit):
+        keys = sorted((at, i) for i, (_, at) in self.rows.items() if (at, i) > (after_at, after_id))
+        return [{"id": i, "embedding_updated_at": at} for at, i in keys[:limit]]
+
+    @handles("SELECT id, embedding, embedding_updated_at FROM messages")
+    def _vectors(self, sql, ids):
+        self.vector_fetches.append(sorted(ids))
+        return [{"id": i, "embedding": self.rows[i][0], "embedding_updated_at": self.rows[i][1]} for i in self._embedded(ids)]
+
+    @handles("SELECT count(*) FROM messages WHERE embedding IS NOT NULL")
+    def _count(self, sql):
+        return len(self._embedded())
+
+    @handles("SELECT id FROM messages WHERE embedding IS NOT NULL AND id > $1")
+    def _ids_after(self, sql, after_id, limit):
+        return [{"id": i} for i in self._embedded() if i > after_id][:limit]
+
+    @handles("SELECT id FROM messages WHERE id = ANY")
+    def _ids_in(self, sql, ids):
+        return [{"id": i} for i in self._embedded(ids)]
+
+
+@pytest.mark.asyncio
+async def test_mmap_sync_catches_late_commits_and_re_embedded_rows(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from mcp_server.mcp.database import db
+
+    t0 = datetime(2026, 10, 16, 12, 0, 0)
+    table = FakeMessagesTable()
+    monkeypatch.setattr(db, "db_pool", table)
+    backend = MmapBackend(str(tmp_path), dim=3, sync_interval=0, sync_lookback=60)
+    table.rows = {1: ([1.0, 0.0, 0.0], t0), 3: ([0.0, 1.0, 0.0], t0 + timedelta(seconds=2))}
+    assert await backend.sync(batch_size=1) == 2
+
+    # /chat stores and adds a high id locally, then a feeder transaction that
+    # wrote id 2 earlier commits; neither may stop id 2 from being synced
+    table.rows[10] = ([0.0, 0.0, 1.0], t0 + timedelta(seconds=3))
+    await backend.add([Message(id=10, conversation_id=1, role="user", content="hi", embedding=[0.0, 0.0, 1.0])])
+    table.rows[2] = ([0.5, 0.5, 0.0], t0 + timedelta(seconds=1))
+    table.vector_fetches.clear()
+    assert await backend.sync() == 2
+    assert table.vector_fetches == [[2, 10]]  # rows already copied are only re-checked by id
+
+    # A swap to a new model rewrites every vector; the index follows, also after a restart
+    for i in (1, 2, 3):
+        table.rows[i] = ([0.0, 0.0, -float(i)], t0 + timedelta(minutes=10))
+    restarted = MmapBackend(str(tmp_path), dim=3, sync_interval=0, sync_lookback=60)
+    assert await restarted.sync() == 4  # id 10 too: a restart re-reads the lookback window
+    assert [int(i) for i in restarted.index.search([0.0, 0.0, -1.0], 2, "ip")[0]] == [3, 2]
+    assert len(restarted.index) == 4
+
+
+@pytest.mark.asyncio
+async def test_mmap_sync_drops_deleted_rows_and_cleared_embeddings(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from mcp_server.mcp.database import db
+
+    t0 = datetime(2026, 10, 16, 12, 0, 0)
+    table = FakeMessagesTable()
+    monkeypatch.setattr(db, "db_pool", table)
+    table.rows = {i: ([float(i), 1.0, 0.0], t0) for i in (1, 2, 3, 4)}
+    backend = MmapBackend(str(tmp_path), dim=3, sync_interval=0, sync_lookback=60)
+    assert await backend.sync() == 4
+
+    # Id 2's embedding is cleared (the trigger moves its timestamp) and id 3 is deleted
+    table.rows[2] = (None, t0 + timedelta(seconds=5))
+    del table.rows[3]
+    await backend.sync(batch_size=1)
+
+    assert sorted(backend.index.ids.tolist()) == [1, 4]
+    assert [int(i) for i in backend.index.search([1.0, 0.0, 0.0], 4, "ip")[0]] == [4, 1]
+
+    # The freed rows are reused, and the removals survive a restart
+    table.rows[5] = ([5.0, 1.0, 0.0], t0 + timedelta(seconds=6))
+    assert await backend.sync() == 1
+    restarted = MmapBackend(str(tmp_path), dim=3, sync_interval=0, sync_lookback=60)
+    assert sorted(restarted.index.ids.tolist()) == [1, 4, 5]
+    assert restarted.index.count == 4
@@ -1,8 +1,13 @@
 # process_log.py
 import sys
 import os
+import time
+import hashlib
+import socket
 import requests
 
+MAX_ATTEMPTS = 4
+
 def main():
     """Processes a log file and sends it to the memory-mcp feeder API."""
     if len(sys.argv) < 2:
@@ -21,7 +26,6 @@ def main():
         sys.exit(1)
 
     api_endpoint = f"{feeder_url.rstrip('/')}/api/ingest"
-    headers = {"X-API-Token": auth_token}
 
     # --- Parse Log File ---
     messages = []
@@ -50,18 +54,34 @@ def main():
         print("No valid messages found in log file. Nothing to ingest.")
         return
 
+    # Re-running this script on the same session (or retrying below) reuses the
+    # key, so only messages the feeder has not stored yet are uploaded. Log
+    # names are reused and `script` truncates the file, so the key also covers
+    # the session's first message: a new session under an old name gets its own
+    source = f"{socket.gethostname()}:{os.path.realpath(log_file_path)}:{messages[0]['role']}:{messages[0]['content']}"
+    idempotency_key = os.getenv("INGEST_IDEMPOTENCY_KEY") or "process_log:" + hashlib.sha256(source.encode("utf-8")).hexdigest()
+    headers = {"X-API-Token": auth_token, "Idempotency-Key": idempotency_key}
+
     # --- Send to API ---
     payload = {"messages": messages}
     print(f"Sending {len(messages)} messages to {api_endpoint}...")
 
-    try:
-        response = requests.post(api_endpoint, json=payload, headers=headers)
-        response.raise_for_status() # Raises an exception for 4xx/5xx errors
-        print("API Response:", response.json())
-        print("Ingestion successful!")
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending data to API: {e}")
-        sys.exit(1)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            response = requests.post(api_endpoint, json=payload, headers=headers)
+            response.raise_for_status() # Raises an exception for 4xx/5xx errors
+            print("API Response:", response.json())
+            print("Ingestion successful!")
+            return
+        except requests.exceptions.RequestException as e:
+            status = e.response.status_code if e.response is not None else None
+            # Retrying is safe with the idempotency key; client errors will not go away
+            if attempt == MAX_ATTEMPTS or (status is not None and status < 500):
+                print(f"Error sending data to API: {e}")
+                sys.exit(1)
+            delay = 2 ** attempt
+            print(f"Error sending data to API: {e}. Retrying in {delay}s...")
+            time.sleep(delay)
 
 if __name__ == "__main__":
     main()